@@ -0,0 +1,155 @@
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+# --- ALERT ENGINE (semua Site/Pit sekaligus) ---
+# Aturan dievaluasi dalam satu pass vektor atas data terakhir setiap pit (bukan hanya pit
+# yang dipilih di sidebar). Hasil disimpan di tabel alerts (migrasi 6) dan diperbarui
+# inkremental: setiap writer menandai pit yang ditulis (database.refresh_water_balance) dan
+# bump_data_version mengevaluasi ulang hanya pit-pit itu, dalam transaksi yang sama.
+
+WB_ERROR_TOLERANCE = 5.0    # % (sama dengan banner water balance di Dashboard)
+ACTIVE_DAYS = 30            # pit tanpa data selama ini dianggap tidak aktif (tidak di-alert)
+
+# rule -> (severity, judul)
+RULES = {
+    "ELEVASI_KRITIS": ("BAHAYA", "Elevasi di atas Critical"),
+    "WB_ERROR": ("WARNING", "Error Water Balance"),
+    "SURVEY_HILANG": ("WARNING", "Survey hari ini belum ada"),
+    "POMPA_BREAKDOWN": ("WARNING", "Pompa Breakdown"),
+}
+SEVERITY_ORDER = ["BAHAYA", "WARNING"]
+COLUMNS = ["Site", "Pit", "Rule", "Severity", "Tanggal", "Nilai", "Pesan", "Sejak"]
+
+_LATEST_SUMP_SQL = '''
+    SELECT s.Site AS site, s.Pit AS pit, s.Tanggal AS tanggal, s.Elevasi_Air AS elevasi,
+           s.Critical_Elevation AS critical, w.Error_Pct AS error_pct
+    FROM sump s
+    JOIN (SELECT Site, Pit, MAX(Tanggal) AS t FROM sump{where} GROUP BY Site, Pit) m
+      ON s.Site = m.Site AND s.Pit = m.Pit AND s.Tanggal = m.t
+    LEFT JOIN water_balance w ON w.Site = s.Site AND w.Pit = s.Pit AND w.Tanggal = s.Tanggal'''
+
+_LATEST_POMPA_SQL = '''
+    SELECT p.Site AS site, p.Pit AS pit, p.Unit_Code AS unit, p.Tanggal AS tanggal,
+           p.Status_Operasi AS status
+    FROM pompa p
+    JOIN (SELECT Site, Pit, Unit_Code, MAX(Tanggal) AS t FROM pompa{where} GROUP BY Site, Pit, Unit_Code) m
+      ON p.Site = m.Site AND p.Pit = m.Pit AND p.Unit_Code = m.Unit_Code AND p.Tanggal = m.t'''
+
+
+def wb_error_flag(err):
+    """
+    True where the water-balance error is over tolerance or cannot be computed (NaN: no survey
+    the day before). Works on a scalar or a Series; the Dashboard banner and WB_ERROR share it.
+    """
+    err = pd.to_numeric(err, errors='coerce')
+    return pd.isna(err) | (err > WB_ERROR_TOLERANCE)
+
+def _read(session, sql, scope):
+    """Run `sql` ({where} = site filter of `scope`) and keep only the (Site, Pit) pairs in scope."""
+    if scope is None:
+        stmt = text(sql.format(where=""))
+        params = {}
+    else:
+        stmt = text(sql.format(where=" WHERE Site IN :sites")).bindparams(bindparam("sites", expanding=True))
+        params = {"sites": sorted({s for s, _ in scope})}
+    df = pd.DataFrame(session.execute(stmt, params).mappings().all())
+    if df.empty:
+        return df
+    df.columns = map(str.lower, df.columns)
+    df['tanggal'] = pd.to_datetime(df['tanggal'])
+    if scope is not None:
+        df = df[pd.MultiIndex.from_frame(df[['site', 'pit']]).isin(list(scope))]
+    return df
+
+def _frame(rule, df, nilai, pesan, tanggal=None):
+    severity, _ = RULES[rule]
+    return pd.DataFrame({
+        "Site": df['site'].values, "Pit": df['pit'].values, "Rule": rule, "Severity": severity,
+        "Tanggal": (df['tanggal'] if tanggal is None else tanggal).values, "Nilai": nilai, "Pesan": pesan,
+    })
+
+def evaluate(sump, pompa, today=None):
+    """
+    All rules for all pits at once. `sump`: latest survey row per pit (site, pit, tanggal, elevasi,
+    critical, error_pct); `pompa`: latest row per unit (site, pit, unit, tanggal, status).
+    Returns one row per (Site, Pit, Rule) that fires, without the Sejak column.
+    """
+    today = pd.Timestamp(today or date.today())
+    out = []
+    if not sump.empty:
+        elev = pd.to_numeric(sump['elevasi'], errors='coerce')
+        crit = pd.to_numeric(sump['critical'], errors='coerce')
+        err = pd.to_numeric(sump['error_pct'], errors='coerce')
+        age = (today - sump['tanggal']).dt.days
+
+        m = (crit > 0) & (elev >= crit)
+        out.append(_frame("ELEVASI_KRITIS", sump[m], elev[m].values,
+                          [f"Elevasi {e:.2f} m ≥ Critical {c:.2f} m" for e, c in zip(elev[m], crit[m])]))
+        m = wb_error_flag(err)
+        out.append(_frame("WB_ERROR", sump[m], err[m].values,
+                          ["Error tidak dapat dihitung (survey kemarin tidak ada)" if pd.isna(e)
+                           else f"Error {e:.1f}% (toleransi {WB_ERROR_TOLERANCE:.0f}%)" for e in err[m]]))
+        m = (age >= 1) & (age <= ACTIVE_DAYS)
+        out.append(_frame("SURVEY_HILANG", sump[m], age[m].values,
+                          [f"Survey terakhir {t:%d-%m-%Y} ({a} hari lalu)" for t, a in zip(sump['tanggal'][m], age[m])],
+                          tanggal=pd.Series(today, index=sump.index[m])))
+    if not pompa.empty:
+        # Hanya unit yang masih dilaporkan di tanggal pompa terakhir pit-nya
+        last = pompa.groupby(['site', 'pit'])['tanggal'].transform('max')
+        cur = pompa[(pompa['tanggal'] == last) & ((today - last).dt.days <= ACTIVE_DAYS)]
+        bd = cur[cur['status'].fillna('').str.startswith('Breakdown')]
+        if not bd.empty:
+            g = bd.sort_values('unit').groupby(['site', 'pit'], sort=False)
+            per_pit = g.agg(tanggal=('tanggal', 'max'), n=('unit', 'size'), units=('unit', ', '.join)).reset_index()
+            out.append(_frame("POMPA_BREAKDOWN", per_pit, per_pit['n'].values.astype(float),
+                              [f"{n} unit Breakdown: {u}" for n, u in zip(per_pit['n'], per_pit['units'])]))
+    out = [df for df in out if not df.empty]
+    if not out:
+        return pd.DataFrame(columns=COLUMNS[:-1])
+    return pd.concat(out, ignore_index=True)
+
+def refresh(session, scope=None, today=None):
+    """
+    Re-evaluate alerts for the (Site, Pit) pairs in `scope` (None = every pit) and replace their
+    rows in the alerts table. Sejak (first day an alert fired) is kept while the alert stays active.
+    Caller commits. Returns the number of active alerts in scope.
+    """
+    today = today or date.today()
+    if scope is not None:
+        scope = {(s, p) for s, p in scope if s is not None and p is not None}
+        if not scope:
+            return 0
+    new = evaluate(_read(session, _LATEST_SUMP_SQL, scope), _read(session, _LATEST_POMPA_SQL, scope), today)
+
+    old = load(session)
+    if scope is None:
+        session.execute(text("DELETE FROM alerts"))
+    else:
+        old = old[pd.MultiIndex.from_frame(old[['Site', 'Pit']]).isin(list(scope))] if not old.empty else old
+        session.execute(text("DELETE FROM alerts WHERE Site = :s AND Pit = :p"),
+                        [{"s": s, "p": p} for s, p in sorted(scope)])
+    if new.empty:
+        return 0
+    new = new.merge(old[['Site', 'Pit', 'Rule', 'Sejak']], on=['Site', 'Pit', 'Rule'], how='left')
+    new['Sejak'] = new['Sejak'].fillna(new['Tanggal'])
+    session.execute(text('''
+        INSERT INTO alerts (Site, Pit, Rule, Severity, Tanggal, Nilai, Pesan, Sejak)
+        VALUES (:Site, :Pit, :Rule, :Severity, :Tanggal, :Nilai, :Pesan, :Sejak)'''), [
+        dict(r, Tanggal=pd.Timestamp(r['Tanggal']).date(), Sejak=pd.Timestamp(r['Sejak']).date(), Nilai=None if pd.isna(r['Nilai']) else float(r['Nilai']))
+        for r in new[COLUMNS].to_dict('records')
+    ])
+    return len(new)
+
+def load(session):
+    """Active alerts (display-named), most severe first."""
+    df = pd.DataFrame(session.execute(text(
+        "SELECT Site, Pit, Rule, Severity, Tanggal, Nilai, Pesan, Sejak FROM alerts")).mappings().all())
+    if df.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    df.columns = COLUMNS
+    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
+    df['Sejak'] = pd.to_datetime(df['Sejak'])
+    df['Severity'] = pd.Categorical(df['Severity'], SEVERITY_ORDER, ordered=True)
+    return df.sort_values(['Severity', 'Site', 'Pit', 'Rule']).reset_index(drop=True)
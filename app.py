@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from datetime import date
+from datetime import date, timedelta
 import os
 import time
 
@@ -9,6 +9,13 @@ import time
 import database as db
 import processing as proc
 import ui
+import importer
+import exporter
+import writequeue
+import replica
+import perf
+import forecast
+import alerts
 
 # --- 1. CONFIG & SETUP ---
 st.set_page_config(
@@ -18,38 +25,49 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 ui.load_css()
+db.reset_roundtrips()  # hitung query DB per rerun (lihat caption di sidebar)
+perf.begin("rerun")    # span per rerun (panel Performance di tab Setting), no-op jika nonaktif
 
-# --- 2. SESSION STATE & DATA LOADING ---
-if 'data_sump' not in st.session_state or 'data_pompa' not in st.session_state:
-    try:
-        df_s, df_p = db.load_data()
-        st.session_state['data_sump'] = df_s
-        st.session_state['data_pompa'] = df_p
-    except Exception as e:
-        st.error(f"Gagal koneksi ke Neon DB: {e}")
-        st.stop()
-
+# --- 2. SESSION STATE & FILTER METADATA ---
 if 'logged_in' not in st.session_state: st.session_state['logged_in'] = False
 if 'username' not in st.session_state: st.session_state['username'] = ''
 if 'is_admin' not in st.session_state: st.session_state['is_admin'] = False # State khusus admin utama
 
-if 'site_map' not in st.session_state:
-    # Build dynamic site map from DB data
-    if not st.session_state.data_sump.empty:
-        existing_sites = st.session_state.data_sump['Site'].unique()
-        current_map = {}
-        for s in existing_sites:
-            pits = st.session_state.data_sump[st.session_state.data_sump['Site'] == s]['Pit'].unique().tolist()
-            current_map[s] = pits
-        st.session_state['site_map'] = current_map
-    else:
-        st.session_state['site_map'] = {}
+# Snapshot data + index filter (site -> pit -> unit, tahun/bulan) dipakai bersama oleh semua
+# session (read-only), invalidasi via versi data
+snapshot = db.get_shared_snapshot()
+wq = writequeue.get_write_queue()
+# Mode replica lokal: baca/tulis ke SQLite lokal, worker sync dua arah dengan Neon
+rsync = replica.get_replica_sync() if db.REPLICA_PATH else None
+try:
+    fidx = snapshot.filter_index()
+except Exception as e:
+    st.error(f"Gagal koneksi ke Neon DB: {e}")
+    st.stop()
+
+# Alert strip: semua site/pit (bukan hanya filter sidebar), dari tabel alerts
+try:
+    ui.render_alert_strip(snapshot.alerts())
+except Exception as e:
+    st.warning(f"Alert belum bisa dimuat: {e}")
+
+def reset_data_cache():
+    """Paksa reload index filter & snapshot data pada rerun berikutnya."""
+    snapshot.invalidate()
+
+def register_new_row(key, df_row):
+    """
+    Delta-update setelah insert: tambahkan baris ke snapshot bersama (copy-on-write)
+    dan ke index site/pit/unit/bulan tanpa reload tabel.
+    """
+    snapshot.apply_row('sump' if key == 'data_sump' else 'pompa', df_row)
 
 # --- 3. SIDEBAR ---
 with st.sidebar:
     # --- LOGO BARA TAMA WIJAYA ---
     try:
-        st.image("1.bara tama wijaya.jpg", use_container_width=True)
+        with perf.span("ui.logo"):
+            st.image("1.bara tama wijaya.jpg", use_container_width=True)
     except:
         st.warning("Logo '1.bara tama wijaya.jpg' tidak ditemukan.")
     
@@ -70,42 +88,79 @@ with st.sidebar:
     st.divider()
     
     # FILTERS
-    current_sites = list(st.session_state['site_map'].keys())
+    current_sites = fidx.sites()
     selected_site = st.selectbox("📍 Pilih Site", current_sites) if current_sites else None
     
     pit_options = ["All Sumps"]
-    if selected_site and selected_site in st.session_state['site_map']: 
-        pit_options += st.session_state['site_map'][selected_site]
+    if selected_site:
+        pit_options += fidx.pits(selected_site)
     selected_pit = st.selectbox("💧 Pilih Sump", pit_options)
+    pit_filter = None if selected_pit == "All Sumps" else selected_pit
 
     # Unit Filter Logic
     unit_options = ["All Units"]
-    if selected_pit != "All Sumps" and not st.session_state.data_pompa.empty:
-        raw_p = st.session_state.data_pompa
-        avail_units = raw_p[(raw_p['Site'] == selected_site) & (raw_p['Pit'] == selected_pit)]['Unit Code'].unique().tolist()
-        unit_options += sorted(avail_units)
+    if pit_filter:
+        unit_options += fidx.units(selected_site, pit_filter)
     selected_unit = st.selectbox("🚜 Pilih Unit Pompa", unit_options)
     
-    # Date Filter
-    avail_years = sorted(st.session_state.data_sump['Tanggal'].dt.year.unique(), reverse=True) if not st.session_state.data_sump.empty else [date.today().year]
-    sel_year = st.selectbox("📅 Tahun", avail_years)
-    month_map = {1:"Januari", 2:"Februari", 3:"Maret", 4:"April", 5:"Mei", 6:"Juni", 7:"Juli", 8:"Agustus", 9:"September", 10:"Oktober", 11:"November", 12:"Desember"}
-    curr_m = date.today().month
-    sel_month_name = st.selectbox("🗓️ Bulan", list(month_map.values()), index=curr_m-1)
-    sel_month_int = [k for k,v in month_map.items() if v==sel_month_name][0]
-
-# --- 4. DATA PROCESSING ---
-df_wb_dash, df_p_display, title_suffix = proc.process_water_balance(
-    st.session_state.data_sump, st.session_state.data_pompa,
-    selected_site, selected_pit, selected_unit, sel_year, sel_month_int
-)
+    # Date Filter: satu bulan, atau rentang bebas (1 hari s/d multi-tahun)
+    period_mode = st.radio("⏱️ Mode Periode", ["Bulanan", "Rentang Tanggal"], horizontal=True)
+    if period_mode == "Bulanan":
+        avail_years = fidx.years(selected_site, pit_filter) or [date.today().year]
+        sel_year = st.selectbox("📅 Tahun", avail_years)
+        month_map = {1:"Januari", 2:"Februari", 3:"Maret", 4:"April", 5:"Mei", 6:"Juni", 7:"Juli", 8:"Agustus", 9:"September", 10:"Oktober", 11:"November", 12:"Desember"}
+        curr_m = date.today().month
+        # Default ke bulan terakhir yang ada datanya jika bulan ini kosong di tahun terpilih
+        data_months = [m for _, m in fidx.months(selected_site, pit_filter, sel_year)]
+        if data_months and curr_m not in data_months:
+            curr_m = data_months[-1]
+        sel_month_name = st.selectbox("🗓️ Bulan", list(month_map.values()), index=curr_m-1)
+        sel_month_int = [k for k,v in month_map.items() if v==sel_month_name][0]
+        period_start = date(sel_year, sel_month_int, 1)
+        period_end = (pd.Timestamp(period_start) + pd.offsets.MonthEnd(0)).date()
+        period_label = f"{sel_month_name} {sel_year}"
+    else:
+        default_range = (date.today() - timedelta(days=365), date.today())
+        sel_range = st.date_input("📆 Rentang Tanggal", default_range) or default_range
+        # Saat user baru memilih tanggal awal, date_input mengembalikan 1 tanggal saja
+        period_start, period_end = (sel_range[0], sel_range[-1]) if isinstance(sel_range, (tuple, list)) else (sel_range, sel_range)
+        period_label = f"{period_start:%d-%m-%Y} s/d {period_end:%d-%m-%Y}"
+    chart_agg = st.selectbox("📈 Agregasi Grafik", ui.CHART_AGG_OPTIONS)
 
-# --- 5. TABS ---
-st.markdown(f"## 🏢 Bara Tama Wijaya: {selected_site}")
-tab_dash, tab_input, tab_db, tab_admin = st.tabs(["📊 Dashboard", "📝 Input (Admin)", "📂 Database", "⚙️ Setting (Super Admin)"])
+# --- 4. DATA LOADING (Filter site/pit/periode di-push ke SQL) ---
+# Unit tidak di-push ke SQL: Volume Out butuh total semua pompa di Pit
+# Ikut dimuat 1 hari sebelum periode (lag) agar water balance yang dihitung ulang punya Volume Kemarin
+lag_start = period_start - timedelta(days=1)
+wb_pending = False
+if selected_site:
+    try:
+        df_s, df_p = snapshot.load(site=selected_site, pit=pit_filter, start=lag_start, end=period_end)
+        # Baris yang masih di antrian write-behind langsung ikut tampil; water balance-nya belum ada di DB
+        wb_pending = wq.has_pending(site=selected_site, pit=pit_filter, start=lag_start, end=period_end)
+        df_s, df_p = wq.overlay(df_s, df_p, site=selected_site, pit=pit_filter, start=lag_start, end=period_end)
+    except Exception as e:
+        st.error(f"Gagal koneksi ke Neon DB: {e}")
+        st.stop()
+else:
+    df_s, df_p = pd.DataFrame(columns=db.SUMP_COLUMNS), pd.DataFrame(columns=db.POMPA_COLUMNS)
+# Referensi ke frame bersama (bukan salinan) - jangan dimodifikasi in-place
+st.session_state['data_sump'] = df_s
+st.session_state['data_pompa'] = df_p
+
+# --- 5. VIEWS ---
+DEFAULT_PAGE_ROWS = 100   # baris per halaman tabel Database / Bulk Edit (paginasi di DB)
+# Setiap view adalah fragment: interaksi widget di dalamnya hanya me-rerun fragment itu,
+# bukan sidebar / processing / tab lain. st.rerun() tetap me-rerun seluruh app (setelah simpan data).
+
+@st.fragment
+@perf.traced("view.dashboard")
+def dashboard_view():
+    # Processing water balance hanya jalan saat tab Dashboard aktif
+    df_wb_dash, df_p_display, title_suffix = proc.process_water_balance(
+        st.session_state.data_sump, st.session_state.data_pompa,
+        selected_site, selected_pit, selected_unit, start=period_start, end=period_end, recompute=wb_pending
+    )
 
-# TAB 1: DASHBOARD
-with tab_dash:
     if df_wb_dash.empty:
         st.warning("⚠️ Data belum tersedia untuk filter ini. Silakan generate dummy data di tab Setting atau input manual.")
     else:
@@ -116,14 +171,15 @@ with tab_dash:
         
         # --- METRICS ---
         c1, c2, c3, c4, c5 = st.columns(5)
-        c1.metric("Elevasi Air", f"{last['Elevasi Air (m)']} m", f"Crit: {last['Critical Elevation (m)']}")
+        # Frame kompak (float32): format eksplisit agar tidak tampil 8.550000190734863
+        c1.metric("Elevasi Air", f"{last['Elevasi Air (m)']:.2f} m", f"Crit: {last['Critical Elevation (m)']:.2f}")
         c2.metric("Vol Survey", f"{last['Volume Air Survey (m3)']:,.0f} m³")
         
         # Rain metrics
         rain_today = last['Curah Hujan (mm)']
         rain_mtd = df_wb_dash['Curah Hujan (mm)'].sum()
-        c3.metric("Rain Today", f"{rain_today} mm")
-        c4.metric("Rain MTD", f"{rain_mtd} mm")
+        c3.metric("Rain Today", f"{rain_today:,.1f} mm")
+        c4.metric("Rain MTD" if period_mode == "Bulanan" else "Rain Periode", f"{rain_mtd:,.1f} mm")
         
         # Status Box
         status_txt = "AMAN"; clr = "#27ae60"
@@ -136,7 +192,7 @@ with tab_dash:
         last_error = last['Error %']
         is_wb_critical = False
         
-        if last_error > 5.0 or pd.isna(last_error):
+        if alerts.wb_error_flag(last_error):
             is_wb_critical = True
             st.markdown(f"""
             <div class="wb-alert" style='background-color: #ffcccc; color: #cc0000; padding: 10px; border-radius: 5px; font-weight: bold; margin-bottom: 10px; border: 1px solid #ff0000;'>
@@ -146,7 +202,7 @@ with tab_dash:
             """, unsafe_allow_html=True)
             
         # --- CHARTS (From ui.py) ---
-        ui.render_charts(df_wb_dash, df_p_display, title_suffix)
+        ui.render_charts(df_wb_dash, df_p_display, title_suffix, agg=chart_agg)
 
         # --- DETAIL TABLE ---
         with st.expander("📋 Lihat Detail Angka Water Balance"):
@@ -193,8 +249,8 @@ with tab_dash:
                 <h4>{header_text}</h4>
                 <ul>
                     <li><b>Status Water Balance:</b> Error {last_error:.1f}%.</li>
-                    <li><b>Curah Hujan Hari Ini:</b> {rain_today} mm.</li>
-                    <li><b>Status Elevasi:</b> {last['Elevasi Air (m)']} m.</li>
+                    <li><b>Curah Hujan Hari Ini:</b> {rain_today:,.1f} mm.</li>
+                    <li><b>Status Elevasi:</b> {last['Elevasi Air (m)']:.2f} m.</li>
                 </ul>
             </div>
             """, unsafe_allow_html=True)
@@ -223,8 +279,85 @@ with tab_dash:
             
             st.markdown("</div>", unsafe_allow_html=True)
 
-# TAB 2: INPUT
-with tab_input:
+    # --- FORECAST (tidak ikut filter periode: selalu dari data terbaru site) ---
+    if selected_site:
+        st.markdown("---")
+        st.subheader("🔮 Forecast Elevasi (Monte Carlo)")
+        horizon = st.slider("Horizon Forecast (hari)", 7, 30, forecast.DEFAULT_HORIZON, key="fc_horizon")
+        fc_start = date.today() - timedelta(days=forecast.HISTORY_DAYS)
+        df_fs, df_fp = snapshot.load(site=selected_site, start=fc_start)
+        df_fs, df_fp = wq.overlay(df_fs, df_fp, site=selected_site, start=fc_start)
+        ui.render_forecast(df_fs, df_fp, horizon, pit_filter)
+
+def _page_step(pager, cursor):
+    """on_click pager: cursor = halaman berikutnya, None = kembali satu halaman."""
+    if cursor is None:
+        pager["cursors"].pop()
+    else:
+        pager["cursors"].append(cursor)
+
+def paged_table(table, key, editable=False):
+    """
+    Keyset-paginated table for the sidebar filters: sort & filters run in SQL and only the visible
+    page is loaded. With `editable` the page goes into st.data_editor and is saved on its own.
+    """
+    cols = db.SUMP_COLUMNS if table == "sump" else db.POMPA_COLUMNS
+    c1, c2, c3 = st.columns([2, 1, 1])
+    sort = c1.selectbox("Urutkan", cols, key=f"{key}_sort")
+    descending = c2.radio("Arah", ["Turun", "Naik"], horizontal=True, key=f"{key}_dir") == "Turun"
+    size = c3.selectbox("Baris / halaman", db.PAGE_SIZES, index=db.PAGE_SIZES.index(DEFAULT_PAGE_ROWS), key=f"{key}_size")
+    filters = dict(site=selected_site, pit=pit_filter, unit=None if selected_unit == "All Units" else selected_unit,
+                   start=period_start, end=period_end)
+
+    # Kembali ke halaman 1 bila filter/urutan berubah
+    sig = (sort, descending, size, tuple(filters.items()))
+    pager = st.session_state.setdefault(f"{key}_pager", {"sig": None, "cursors": [None]})
+    if pager["sig"] != sig:
+        pager.update(sig=sig, cursors=[None])
+    page_no = len(pager["cursors"])
+    page, next_cursor = db.load_page(table, **filters, sort=sort, descending=descending,
+                                     after=pager["cursors"][-1], limit=size, with_wb=not editable)
+    total = db.count_rows(table, **filters)
+
+    if editable:
+        # Key ikut halaman & versi data: edit yang belum disimpan tidak terbawa ke halaman lain
+        edited = st.data_editor(page, num_rows="dynamic", use_container_width=True,
+                                key=f"{key}_ed_{hash(sig)}_{page_no}_{snapshot.current_version()}")
+    else:
+        st.dataframe(page, use_container_width=True, hide_index=True)
+
+    n1, n2, n3 = st.columns([1, 2, 1])
+    n1.button("⬅️ Sebelumnya", key=f"{key}_prev", disabled=page_no == 1,
+              on_click=_page_step, args=(pager, None), use_container_width=True)
+    n2.caption(f"Halaman {page_no:,} dari {max(1, -(-total // size)):,} · {total:,} baris sesuai filter")
+    n3.button("Berikutnya ➡️", key=f"{key}_next", disabled=next_cursor is None,
+              on_click=_page_step, args=(pager, next_cursor), use_container_width=True)
+
+    if editable and st.button(f"💾 UPDATE {table.upper()} DB", key=f"{key}_save"):
+        # Hanya baris halaman ini yang berubah (insert/update/delete) yang dikirim ke DB
+        ups, dels = db.build_changeset(table, page, edited)
+        n_up, n_del, version = db.apply_changeset(table, ups, dels)
+        snapshot.apply_changeset(table, ups, dels, version)
+        st.success(f"Updated! ({n_up} upsert, {n_del} delete)"); st.rerun()
+
+@st.fragment
+@perf.traced("view.overview")
+def overview_view():
+    # Semua site/pit dari satu query agregat (bukan filter sidebar)
+    c1, c2 = st.columns([1, 2])
+    as_of = c1.date_input("📅 Per Tanggal", date.today(), key="ov_as_of")
+    metric = c2.selectbox("🎨 Warna Matrix", list(ui.OVERVIEW_METRICS), key="ov_metric")
+    month_start = as_of.replace(day=1)
+    try:
+        df_ov = proc.overview_metrics(snapshot.overview(month_start, as_of))
+    except Exception as e:
+        st.error(f"Gagal memuat overview: {e}")
+        return
+    ui.render_overview(df_ov, metric, f"{month_start:%d-%m-%Y} s/d {as_of:%d-%m-%Y}")
+
+@st.fragment
+@perf.traced("view.input")
+def input_view():
     # Siapapun yg login bisa input (User Biasa atau Admin)
     # Jika belum login sama sekali, tampilkan form login
     if not st.session_state['logged_in']:
@@ -251,11 +384,15 @@ with tab_input:
                     st.error("Username/Password salah")
     else:
         st.info(f"Input Data Harian (User: {st.session_state['username']})")
+        write_behind = st.toggle("⚡ Simpan di background (write-behind)", key="write_behind",
+                                 help="Form langsung selesai; data dikirim ke Neon oleh worker, dengan retry bila koneksi putus.")
+        if write_behind or wq.depth() or wq.status["failed_rows"]:
+            write_queue_status()
         with st.expander("➕ Input Harian Baru", expanded=True):
             d_in = st.date_input("Tanggal", date.today())
             
             # --- FIXED LOGIC FOR SUMP SELECTION ---
-            existing_sumps = st.session_state['site_map'].get(selected_site, [])
+            existing_sumps = fidx.pits(selected_site)
             p_in = None 
             
             if not existing_sumps:
@@ -295,12 +432,13 @@ with tab_input:
                                 "Groundwater (m3)": gw_v,
                                 "Status": "BAHAYA" if e_a > c_e else "AMAN" # Check against c_e
                             }
-                            db.save_new_sump(new)
-                            
-                            st.session_state['data_sump'], _ = db.load_data()
-                            st.session_state.pop('site_map', None)
-                            
-                            st.success(f"Sump '{p_in}' Saved!")
+                            if write_behind:
+                                wq.enqueue('sump', new)
+                                st.success(f"Sump '{p_in}' masuk antrian!")
+                            else:
+                                row = db.save_new_sump(new)
+                                register_new_row('data_sump', row)
+                                st.success(f"Sump '{p_in}' Saved!")
                             st.rerun()
 
                 # --- KOLOM KANAN: DATA POMPA ---
@@ -344,50 +482,88 @@ with tab_input:
                                 "Status Operasi": status_ops,
                                 "Remarks": ket_rem
                             }
-                            db.save_new_pompa(newp)
-                            _, st.session_state['data_pompa'] = db.load_data() # Reload
-                            st.success(f"Pompa '{p_in}' Saved! (Status: {status_ops})")
+                            if write_behind:
+                                wq.enqueue('pompa', newp)
+                                st.success(f"Pompa '{p_in}' masuk antrian! (Status: {status_ops})")
+                            else:
+                                row = db.save_new_pompa(newp)
+                                register_new_row('data_pompa', row)
+                                st.success(f"Pompa '{p_in}' Saved! (Status: {status_ops})")
                             st.rerun()
             else:
                 if not existing_sumps:
                     st.info("Silakan ketik nama Sump baru di atas untuk memulai.")
 
-        st.divider()
-        st.markdown("### 🛠️ Bulk Edit (Delete Data here)")
-        st.caption("Tips: Select rows and press 'Delete' on your keyboard to remove data. Click Update to save changes.")
-        
-        t1, t2 = st.tabs(["Edit Sump", "Edit Pompa"])
-        with t1:
-            curr_s = st.session_state.data_sump[st.session_state.data_sump['Site']==selected_site]
-            ed_s = st.data_editor(curr_s, num_rows="dynamic", key="es")
-            
-            if st.button("💾 UPDATE SUMP DB"):
-                full_s = pd.concat([st.session_state.data_sump[st.session_state.data_sump['Site']!=selected_site], ed_s], ignore_index=True)
-                db.overwrite_full_db(full_s, st.session_state.data_pompa)
-                st.session_state['data_sump'] = full_s
-                st.session_state.pop('site_map', None)
-                st.success("Updated!"); st.rerun()
-                
-        with t2:
-            curr_p = st.session_state.data_pompa[st.session_state.data_pompa['Site']==selected_site]
-            ed_p = st.data_editor(curr_p, num_rows="dynamic", key="ep")
-            
-            if st.button("💾 UPDATE POMPA DB"):
-                full_p = pd.concat([st.session_state.data_pompa[st.session_state.data_pompa['Site']!=selected_site], ed_p], ignore_index=True)
-                db.overwrite_full_db(st.session_state.data_sump, full_p)
-                st.session_state['data_pompa'] = full_p
-                st.success("Updated!"); st.rerun()
+        bulk_edit_view()
 
-# TAB 3: DATABASE
-with tab_db:
-    st.info("📂 Source: Neon PostgreSQL")
-    c1, c2 = st.columns(2)
-    c1.download_button("Download Sump CSV", st.session_state.data_sump.to_csv(index=False), "sump.csv")
-    c2.download_button("Download Pompa CSV", st.session_state.data_pompa.to_csv(index=False), "pompa.csv")
-    st.dataframe(st.session_state.data_sump)
+@st.fragment(run_every=5)
+def write_queue_status():
+    # Refresh sendiri tiap 5 detik tanpa me-rerun halaman
+    stt = wq.status
+    parts = [f"📮 Antrian: {wq.depth()} baris"]
+    if stt["last_flush_at"]:
+        parts.append(f"flush terakhir {time.strftime('%H:%M:%S', time.localtime(stt['last_flush_at']))} ({stt['last_flush_rows']} baris)")
+    st.caption(" · ".join(parts))
+    if stt["last_error"] and stt["next_retry_at"]:
+        wait = max(0, int(stt["next_retry_at"] - time.time()))
+        st.warning(f"Neon belum bisa dihubungi, coba lagi dalam {wait} dtk: {stt['last_error']}")
+    if stt["failed_rows"]:
+        st.error(f"{stt['failed_rows']} baris ditolak database (lihat tabel queue di {wq.path}).")
 
-# TAB 4: ADMIN / SETTINGS (RESTRICTED)
-with tab_admin:
+@st.fragment
+@perf.traced("view.bulk_edit")
+def bulk_edit_view():
+    st.divider()
+    st.markdown("### 🛠️ Bulk Edit (Delete Data here)")
+    st.caption("Tips: Select rows and press 'Delete' on your keyboard to remove data. Click Update to save changes.")
+    st.caption(f"Data yang diedit mengikuti filter sidebar: {selected_site} / {selected_pit} / {period_label}. "
+               "Setiap halaman disimpan sendiri - simpan dulu sebelum pindah halaman.")
+    
+    t1, t2 = st.tabs(["Edit Sump", "Edit Pompa"])
+    with t1:
+        paged_table("sump", "es", editable=True)
+    with t2:
+        paged_table("pompa", "ep", editable=True)
+
+@st.fragment
+@perf.traced("view.database")
+def database_view():
+    st.info("📂 Source: Replica lokal (sync ke Neon)" if db.REPLICA_PATH else "📂 Source: Neon PostgreSQL")
+    st.caption(f"Filter: {selected_site} / {selected_pit} / {period_label}")
+
+    # --- EXPORT: file dibuat saat tombol diklik (callable), dibaca dari DB per chunk ---
+    with st.container(border=True):
+        st.markdown("#### ⬇️ Export Data")
+        e1, e2, e3 = st.columns(3)
+        exp_data = e1.selectbox("Data", list(exporter.DATASETS), key="exp_data")
+        exp_fmt = e2.selectbox("Format", list(exporter.FORMATS), key="exp_fmt",
+                               help="Parquet: terkompresi & bertipe (pandas/Excel Power Query). CSV: universal.")
+        sites = fidx.sites()
+        exp_site = e3.selectbox("Site", ["Semua Site"] + sites, key="exp_site",
+                                index=sites.index(selected_site) + 1 if selected_site in sites else 0)
+        exp_site = None if exp_site == "Semua Site" else exp_site
+        e4, e5 = st.columns(2)
+        exp_pit = e4.selectbox("Sump", ["All Sumps"] + (fidx.pits(exp_site) if exp_site else []), key="exp_pit")
+        exp_pit = None if exp_pit == "All Sumps" else exp_pit
+        exp_range = e5.date_input("Rentang Tanggal", (period_start, period_end), key="exp_range")
+        exp_start, exp_end = (exp_range[0], exp_range[-1]) if isinstance(exp_range, (tuple, list)) and exp_range else (None, None)
+
+        def build_export():
+            return exporter.export_file(exp_data, exp_fmt, exp_site, exp_pit, exp_start, exp_end)
+
+        st.download_button(
+            f"⬇️ Download {exp_data} ({exp_fmt})", build_export,
+            file_name=exporter.file_name(exp_data, exp_fmt, exp_site, exp_pit, exp_start, exp_end),
+            mime=exporter.FORMATS[exp_fmt][1], on_click="ignore", type="primary"
+        )
+
+    # Telusuri per halaman langsung dari DB; data lengkap lewat export di atas
+    browse = st.radio("Tabel", ["Sump", "Pompa"], horizontal=True, key="db_table")
+    paged_table(browse.lower(), f"db_{browse.lower()}")
+
+@st.fragment
+@perf.traced("view.admin")
+def admin_view():
     st.markdown("### ⚙️ System Settings")
     
     # --- LOGIKA OTENTIKASI KHUSUS ADMIN ---
@@ -421,26 +597,56 @@ with tab_admin:
         # Section 1: Manage Sites
         st.markdown("#### 🏗️ Manage Sites")
         ns = st.text_input("New Site Name")
-        if st.button("Add Site") and ns: st.session_state['site_map'][ns] = []
+        if st.button("Add Site") and ns:
+            snapshot.add_site(ns)
+            st.rerun()  # sidebar ada di luar fragment
         
         st.divider()
         
-        # Section 2: Developer Tools
+        # Section 2: Bulk Import
+        st.markdown("#### 📥 Import Data (CSV / Excel)")
+        st.caption("Header kolom boleh memakai nama tampilan (mis. 'Elevasi Air (m)') atau nama kolom DB (mis. 'elevasi_air'). Baris dengan Tanggal/Site/Pit sama akan di-update.")
+        imp_table = st.radio("Tabel Tujuan", ["sump", "pompa"], horizontal=True, key="imp_table")
+        imp_file = st.file_uploader("File CSV / XLSX", type=["csv", "xlsx"], key="imp_file")
+        if imp_file is not None and st.button("Mulai Import", type="primary"):
+            prog = st.empty()
+            try:
+                res = importer.import_file(
+                    imp_table, imp_file, imp_file.name,
+                    progress=lambda n: prog.caption(f"Staging {n:,} baris...")
+                )
+                reset_data_cache()
+                st.success(f"Import selesai: {res['rows']:,} baris ({res['rows_per_sec']:,} baris/detik, {res['seconds']} detik).")
+                if res['rejected'] or res['bad_values']:
+                    st.warning(f"{res['rejected']:,} baris ditolak (Tanggal/Site/Pit kosong atau tidak valid), {res['bad_values']:,} nilai angka tidak valid dikosongkan.")
+            except Exception as e:
+                st.error(f"Import gagal: {e}")
+        
+        st.divider()
+        
+        # Section 3: Developer Tools
         st.markdown("#### 🧪 Developer Tools")
         
         c_dev1, c_dev2 = st.columns(2)
         
         with c_dev1:
             st.info("Gunakan ini untuk mengisi data grafik.")
+            # Skala bisa dinaikkan untuk load test (jutaan baris pompa); semua nama diberi prefix dummy_
+            g1, g2, g3, g4, g5 = st.columns(5)
+            n_sites = g1.number_input("Site", 1, 100, 3)
+            n_pits = g2.number_input("Pit/site", 1, 50, 2)
+            n_units = g3.number_input("Pompa/pit", 1, 20, 2)
+            n_days = g4.number_input("Hari", 1, 3650, 30)
+            seed = g5.number_input("Seed", 0, 2**31 - 1, 0)
+            st.caption(f"≈ {n_sites * n_pits * n_days:,} baris sump, {n_sites * n_pits * n_units * n_days:,} baris pompa")
             if st.button("Generate Dummy Data", type="primary", use_container_width=True):
                 try:
                     with st.spinner("Generating data..."):
-                        db.generate_dummy_data()
-                        df_s, df_p = db.load_data()
-                        st.session_state['data_sump'] = df_s
-                        st.session_state['data_pompa'] = df_p
-                        st.session_state.pop('site_map', None) 
-                    st.success("Dummy data generated!")
+                        t0 = time.perf_counter()
+                        n = db.generate_dummy_data(n_sites, n_pits, n_units, n_days, seed=seed)
+                        reset_data_cache()
+                    st.success(f"Dummy data generated! {n['sump']:,} baris sump + {n['pompa']:,} baris pompa "
+                               f"dalam {time.perf_counter() - t0:.1f} dtk")
                     st.rerun()
                 except Exception as e:
                     st.error(f"Error: {e}")
@@ -451,30 +657,60 @@ with tab_admin:
             if st.button("Delete Dummy Data", type="secondary", use_container_width=True):
                 with st.spinner("Cleaning up..."):
                     db.delete_dummy_data()
-                    df_s, df_p = db.load_data()
-                    st.session_state['data_sump'] = df_s
-                    st.session_state['data_pompa'] = df_p
-                    st.session_state.pop('site_map', None) 
+                    reset_data_cache()
                 st.warning("Dummy data deleted.")
                 st.rerun()
 
+        if rsync:
+            with st.expander("🛰️ Replica Lokal (Offline-First)"):
+                st.caption(f"File replica: {db.REPLICA_PATH}. Sync otomatis tiap {replica.SYNC_SECONDS} dtk saat online.")
+                if st.button("🔄 Sync Sekarang"):
+                    try:
+                        stats = rsync.sync_now()
+                        st.success(f"Sync selesai: {stats['pushed']} baris dikirim, {stats['pulled']} baris diterima.")
+                    except Exception as e:
+                        st.error(f"Neon tidak bisa dihubungi, data tetap dilayani dari replica lokal: {e}")
+
+        with st.expander("⏱️ Performance (Tracing per Rerun)"):
+            st.caption("Span waktu query DB, tahap processing dan grafik per rerun. "
+                       "Berlaku untuk seluruh proses; saat nonaktif overhead hampir nol.")
+            c_on, c_log = st.columns(2)
+            perf.set_enabled(
+                enabled=c_on.toggle("Aktifkan tracing", value=perf.ENABLED),
+                log_json=c_log.toggle("Log JSON ke stderr", value=perf.LOG_JSON),
+            )
+            traces = perf.history()
+            if not traces:
+                st.info("Belum ada rerun yang direkam. Aktifkan tracing lalu buka Dashboard.")
+            else:
+                n_last = st.slider("Rerun terakhir", 1, len(traces), min(50, len(traces)))
+                traces = traces[-n_last:]
+                st.markdown("##### Percentil per span")
+                st.dataframe(perf.percentiles(traces), hide_index=True, use_container_width=True)
+                st.markdown("##### Rerun terakhir")
+                st.dataframe(perf.rerun_table(traces), hide_index=True, use_container_width=True)
+                if st.button("Hapus riwayat tracing"):
+                    perf.clear()
+                    st.rerun()
+
+        with st.expander("📦 Memory Footprint (Data di Memori)"):
+            st.dataframe(db.memory_report({
+                "Sump": st.session_state.data_sump, "Pompa": st.session_state.data_pompa
+            }), hide_index=True, use_container_width=True)
+            n_entries, n_bytes = snapshot.memory_usage()
+            st.caption(f"Snapshot bersama: {n_entries} filter di-cache, total {n_bytes / 1e6:,.2f} MB.")
+
         st.divider()
         st.markdown("#### ⚠️ Danger Zone")
         
         # --- NEW DATABASE HELPER ---
-        with st.expander("🛠️ Update Struktur Database (Wajib Klik Sekali)"):
-            st.warning("Klik tombol ini JIKA Anda baru saja menambahkan kolom Status/Remarks dan belum update database.")
-            if st.button("Tambah Kolom Status ke Tabel Pompa"):
+        with st.expander("🛠️ Update Struktur Database (Migrasi Schema)"):
+            st.warning("Migrasi berjalan otomatis saat aplikasi start. Klik tombol ini untuk menjalankan ulang secara manual.")
+            if st.button("Jalankan Migrasi Schema"):
                 try:
-                    if hasattr(db, 'conn'):
-                        cur = db.conn.cursor()
-                        cur.execute('ALTER TABLE pompa ADD COLUMN IF NOT EXISTS "Status Operasi" TEXT;')
-                        cur.execute('ALTER TABLE pompa ADD COLUMN IF NOT EXISTS "Remarks" TEXT;')
-                        db.conn.commit()
-                        cur.close()
-                        st.success("Sukses! Kolom Status & Remarks sudah ditambahkan.")
-                    else:
-                        st.error("Koneksi DB tidak ditemukan di modul database.")
+                    db.init_db()
+                    reset_data_cache()
+                    st.success(f"Sukses! Schema database di versi {db.migrations.LATEST_VERSION}.")
                 except Exception as e:
                     st.error(f"Gagal update DB: {e}")
 
@@ -485,3 +721,32 @@ with tab_admin:
                     db.reset_db()
                     st.session_state.clear()
                 st.success("Database has been reset. Please refresh the page.")
+
+# --- 6. TABS ---
+st.markdown(f"## 🏢 Bara Tama Wijaya: {selected_site}")
+# on_change="rerun": hanya isi tab yang sedang dibuka yang dijalankan (tab.open)
+tab_dash, tab_over, tab_input, tab_db, tab_admin = st.tabs(
+    ["📊 Dashboard", "🗺️ Overview", "📝 Input (Admin)", "📂 Database", "⚙️ Setting (Super Admin)"],
+    key="main_tab", on_change="rerun"
+)
+
+with tab_dash:
+    if tab_dash.open: dashboard_view()
+with tab_over:
+    if tab_over.open: overview_view()
+with tab_input:
+    if tab_input.open: input_view()
+with tab_db:
+    if tab_db.open: database_view()
+with tab_admin:
+    if tab_admin.open: admin_view()
+
+if rsync:
+    stt = rsync.status
+    if stt["last_error"]:
+        st.sidebar.warning(f"🛰️ Offline - data dari replica lokal. Sync dicoba lagi otomatis ({stt['last_error']})")
+    elif stt["last_sync_at"]:
+        st.sidebar.caption(f"🛰️ Sync Neon {time.strftime('%H:%M:%S', time.localtime(stt['last_sync_at']))} "
+                           f"(↑{stt['pushed']} ↓{stt['pulled']})")
+st.sidebar.caption(f"🔌 DB round-trips rerun ini: {db.roundtrips()}")
+perf.end()
@@ -0,0 +1,143 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import processing as proc
+
+# --- BATCH WATER BALANCE (CLI, tanpa browser) ---
+# Untuk rekonsiliasi akhir bulan / job malam: data dimuat sekali (DB atau snapshot CSV/Parquet
+# dari tab Database), dipecah per (site, pit, bulan), dihitung paralel di process pool, lalu
+# hasilnya digabung ke satu file.
+#
+#   python batch.py --out rekon_2026.parquet --daily wb_harian_2026.parquet --start 2026-01-01 --end 2026-12-31
+#   python batch.py --sump sump.parquet --pompa pompa.parquet --out rekon.csv --workers 8
+
+
+def _read_file(path):
+    return pd.read_parquet(path) if path.lower().endswith(".parquet") else pd.read_csv(path)
+
+def load_snapshot(sump_path, pompa_path):
+    """Sump/pompa snapshot files (display or DB column names) -> display-named frames."""
+    import importer
+    import database as db
+
+    frames = []
+    for table, path in (("sump", sump_path), ("pompa", pompa_path)):
+        col_map, _ = db._TABLES[table]
+        df, _, _ = importer.normalize_chunk(table, _read_file(path))
+        df = df.rename(columns=col_map)
+        df['Tanggal'] = pd.to_datetime(df['Tanggal'])
+        frames.append(df.reset_index(drop=True))
+    return tuple(frames)
+
+def _scope(df, site=None, start=None, end=None):
+    mask = pd.Series(True, index=df.index)
+    if site:
+        mask &= df['Site'] == site
+    if start is not None:
+        mask &= df['Tanggal'] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df['Tanggal'] <= pd.Timestamp(end)
+    return df[mask]
+
+def load_db(site=None, start=None, end=None):
+    """Sump/pompa from the database (same filters as the app), plus the lag day before `start`."""
+    import database as db
+
+    lag_start = pd.Timestamp(start) - pd.Timedelta(days=1) if start is not None else None
+    df_s, df_p = db.load_data(site=site, start=lag_start, end=end)
+    return db.expand_frame(df_s), db.expand_frame(df_p)
+
+def make_partitions(df_s, df_p):
+    """
+    Yield (site, pit, month, sump rows, pump rows) per (Site, Pit, calendar month).
+    Sump rows include the day before the month so its first day has Volume Kemarin.
+    """
+    pumps = {k: g for k, g in df_p.groupby(['Site', 'Pit', df_p['Tanggal'].dt.to_period('M')], observed=True)}
+    for (site, pit), g in df_s.groupby(['Site', 'Pit'], observed=True):
+        g = g.sort_values('Tanggal')
+        dates = g['Tanggal'].values
+        for month in g['Tanggal'].dt.to_period('M').unique():
+            lo = dates.searchsorted((month.start_time - pd.Timedelta(days=1)).to_datetime64())
+            hi = dates.searchsorted((month.end_time + pd.Timedelta(days=1)).normalize().to_datetime64())
+            yield site, pit, month, g.iloc[lo:hi], pumps.get((site, pit, month), df_p.iloc[:0])
+
+def _compute_partition(part):
+    """Worker: daily water balance of one (site, pit, month) partition."""
+    site, pit, month, df_s, df_p = part
+    return proc.compute_water_balance(df_s, df_p, month.start_time, month.end_time.normalize())
+
+def run(df_s, df_p, workers=None, chunksize=None, start=None, end=None):
+    """
+    Compute all partitions (in-process when workers == 1).
+    Returns (daily water balance rows, number of partitions).
+    """
+    parts = list(make_partitions(df_s, df_p))
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(parts) <= 1:
+        results = [_compute_partition(p) for p in parts]
+    else:
+        # Beberapa partisi per kiriman ke worker agar overhead pickling tidak dominan
+        chunksize = chunksize or max(1, len(parts) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_compute_partition, parts, chunksize=chunksize))
+    daily = pd.concat(results, ignore_index=True) if results else proc.compute_water_balance(df_s, df_p)
+    if start is not None:
+        daily = daily[daily['Tanggal'] >= pd.Timestamp(start)]
+    if end is not None:
+        daily = daily[daily['Tanggal'] <= pd.Timestamp(end)]
+    return daily.sort_values(proc.WB_KEYS).reset_index(drop=True), len(parts)
+
+def write_frame(df, path):
+    """Parquet (zstd) or CSV, chosen by the file extension."""
+    import exporter
+
+    if path.lower().endswith(".parquet"):
+        df.to_parquet(path, index=False, compression=exporter.PARQUET_COMPRESSION)
+    else:
+        df.to_csv(path, index=False)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Water balance semua site x pit x bulan (tanpa UI).")
+    ap.add_argument("--sump", help="Snapshot sump (.parquet/.csv); tanpa --sump/--pompa data dibaca dari DB")
+    ap.add_argument("--pompa", help="Snapshot pompa (.parquet/.csv)")
+    ap.add_argument("--site", help="Batasi ke satu site")
+    ap.add_argument("--start", help="Tanggal awal (YYYY-MM-DD)")
+    ap.add_argument("--end", help="Tanggal akhir, inklusif (YYYY-MM-DD)")
+    ap.add_argument("--out", required=True, help="Ringkasan bulanan per site/pit (.parquet/.csv)")
+    ap.add_argument("--daily", help="Opsional: water balance harian per pit (.parquet/.csv)")
+    ap.add_argument("--workers", type=int, default=os.cpu_count(), help="Jumlah proses (1 = tanpa pool)")
+    ap.add_argument("--chunksize", type=int, help="Partisi per kiriman ke worker (default otomatis)")
+    args = ap.parse_args(argv)
+    if bool(args.sump) != bool(args.pompa):
+        ap.error("--sump dan --pompa harus dipakai bersama")
+
+    t0 = time.perf_counter()
+    if args.sump:
+        lag_start = pd.Timestamp(args.start) - pd.Timedelta(days=1) if args.start else None
+        df_s, df_p = (_scope(df, args.site, lag_start, args.end) for df in load_snapshot(args.sump, args.pompa))
+    else:
+        df_s, df_p = load_db(args.site, args.start, args.end)
+    t1 = time.perf_counter()
+
+    daily, n_parts = run(df_s, df_p, args.workers, args.chunksize, args.start, args.end)
+    t2 = time.perf_counter()
+
+    write_frame(proc.monthly_summary(daily), args.out)
+    if args.daily:
+        write_frame(daily, args.daily)
+    t3 = time.perf_counter()
+
+    secs = t2 - t1
+    print(f"Partisi (site x pit x bulan): {n_parts:,} | baris harian: {len(daily):,} | workers: {args.workers}")
+    print(f"Load {t1 - t0:.2f} s | hitung {secs:.2f} s | tulis {t3 - t2:.2f} s | total {t3 - t0:.2f} s")
+    if secs > 0:
+        print(f"Throughput: {len(daily) / secs:,.0f} baris/s, {n_parts / secs:,.1f} partisi/s")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+# --- BENCHMARK: load / proses / render / tulis pada skala armada ---
+# Jalan terhadap stand-in lokal pengganti koneksi "neon" (SQLite sementara secara default,
+# atau --url postgresql://...). Isi tabel di DB tersebut DITIMPA - jangan arahkan ke Neon produksi.
+# Hasil ditulis ke JSON supaya run bisa dibandingkan (--compare).
+#
+#   python benchmark.py --sites 5 --pits 6 --units 3 --years 3 --out bench.json
+#   python benchmark.py --url postgresql://localhost/dms_bench --compare bench.json --out bench_pg.json
+
+BENCH_PREFIX = "bench_"
+END_DATE = date(2025, 12, 31)   # tanggal akhir tetap -> dataset sama persis antar run (dengan seed sama)
+DEFAULT_URL = f"sqlite:///{os.path.join(tempfile.gettempdir(), 'dms_bench.db')}"
+
+
+def make_dataset(sites, pits, units, years, seed=0):
+    """
+    Synthetic display-named (sump, pompa) frames from synthetic.py: `sites` x `pits` daily rows
+    over `years` years ending at END_DATE, with `units` pumps per pit. Deterministic per seed.
+    """
+    import synthetic
+
+    return synthetic.make_frames(sites, pits, units, 365 * years, seed, END_DATE, prefix=BENCH_PREFIX)
+
+def measure(fn, repeat=3, memory=True):
+    """Wall time over `repeat` runs, then one extra run under tracemalloc for peak allocation."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    res = {
+        "runs": repeat, "min_s": round(min(times), 6), "median_s": round(statistics.median(times), 6),
+        "max_s": round(max(times), 6),
+    }
+    if memory:
+        # Terpisah dari pengukuran waktu: tracemalloc memperlambat alokasi
+        tracemalloc.start()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        res["peak_mb"] = round(peak / 1e6, 3)
+    return res
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_suite(args):
+    # database membaca DMS_DB_URL saat import -> set dulu, baru import modul app
+    os.environ["DMS_DB_URL"] = args.url
+    os.environ.pop("DMS_REPLICA", None)
+    if args.url == DEFAULT_URL and os.path.exists(DEFAULT_URL[len("sqlite:///"):]):
+        os.remove(DEFAULT_URL[len("sqlite:///"):])
+    import database as db
+    import processing as proc
+    import ui
+
+    df_s, df_p = make_dataset(args.sites, args.pits, args.units, args.years, args.seed)
+    site = df_s["Site"].iloc[0]
+    pit = df_s["Pit"].iloc[0]
+    last = pd.Timestamp(END_DATE)
+    m_start, m_end = last.replace(day=1).date(), last.date()
+    r_start, r_end = df_s["Tanggal"].min().date(), last.date()
+
+    results = {}
+
+    def bench(name, fn, repeat=args.repeat, per_op=1, **extra):
+        db.reset_roundtrips()
+        res = measure(fn, repeat, memory=not args.no_memory)
+        res["db_roundtrips"] = db.roundtrips()
+        if per_op > 1:
+            res["ops_per_run"] = per_op
+            res["median_per_op_s"] = round(res["median_s"] / per_op, 6)
+        res.update(extra)
+        results[name] = res
+        print(f"{name:<28} median {res['median_s'] * 1000:10.1f} ms"
+              + (f"  peak {res['peak_mb']:8.1f} MB" if "peak_mb" in res else ""), flush=True)
+
+    # --- Tulis massal (seed data stand-in) ---
+    db.init_db()
+    bench("write.overwrite_full_db", lambda: db.overwrite_full_db(df_s, df_p), repeat=args.write_repeat,
+          rows=len(df_s) + len(df_p))
+
+    # --- Load ---
+    bench("load.full", lambda: db.load_data(), rows=len(df_s) + len(df_p))
+    bench("load.site_month", lambda: db.load_data(site=site, start=m_start, end=m_end))
+    bench("load.pit_range", lambda: db.load_data(site=site, pit=pit, start=r_start, end=r_end))
+
+    def build_index():
+        with db.get_connection().session as session:
+            return db.FilterIndex.build(session)
+    bench("load.filter_index", build_index)
+
+    # --- Filter + water balance ---
+    full_s, full_p = db.load_data()
+    site_s, site_p = db.load_data(site=site, start=r_start, end=r_end)
+    bench("process.pit_month", lambda: proc.process_water_balance(
+        site_s, site_p, site, pit, "All Units", year=m_start.year, month_int=m_start.month))
+    bench("process.site_range", lambda: proc.process_water_balance(
+        site_s, site_p, site, "All Sumps", "All Units", start=r_start, end=r_end))
+    bench("process.fleet_batch", lambda: proc.run_fleet_batch(db.expand_frame(full_s), db.expand_frame(full_p)),
+          rows=len(full_s))
+
+    # --- Figure (tanpa cache figure) ---
+    wb_month, p_month, _ = proc.process_water_balance(site_s, site_p, site, pit, "All Units",
+                                                      year=m_start.year, month_int=m_start.month)
+    wb_range, p_range, _ = proc.process_water_balance(site_s, site_p, site, "All Sumps", "All Units",
+                                                      start=r_start, end=r_end)
+    bench("render.figures_month", lambda: ui._build_figures(wb_month, p_month, "Otomatis"))
+    bench("render.figures_range", lambda: ui._build_figures(wb_range, p_range, "Otomatis"))
+    figs = ui._build_figures(wb_range, p_range, "Otomatis")["figs"]
+    # st.plotly_chart mengirim figure sebagai JSON -> ukuran payload ke browser
+    payload = sum(len(f.to_json()) for f in figs.values())
+    bench("render.figures_json", lambda: [f.to_json() for f in figs.values()], payload_bytes=payload)
+
+    # --- Tulis per baris (form input) ---
+    n_ops = args.save_ops
+    sample_s = db.expand_frame(full_s[db.SUMP_COLUMNS]).tail(n_ops).to_dict("records")
+    sample_p = db.expand_frame(full_p[db.POMPA_COLUMNS]).tail(n_ops).to_dict("records")
+    bench("write.save_new_sump", lambda: [db.save_new_sump(r) for r in sample_s], per_op=len(sample_s))
+    bench("write.save_new_pompa", lambda: [db.save_new_pompa(r) for r in sample_p], per_op=len(sample_p))
+
+    engine = db.get_connection().engine
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "pandas": pd.__version__, "numpy": np.__version__,
+            "db_dialect": engine.dialect.name, "db_url": engine.url.render_as_string(hide_password=True),
+            "scale": {"sites": args.sites, "pits": args.pits, "units": args.units, "years": args.years,
+                      "seed": args.seed},
+            "rows": {"sump": len(df_s), "pompa": len(df_p)},
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+def compare(old, new):
+    """Print median time old -> new per benchmark present in both result files."""
+    print(f"\n{'benchmark':<28} {'lama (ms)':>12} {'baru (ms)':>12} {'rasio':>8}")
+    for name, res in new["results"].items():
+        if name in old.get("results", {}):
+            a, b = old["results"][name]["median_s"], res["median_s"]
+            print(f"{name:<28} {a * 1000:12.1f} {b * 1000:12.1f} {b / a if a else float('nan'):8.2f}")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark load/proses/render/tulis DMS pada data sintetis.")
+    ap.add_argument("--url", default=DEFAULT_URL, help="SQLAlchemy URL stand-in (isi tabel ditimpa!)")
+    ap.add_argument("--sites", type=int, default=3)
+    ap.add_argument("--pits", type=int, default=4, help="pit per site")
+    ap.add_argument("--units", type=int, default=3, help="pompa per pit")
+    ap.add_argument("--years", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=3, help="pengulangan per benchmark (median dilaporkan)")
+    ap.add_argument("--write-repeat", type=int, default=1, help="pengulangan overwrite_full_db")
+    ap.add_argument("--save-ops", type=int, default=20, help="baris per run save_new_sump/pompa")
+    ap.add_argument("--no-memory", action="store_true", help="lewati profil memori (tracemalloc)")
+    ap.add_argument("--out", help="file JSON hasil (default: stdout)")
+    ap.add_argument("--compare", help="file JSON run sebelumnya untuk dibandingkan")
+    args = ap.parse_args(argv)
+
+    report = run_suite(args)
+    text_out = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text_out + "\n")
+    else:
+        print(text_out)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,35 +1,146 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-from sqlalchemy import text
+from sqlalchemy import text, event
 from datetime import date, timedelta
-import random
+from collections import OrderedDict
+import os
+import threading
+import time
+
+import alerts
+import migrations
+import perf
+
+# --- KONEKSI (lazy, satu engine + pool per proses) ---
+# Neon (serverless) menutup koneksi idle & bisa cold-start: pre-ping membuang koneksi mati
+# sebelum dipakai, recycle mengganti koneksi sebelum diputus server.
+POOL_SETTINGS = dict(
+    pool_size=5,          # koneksi tetap di pool
+    max_overflow=5,       # tambahan sementara saat ramai
+    pool_timeout=30,      # detik menunggu koneksi bebas
+    pool_pre_ping=True,
+    pool_recycle=300,     # detik
+)
+
+# Replica lokal (offline-first): bila DMS_REPLICA berisi path file SQLite, semua baca/tulis app
+# memakai file itu dan replica.py menyinkronkan perubahan dengan Neon di background.
+REPLICA_PATH = os.environ.get("DMS_REPLICA", "")
+# URL pengganti untuk koneksi "neon" (stand-in SQLite/PostgreSQL lokal, mis. benchmark.py);
+# kosong = pakai [connections.neon] di secrets.toml
+DB_URL = os.environ.get("DMS_DB_URL", "")
+
+_conn = None
+_remote = None
+_roundtrips = threading.local()
+
+def _count_roundtrip(conn, cursor, statement, parameters, context, executemany):
+    _roundtrips.n = getattr(_roundtrips, "n", 0) + 1
+
+def _sqlite_wal(dbapi_conn, record):
+    dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+def get_remote_connection():
+    """Neon connection; in replica mode only the sync worker uses it."""
+    global _remote
+    if _remote is None:
+        kwargs = dict(POOL_SETTINGS, url=DB_URL) if DB_URL else POOL_SETTINGS
+        _remote = st.connection("neon", type="sql", **kwargs)
+    return _remote
 
-# Initialize connection
 def get_connection():
-    return st.connection("neon", type="sql")
+    """Process-wide connection the app reads/writes through, created on first use (not at import)."""
+    global _conn
+    if _conn is None:
+        if REPLICA_PATH:
+            c = st.connection("replica", type="sql", url=f"sqlite:///{REPLICA_PATH}",
+                              connect_args={"timeout": 30, "check_same_thread": False})
+            event.listen(c.engine, "connect", _sqlite_wal)
+        else:
+            c = get_remote_connection()
+        event.listen(c.engine, "before_cursor_execute", _count_roundtrip)
+        perf.instrument_engine(c.engine)
+        _conn = c
+    return _conn
+
+def reset_roundtrips():
+    """Start counting DB round-trips for the current script run (thread)."""
+    _roundtrips.n = 0
 
-# Variable global untuk koneksi (agar bisa diakses dari app.py jika perlu)
-conn = get_connection()
+def roundtrips():
+    """Statements sent to the DB by this thread since reset_roundtrips()."""
+    return getattr(_roundtrips, "n", 0)
+
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def ensure_schema():
+    """Verify the schema version once per process; migrate only if it is behind."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    with _schema_lock:
+        if _schema_ready:
+            return
+        with get_connection().session as session:
+            current = migrations.current_version(session)
+            session.commit()
+        if current < migrations.LATEST_VERSION:
+            init_db()
+        _schema_ready = True
 
 def init_db():
-    """Create tables in Neon if they don't exist."""
+    """Create/upgrade tables in Neon by applying pending schema migrations."""
+    global _schema_ready
     conn = get_connection()
     with conn.session as session:
-        session.execute(text('''
-            CREATE TABLE IF NOT EXISTS sump (
-                Tanggal DATE, Site TEXT, Pit TEXT, Elevasi_Air REAL, Critical_Elevation REAL,
-                Volume_Air_Survey REAL, Plan_Curah_Hujan REAL, Curah_Hujan REAL,
-                Actual_Catchment REAL, Groundwater REAL, Status TEXT
-            )'''))
-        # UPDATE: Menambahkan Status_Operasi dan Remarks
-        session.execute(text('''
-            CREATE TABLE IF NOT EXISTS pompa (
-                Tanggal DATE, Site TEXT, Pit TEXT, Unit_Code TEXT,
-                Debit_Plan REAL, Debit_Actual REAL, EWH_Plan REAL, EWH_Actual REAL,
-                Status_Operasi TEXT, Remarks TEXT
-            )'''))
-        session.commit()
+        applied = migrations.migrate(session)
+        if 4 in applied:
+            # Backfill water_balance untuk data yang sudah ada
+            refresh_water_balance(session)
+            session.commit()
+        if 6 in applied:
+            alerts.refresh(session)
+            session.commit()
+    _schema_ready = True
+
+def _mark_written(session, site=None, pit=None):
+    """Remember which pit this transaction wrote (None = all pits) for the alert refresh in bump_data_version."""
+    session.info.setdefault("dms_written", set()).add((site, pit))
+
+def bump_data_version(session):
+    """
+    Increment the data version inside the writer's transaction. Returns the new version.
+    Alerts of the pits written in this transaction are re-evaluated first (same commit).
+    """
+    written = session.info.pop("dms_written", None)
+    if written:
+        scope = None if any(s is None or p is None for s, p in written) else written
+        with perf.span("db.alerts_refresh", pits=len(written)):
+            alerts.refresh(session, scope)
+    return session.execute(text("UPDATE data_version SET version = version + 1 WHERE id = 1 RETURNING version")).scalar()
+
+def _read_sql(conn, sql, params=None):
+    """
+    SELECT into a DataFrame on a scoped connection. conn.query() leaves its pooled connection
+    to the garbage collector, so bursts of reads could exhaust the pool before it ran.
+    """
+    with perf.span("db.read_sql") as sp, conn.engine.connect() as c:
+        df = pd.read_sql(text(sql), c, params=params)
+        sp["rows"] = len(df)
+        if perf.active():
+            sp["bytes"] = int(df.memory_usage(deep=True).sum())
+        return df
+
+def get_data_version():
+    """Cheap single-row query used to detect writes from any session/process."""
+    conn = get_connection()
+    try:
+        df = _read_sql(conn, "SELECT version FROM data_version WHERE id = 1")
+    except Exception:
+        init_db()
+        return 0
+    return int(df.iloc[0, 0]) if not df.empty else 0
 
 def reset_db():
     """DROPS and recreates tables."""
@@ -37,204 +148,834 @@ def reset_db():
     with conn.session as session:
         session.execute(text("DROP TABLE IF EXISTS sump"))
         session.execute(text("DROP TABLE IF EXISTS pompa"))
+        session.execute(text("DROP TABLE IF EXISTS water_balance"))
+        session.execute(text("DROP TABLE IF EXISTS alerts"))
+        session.execute(text("DROP TABLE IF EXISTS schema_version"))
+        session.execute(text("DROP TABLE IF EXISTS sync_tombstone"))
+        session.execute(text("DROP TABLE IF EXISTS sync_state"))
         session.commit()
     init_db()
+    with conn.session as session:
+        bump_data_version(session)
+        session.commit()
 
-def load_data():
-    """Fetch all data from Neon."""
-    init_db()
-    conn = get_connection()
-    
-    # --- LOAD SUMP ---
-    try:
-        df_s = conn.query("SELECT * FROM sump", ttl=0)
-    except Exception:
-        df_s = pd.DataFrame()
+# --- COLUMN MAPPING (DB -> Tampilan) ---
+SUMP_COLUMN_MAP = {
+    "tanggal": "Tanggal", "site": "Site", "pit": "Pit",
+    "elevasi_air": "Elevasi Air (m)", "critical_elevation": "Critical Elevation (m)",
+    "volume_air_survey": "Volume Air Survey (m3)", "plan_curah_hujan": "Plan Curah Hujan (mm)",
+    "curah_hujan": "Curah Hujan (mm)", "actual_catchment": "Actual Catchment (Ha)",
+    "groundwater": "Groundwater (m3)", "status": "Status"
+}
+
+POMPA_COLUMN_MAP = {
+    "tanggal": "Tanggal", "site": "Site", "pit": "Pit", "unit_code": "Unit Code",
+    "debit_plan": "Debit Plan (m3/h)", "debit_actual": "Debit Actual (m3/h)",
+    "ewh_plan": "EWH Plan", "ewh_actual": "EWH Actual",
+    "status_operasi": "Status Operasi", "remarks": "Remarks"
+}
+
+SUMP_COLUMNS = list(SUMP_COLUMN_MAP.values())
+POMPA_COLUMNS = list(POMPA_COLUMN_MAP.values())
+
+# Natural key (lihat migrations._m003_natural_keys)
+SUMP_KEY = ["tanggal", "site", "pit"]
+POMPA_KEY = ["tanggal", "site", "pit", "unit_code"]
+SUMP_KEY_COLUMNS = [SUMP_COLUMN_MAP[c] for c in SUMP_KEY]
+POMPA_KEY_COLUMNS = [POMPA_COLUMN_MAP[c] for c in POMPA_KEY]
+
+_TABLES = {
+    "sump": (SUMP_COLUMN_MAP, SUMP_KEY),
+    "pompa": (POMPA_COLUMN_MAP, POMPA_KEY),
+}
+
+def _upsert_sql(table, returning=False):
+    """INSERT ... ON CONFLICT (natural key) DO UPDATE, valid for PostgreSQL and SQLite."""
+    col_map, key = _TABLES[table]
+    cols = list(col_map)
+    sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols if c not in key)
+    sql = (f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)}) "
+           f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET {sets}")
+    if returning:
+        sql += f" RETURNING {', '.join(cols)}"
+    return text(sql)
+
+def _to_records(table, df):
+    """Display-named frame -> list of DB-named dicts (NaN -> None, Tanggal -> date)."""
+    col_map, key = _TABLES[table]
+    df = expand_frame(df).rename(columns={v: k for k, v in col_map.items()})
+    for c in col_map:
+        if c not in df.columns:
+            df[c] = None
+    df = df[list(col_map)].copy()
+    df['tanggal'] = pd.to_datetime(df['tanggal']).dt.date
+    if table == "pompa":
+        df['unit_code'] = df['unit_code'].fillna('-')
+    df = df.dropna(subset=key)
+    return df.astype(object).where(pd.notna(df), None).to_dict('records')
+
+def upsert_frame(session, table, df):
+    """Batched idempotent upsert (executemany) of a display-named frame. Caller commits."""
+    records = _to_records(table, df)
+    if records:
+        session.execute(_upsert_sql(table), records)
+    return len(records)
 
+def _build_filter(site=None, pit=None, unit=None, start=None, end=None, alias=""):
+    """Build a parameterized WHERE clause. `end` is inclusive (by day)."""
+    clauses, params = [], {}
+    if site:
+        clauses.append(f"{alias}Site = :site"); params["site"] = site
+    if pit:
+        clauses.append(f"{alias}Pit = :pit"); params["pit"] = pit
+    if unit:
+        clauses.append(f"{alias}Unit_Code = :unit"); params["unit"] = unit
+    if start is not None:
+        clauses.append(f"{alias}Tanggal >= :start"); params["start"] = pd.Timestamp(start).date()
+    if end is not None:
+        # Half-open range agar aman untuk kolom DATE maupun TIMESTAMP
+        clauses.append(f"{alias}Tanggal < :end"); params["end"] = (pd.Timestamp(end) + timedelta(days=1)).date()
+    where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, params
+
+def _normalize_sump(df_s):
     df_s.columns = map(str.lower, df_s.columns)
     if not df_s.empty:
         df_s['tanggal'] = pd.to_datetime(df_s['tanggal'])
-    
-    df_s = df_s.rename(columns={
-        "elevasi_air": "Elevasi Air (m)", "critical_elevation": "Critical Elevation (m)",
-        "volume_air_survey": "Volume Air Survey (m3)", "plan_curah_hujan": "Plan Curah Hujan (mm)",
-        "curah_hujan": "Curah Hujan (mm)", "actual_catchment": "Actual Catchment (Ha)",
-        "groundwater": "Groundwater (m3)", "tanggal": "Tanggal", "site": "Site", "pit": "Pit", "status": "Status"
-    })
-
-    expected_sump_cols = [
-        "Tanggal", "Site", "Pit", "Elevasi Air (m)", "Critical Elevation (m)",
-        "Volume Air Survey (m3)", "Plan Curah Hujan (mm)", "Curah Hujan (mm)",
-        "Actual Catchment (Ha)", "Groundwater (m3)", "Status"
-    ]
-    if df_s.empty or not all(col in df_s.columns for col in expected_sump_cols):
-         df_s = pd.DataFrame(columns=expected_sump_cols)
+    df_s = df_s.rename(columns={**SUMP_COLUMN_MAP, **WB_COLUMN_MAP})
 
-    # --- LOAD POMPA ---
-    try:
-        df_p = conn.query("SELECT * FROM pompa", ttl=0)
-    except Exception:
-        df_p = pd.DataFrame()
-        
+    if df_s.empty or not all(col in df_s.columns for col in SUMP_COLUMNS):
+        df_s = pd.DataFrame(columns=SUMP_COLUMNS)
+    return compact_frame(df_s)
+
+def _normalize_pompa(df_p):
     df_p.columns = map(str.lower, df_p.columns)
     if not df_p.empty:
         df_p['tanggal'] = pd.to_datetime(df_p['tanggal'])
+    df_p = df_p.rename(columns=POMPA_COLUMN_MAP)
 
-    # UPDATE: Mapping kolom baru
-    df_p = df_p.rename(columns={
-        "unit_code": "Unit Code", "debit_plan": "Debit Plan (m3/h)",
-        "debit_actual": "Debit Actual (m3/h)", "ewh_plan": "EWH Plan", "ewh_actual": "EWH Actual",
-        "status_operasi": "Status Operasi", "remarks": "Remarks",
-        "tanggal": "Tanggal", "site": "Site", "pit": "Pit"
-    })
-
-    expected_pompa_cols = [
-        "Tanggal", "Site", "Pit", "Unit Code", 
-        "Debit Plan (m3/h)", "Debit Actual (m3/h)", "EWH Plan", "EWH Actual",
-        "Status Operasi", "Remarks"
-    ]
-    
     # Pastikan kolom baru ada di dataframe meskipun database kosong/lama
-    for col in expected_pompa_cols:
+    for col in POMPA_COLUMNS:
         if col not in df_p.columns:
             df_p[col] = None
 
     if df_p.empty:
-        df_p = pd.DataFrame(columns=expected_pompa_cols)
+        df_p = pd.DataFrame(columns=POMPA_COLUMNS)
     else:
         # Reorder columns for consistency
-        df_p = df_p[expected_pompa_cols]
-    
+        df_p = df_p[POMPA_COLUMNS]
+    return compact_frame(df_p)
+
+# --- REPRESENTASI RINGKAS DI MEMORI ---
+# Frame hasil load disimpan lama (snapshot bersama) -> dimensi jadi category, angka jadi float32.
+DIM_COLUMNS = ['Site', 'Pit', 'Unit Code', 'Status', 'Status Operasi', 'Remarks']
+
+def compact_frame(df):
+    """In place: dimension columns -> category, numeric columns -> float32 (Tanggal untouched)."""
+    if df.empty:
+        return df
+    for c in df.columns:
+        if c in DIM_COLUMNS:
+            df[c] = df[c].astype('category')
+        elif c != 'Tanggal':
+            df[c] = pd.to_numeric(df[c], errors='coerce').astype('float32')
+    return df
+
+def expand_frame(df):
+    """Copy with plain object strings and float64, e.g. for st.data_editor and DB writes."""
+    out = df.copy()
+    for c in out.columns:
+        if isinstance(out[c].dtype, pd.CategoricalDtype):
+            out[c] = out[c].astype(object)
+        elif out[c].dtype == np.float32:
+            # Lewat repr float32 terpendek agar 12.3 tidak ditulis sebagai 12.300000190734863
+            out[c] = out[c].astype(str).astype('float64')
+    return out
+
+def memory_report(frames):
+    """
+    Resident size of {name: frame} in the compact layout vs the plain object/float64 layout.
+    Returns a DataFrame with one row per frame (MB, deep memory usage).
+    """
+    rows = []
+    for name, df in frames.items():
+        compact = df.memory_usage(deep=True).sum()
+        plain = expand_frame(df).memory_usage(deep=True).sum()
+        rows.append({
+            "Frame": name, "Baris": len(df),
+            "Object/float64 (MB)": round(plain / 1e6, 3), "Ringkas (MB)": round(compact / 1e6, 3),
+            "Rasio": round(plain / compact, 1) if compact else None,
+        })
+    return pd.DataFrame(rows)
+
+def load_data(site=None, pit=None, unit=None, start=None, end=None):
+    """
+    Fetch sump & pompa rows from Neon, filtered in SQL.
+    Sump rows carry the precomputed water_balance columns (WB_COLUMNS).
+    All filters are optional; without filters the full tables are returned.
+    `unit` only applies to the pompa table.
+    """
+    ensure_schema()
+    conn = get_connection()
+
+    # --- LOAD SUMP (+ kolom water balance yang sudah dihitung) ---
+    where_s, params_s = _build_filter(site, pit, None, start, end, alias="s.")
+    # Kolom eksplisit: kolom internal (updated_at untuk sync) tidak ikut ke frame
+    s_cols = ", ".join(f"s.{c}" for c in SUMP_COLUMN_MAP)
+    wb_cols = ", ".join(f"w.{c}" for c in WB_COLUMN_MAP)
+    try:
+        df_s = _read_sql(
+            conn,
+            f"SELECT {s_cols}, {wb_cols} FROM sump s LEFT JOIN water_balance w "
+            f"ON w.Site = s.Site AND w.Pit = s.Pit AND w.Tanggal = s.Tanggal{where_s}",
+            params=params_s
+        )
+    except Exception:
+        df_s = pd.DataFrame()
+    df_s = _normalize_sump(df_s)
+
+    # --- LOAD POMPA ---
+    where_p, params_p = _build_filter(site, pit, unit, start, end)
+    try:
+        df_p = _read_sql(conn, f"SELECT {', '.join(POMPA_COLUMN_MAP)} FROM pompa{where_p}", params=params_p)
+    except Exception:
+        df_p = pd.DataFrame()
+    df_p = _normalize_pompa(df_p)
+
     return df_s, df_p
 
+# --- PAGINASI KEYSET (tab Database & Bulk Edit) ---
+# Urutan = (kolom sort, natural key) -> setiap baris punya posisi unik; halaman berikutnya dibaca
+# dengan perbandingan row-value terhadap baris terakhir halaman sebelumnya (tanpa OFFSET).
+PAGE_SIZES = [50, 100, 250, 500]
+_TEXT_COLUMNS = {"site", "pit", "unit_code", "status", "status_operasi", "remarks"}
+
+def _sort_expr(table, col):
+    """Sort expression on alias t; nullable columns are coalesced so the keyset comparison never meets NULL."""
+    if col in _TABLES[table][1]:
+        return f"t.{col}"
+    if col in _TEXT_COLUMNS:
+        return f"COALESCE(t.{col}, '')"
+    return f"COALESCE(CAST(t.{col} AS DOUBLE PRECISION), -1e300)"
+
+def _page_filter(table, site, pit, unit, start, end):
+    return _build_filter(site, pit, unit if table == "pompa" else None, start, end, alias="t.")
+
+def count_rows(table, site=None, pit=None, unit=None, start=None, end=None):
+    """Number of `table` rows matching the filters (page count of the keyset pager)."""
+    ensure_schema()
+    where, params = _page_filter(table, site, pit, unit, start, end)
+    return int(_read_sql(get_connection(), f"SELECT COUNT(*) AS n FROM {table} t{where}", params=params).iloc[0, 0])
+
+def load_page(table, site=None, pit=None, unit=None, start=None, end=None, sort="Tanggal", descending=True,
+              after=None, limit=100, with_wb=False):
+    """
+    One page of `table`, filtered and ordered in SQL, as a plain (object/float64) display-named frame
+    ready for st.data_editor. `after` is the cursor returned with the previous page (None = first page).
+    Returns (page, cursor of its last row, or None when no rows follow).
+    `with_wb` adds the water_balance columns to sump pages (read-only browsing).
+    """
+    ensure_schema()
+    col_map, key = _TABLES[table]
+    by_display = {v: k for k, v in col_map.items()}
+    order = [_sort_expr(table, by_display[sort])] + [f"t.{c}" for c in key if c != by_display[sort]]
+    where, params = _page_filter(table, site, pit, unit, start, end)
+    if after is not None:
+        cmp = (f"({', '.join(order)}) {'<' if descending else '>'} "
+               f"({', '.join(f':_k{i}' for i in range(len(order)))})")
+        where = f"{where} AND {cmp}" if where else f" WHERE {cmp}"
+        params.update({f"_k{i}": v for i, v in enumerate(after)})
+    cols = [f"t.{c}" for c in col_map]
+    join = ""
+    if with_wb and table == "sump":
+        cols += [f"w.{c}" for c in WB_COLUMN_MAP]
+        join = " LEFT JOIN water_balance w ON w.Site = t.Site AND w.Pit = t.Pit AND w.Tanggal = t.Tanggal"
+    direction = "DESC" if descending else "ASC"
+    df = _read_sql(get_connection(), (
+        f"SELECT {', '.join(cols)}, {', '.join(f'{e} AS _k{i}' for i, e in enumerate(order))} "
+        f"FROM {table} t{join}{where} ORDER BY {', '.join(f'{e} {direction}' for e in order)} LIMIT {int(limit) + 1}"
+    ), params=params)
+
+    k_cols = [f"_k{i}" for i in range(len(order))]
+    cursor = None
+    if len(df) > limit:
+        # Nilai mentah dari DB (bukan hasil normalisasi) -> perbandingan di query berikutnya persis sama
+        cursor = tuple(v.item() if hasattr(v, "item") else v for v in df[k_cols].iloc[limit - 1])
+        df = df.iloc[:limit]
+    df = df.drop(columns=k_cols)
+    page = _normalize_sump(df) if table == "sump" else _normalize_pompa(df)
+    return expand_frame(page).reset_index(drop=True), cursor
+
+# --- OVERVIEW (semua site/pit, agregat di DB) ---
+def load_overview(start, end):
+    """
+    One row per (Site, Pit) from a single grouped query: the latest survey on/before `end`
+    (elevation, critical, water balance error) plus sums over [start, end]: rain, pumped volume,
+    pump unit-days and Breakdown unit-days. See processing.overview_metrics for the derived columns.
+    """
+    ensure_schema()
+    where_last, params = _build_filter(end=end)
+    where_range, p_range = _build_filter(start=start, end=end)
+    params.update(p_range)
+    on = "ON {a}.Site = s.Site AND {a}.Pit = s.Pit"
+    df = _read_sql(get_connection(), f'''
+        SELECT s.Site, s.Pit, s.Tanggal, s.Elevasi_Air, s.Critical_Elevation, w.Error_Pct,
+               r.rain, r.survey_days, p.pumped, p.unit_days, p.bd_days
+        FROM sump s
+        JOIN (SELECT Site, Pit, MAX(Tanggal) AS t FROM sump{where_last} GROUP BY Site, Pit) m
+          {on.format(a="m")} AND s.Tanggal = m.t
+        LEFT JOIN water_balance w {on.format(a="w")} AND w.Tanggal = s.Tanggal
+        LEFT JOIN (SELECT Site, Pit, SUM(Curah_Hujan) AS rain, COUNT(*) AS survey_days
+                   FROM sump{where_range} GROUP BY Site, Pit) r {on.format(a="r")}
+        LEFT JOIN (SELECT Site, Pit, SUM(COALESCE(Debit_Actual, 0) * COALESCE(EWH_Actual, 0)) AS pumped,
+                          COUNT(*) AS unit_days,
+                          SUM(CASE WHEN Status_Operasi LIKE 'Breakdown%' THEN 1 ELSE 0 END) AS bd_days
+                   FROM pompa{where_range} GROUP BY Site, Pit) p {on.format(a="p")}''', params=params)
+    df.columns = ['Site', 'Pit', 'Tanggal', 'Elevasi Air (m)', 'Critical Elevation (m)', 'Error %',
+                  'Curah Hujan (mm)', 'Hari Survey', 'Volume Out', 'Unit-Hari', 'Unit-Hari BD']
+    df['Tanggal'] = pd.to_datetime(df['Tanggal'])
+    return df
+
+# --- FILTER INDEX (site -> pit -> unit, tahun/bulan per pit) ---
+def _year_month_sql(dialect):
+    if dialect == "postgresql":
+        return "CAST(EXTRACT(YEAR FROM Tanggal) AS INTEGER)", "CAST(EXTRACT(MONTH FROM Tanggal) AS INTEGER)"
+    return "CAST(strftime('%Y', Tanggal) AS INTEGER)", "CAST(strftime('%m', Tanggal) AS INTEGER)"
+
+class FilterIndex:
+    """
+    Sidebar filter index: site -> pit -> {"units": set, "months": {(year, month)}}.
+    Built from grouped DISTINCT queries and updated in place on writes, so sidebar
+    lookups never touch the data frames. Treat instances as immutable once published
+    (SharedSnapshot swaps in an updated copy).
+    """
+    def __init__(self, sites=None):
+        self._sites = sites or {}
+
+    @classmethod
+    def build(cls, session):
+        idx = cls()
+        idx._load(session)
+        return idx
+
+    def _load(self, session, site=None, pit=None):
+        where, params = _build_filter(site, pit)
+        y, m = _year_month_sql(session.get_bind().dialect.name)
+        for s_, p_, yy, mm in session.execute(text(
+            f"SELECT Site, Pit, {y}, {m} FROM sump{where} GROUP BY Site, Pit, {y}, {m}"
+        ), params):
+            self._pit(s_, p_)["months"].add((int(yy), int(mm)))
+        for s_, p_, u in session.execute(text(f"SELECT DISTINCT Site, Pit, Unit_Code FROM pompa{where}"), params):
+            e = self._pit(s_, p_)
+            if u is not None:
+                e["units"].add(u)
+
+    def _pit(self, site, pit):
+        return self._sites.setdefault(site, {}).setdefault(pit, {"units": set(), "months": set()})
+
+    def copy(self):
+        return FilterIndex({
+            s_: {p_: {"units": set(e["units"]), "months": set(e["months"])} for p_, e in pits.items()}
+            for s_, pits in self._sites.items()
+        })
+
+    def add_site(self, site):
+        self._sites.setdefault(site, {})
+
+    def add_rows(self, table, df):
+        """Register upserted display-named rows (sump: month, pompa: unit)."""
+        for r in df[[c for c in ('Site', 'Pit', 'Tanggal', 'Unit Code') if c in df.columns]].itertuples(index=False):
+            e = self._pit(r.Site, r.Pit)
+            t = pd.Timestamp(r.Tanggal)
+            if table == "sump":
+                e["months"].add((t.year, t.month))
+            elif r[3] and not pd.isna(r[3]):
+                e["units"].add(r[3])
+
+    def refresh_pits(self, session, keys):
+        """Reload the entries of (site, pit) pairs from the DB, e.g. after deletes."""
+        for site, pit in set(keys):
+            self._sites.get(site, {}).pop(pit, None)
+            self._load(session, site, pit)
+            if not self._sites.get(site):
+                self._sites.pop(site, None)
+
+    def sites(self):
+        return sorted(self._sites)
+
+    def pits(self, site):
+        return sorted(self._sites.get(site, {}))
+
+    def units(self, site, pit):
+        return sorted(self._sites.get(site, {}).get(pit, {}).get("units", ()))
+
+    def months(self, site=None, pit=None, year=None):
+        """Sorted (year, month) pairs with sump data, optionally scoped to a site/pit/year."""
+        out = set()
+        for s_, pits in self._sites.items():
+            if site and s_ != site:
+                continue
+            for p_, e in pits.items():
+                if pit and p_ != pit:
+                    continue
+                out |= e["months"]
+        return sorted(ym for ym in out if year is None or ym[0] == year)
+
+    def years(self, site=None, pit=None):
+        """Years with sump data (newest first)."""
+        return sorted({y for y, _ in self.months(site, pit)}, reverse=True)
+
+# --- WATER BALANCE HARIAN (tabel water_balance, dirawat inkremental) ---
+WB_COLUMN_MAP = {
+    "volume_out": "Volume Out", "volume_in_rain": "Volume In (Rain)", "volume_in_gw": "Volume In (GW)",
+    "volume_kemarin": "Volume Kemarin", "volume_teoritis": "Volume Teoritis",
+    "diff_volume": "Diff Volume", "error_pct": "Error %"
+}
+WB_COLUMNS = list(WB_COLUMN_MAP.values())
+
+def _wb_refresh_sql(dialect, where_s, where_p):
+    """
+    Recompute water_balance rows for the sump rows matched by `where_s` (alias s).
+    Same formulas as processing.process_water_balance; Volume Kemarin is the survey
+    of the previous calendar day of the same pit (NULL if that day has no survey).
+    """
+    prev_day = "s.Tanggal - 1" if dialect == "postgresql" else "DATE(s.Tanggal, '-1 day')"
+    sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in WB_COLUMN_MAP)
+    return text(f'''
+        INSERT INTO water_balance (Site, Pit, Tanggal, {", ".join(WB_COLUMN_MAP)})
+        SELECT Site, Pit, Tanggal, v_out, v_rain, v_gw, v_prev,
+               v_prev + v_rain + v_gw - v_out,
+               v_survey - (v_prev + v_rain + v_gw - v_out),
+               CASE WHEN v_survey > 0 THEN ABS(v_survey - (v_prev + v_rain + v_gw - v_out)) / v_survey * 100 ELSE 0 END
+        FROM (
+            SELECT s.Site, s.Pit, s.Tanggal,
+                   COALESCE(o.v_out, 0) AS v_out,
+                   COALESCE(s.Curah_Hujan, 0) * COALESCE(s.Actual_Catchment, 0) * 10 AS v_rain,
+                   COALESCE(s.Groundwater, 0) AS v_gw,
+                   COALESCE(s.Volume_Air_Survey, 0) AS v_survey,
+                   CASE WHEN y.Site IS NULL THEN NULL ELSE COALESCE(y.Volume_Air_Survey, 0) END AS v_prev
+            FROM sump s
+            LEFT JOIN (
+                SELECT Site, Pit, Tanggal, SUM(COALESCE(Debit_Actual, 0) * COALESCE(EWH_Actual, 0)) AS v_out
+                FROM pompa{where_p} GROUP BY Site, Pit, Tanggal
+            ) o ON o.Site = s.Site AND o.Pit = s.Pit AND o.Tanggal = s.Tanggal
+            LEFT JOIN sump y ON y.Site = s.Site AND y.Pit = s.Pit AND y.Tanggal = {prev_day}
+            {where_s}
+        ) t
+        WHERE 1=1
+        ON CONFLICT (Site, Pit, Tanggal) DO UPDATE SET {sets}''')
+
+def refresh_water_balance(session, site=None, pit=None, start=None, end=None):
+    """Recompute (and prune orphans of) water_balance in a site/pit/date range. Caller commits."""
+    where_s, params = _build_filter(site, pit, None, start, end, alias="s.")
+    where_p, _ = _build_filter(site, pit, None, start, end)
+    where_w, _ = _build_filter(site, pit, None, start, end)
+    orphan = ("NOT EXISTS (SELECT 1 FROM sump s WHERE s.Site = water_balance.Site "
+              "AND s.Pit = water_balance.Pit AND s.Tanggal = water_balance.Tanggal)")
+    where_w = f"{where_w} AND {orphan}" if where_w else f" WHERE {orphan}"
+    session.execute(text(f"DELETE FROM water_balance{where_w}"), params)
+    _mark_written(session, site, pit)
+    session.execute(_wb_refresh_sql(session.get_bind().dialect.name, where_s, where_p), params)
+
+def refresh_water_balance_for(session, df):
+    """
+    Incremental refresh after writes: for every (Site, Pit) in the display-named frame `df`,
+    recompute from its first written day through the day after its last (Volume Kemarin of d+1 depends on d).
+    """
+    if df is None or df.empty:
+        return
+    k = df[['Site', 'Pit']].copy()
+    k['Tanggal'] = pd.to_datetime(df['Tanggal'])
+    for (site, pit), g in k.dropna().groupby(['Site', 'Pit']):
+        refresh_water_balance(session, site, pit, g['Tanggal'].min(), g['Tanggal'].max() + timedelta(days=1))
+
+def _load_water_balance_rows(session, site, pit, start, end):
+    where, params = _build_filter(site, pit, None, start, end)
+    df = pd.DataFrame(session.execute(text(f"SELECT * FROM water_balance{where}"), params).mappings().all())
+    if df.empty:
+        return pd.DataFrame(columns=['Site', 'Pit', 'Tanggal'] + WB_COLUMNS)
+    df.columns = map(str.lower, df.columns)
+    df['tanggal'] = pd.to_datetime(df['tanggal'])
+    return df.rename(columns={**WB_COLUMN_MAP, "site": "Site", "pit": "Pit", "tanggal": "Tanggal"})
+
+def _patch_water_balance(df_s, wb):
+    """Return a copy of df_s with WB_COLUMNS overwritten from `wb` on matching (Tanggal, Site, Pit)."""
+    upd = df_s.set_index(SUMP_KEY_COLUMNS)
+    w = wb.set_index(SUMP_KEY_COLUMNS)
+    common = upd.index.intersection(w.index)
+    if len(common) == 0:
+        return df_s
+    upd.loc[common, WB_COLUMNS] = w.loc[common, WB_COLUMNS].astype(upd[WB_COLUMNS].dtypes.to_dict()).values
+    return upd.reset_index()[df_s.columns]
+
+# --- SHARED SNAPSHOT (lintas session, read-only) ---
+VERSION_CHECK_TTL = 2.0     # detik antar pengecekan versi data ke DB
+SNAPSHOT_MAX_ENTRIES = 64   # jumlah kombinasi filter yang disimpan
+
+class SharedSnapshot:
+    """
+    Process-wide cache of filtered (df_sump, df_pompa) frames and the FilterIndex,
+    shared read-only by all sessions.
+    Entries are dropped when the data version in the DB changes (every writer bumps it).
+    The lock only guards the dicts: DB queries run outside it and their result is published only
+    if nothing was invalidated meanwhile (_generation), with one query in flight per cache key.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._index = None
+        self._alerts = None
+        self._alerts_key = None
+        self._overview = (None, None)
+        self._checked_at = 0.0
+        self._generation = 0
+        self._gates = {}
+        self.version = None
+
+    def _reset(self, version):
+        # Dipanggil dengan _lock dipegang
+        self._entries.clear()
+        self._index = None
+        self.version = version
+        self._generation += 1
+
+    def _refresh_version(self):
+        """Re-read the data version at most every VERSION_CHECK_TTL seconds; returns it."""
+        with self._lock:
+            now = time.monotonic()
+            if self.version is not None and now - self._checked_at < VERSION_CHECK_TTL:
+                return self.version
+            gen = self._generation
+        v = get_data_version()
+        with self._lock:
+            # Versi yang dibaca sudah basi jika writer di proses ini mem-publish versi baru
+            if self._generation == gen:
+                self._checked_at = now
+                if v != self.version:
+                    self._reset(v)
+            return self.version
+
+    def _cached(self, key, get, put, build):
+        """
+        Double-checked fill: get() under the lock; on a miss build() runs outside it (other
+        callers of the same key wait for it) and put(value) publishes it if still current.
+        """
+        with self._lock:
+            value = get()
+            if value is not None:
+                return value
+            gate = self._gates.setdefault(key, threading.Lock())
+        with gate:
+            with self._lock:
+                value = get()
+                if value is not None:
+                    return value
+                gen = self._generation
+            try:
+                value = build()
+                with self._lock:
+                    if self._generation == gen:
+                        put(value)
+            finally:
+                with self._lock:
+                    self._gates.pop(key, None)
+            return value
+
+    def current_version(self):
+        return self._refresh_version()
+
+    def filter_index(self):
+        """Current FilterIndex (built with two grouped queries when missing)."""
+        self._refresh_version()
+
+        def build():
+            ensure_schema()
+            with perf.span("db.filter_index"), get_connection().session as session:
+                return FilterIndex.build(session)
+
+        def put(fi):
+            self._index = fi
+        return self._cached("index", lambda: self._index, put, build)
+
+    def alerts(self):
+        """
+        Active alerts of all pits (alerts table), re-read when the data version changes.
+        The first read of each day re-scans every pit: "no survey today" changes without any write.
+        """
+        key = (self._refresh_version(), date.today())
+
+        def build():
+            ensure_schema()
+            with self._lock:
+                rescan = self._alerts_key is None or self._alerts_key[1] != key[1]
+            with perf.span("db.alerts"), get_connection().session as session:
+                if rescan:
+                    alerts.refresh(session, today=key[1])
+                    session.commit()
+                return alerts.load(session)
+
+        def put(df):
+            self._alerts, self._alerts_key = df, key
+        return self._cached("alerts", lambda: self._alerts if self._alerts_key == key else None, put, build)
+
+    def overview(self, start, end):
+        """load_overview() for one (start, end), kept until the data version changes."""
+        key = (self._refresh_version(), start, end)
+
+        def build():
+            with perf.span("db.overview"):
+                return load_overview(start, end)
+
+        def put(df):
+            self._overview = (key, df)
+        return self._cached("overview", lambda: self._overview[1] if self._overview[0] == key else None, put, build)
+
+    def add_site(self, site):
+        """Register a site without data yet (kept until the next rebuild)."""
+        with self._lock:
+            if self._index is not None:
+                idx = self._index.copy()
+                idx.add_site(site)
+                self._index = idx
+
+    def load(self, site=None, pit=None, start=None, end=None):
+        """Same filters as load_data(); the DB is only hit on a cache miss."""
+        key = (site, pit, start, end)
+        self._refresh_version()
+
+        def get():
+            frames = self._entries.get(key)
+            if frames is not None:
+                self._entries.move_to_end(key)
+            return frames
+
+        def build():
+            with perf.span("db.load_data"):
+                return load_data(site=site, pit=pit, start=start, end=end)
+
+        def put(frames):
+            self._entries[key] = frames
+            while len(self._entries) > SNAPSHOT_MAX_ENTRIES:
+                self._entries.popitem(last=False)
+        return self._cached(("load",) + key, get, put, build)
+
+    def apply_row(self, table, df_row):
+        """
+        Patch cached entries with a row just upserted by this process (from save_new_*).
+        Only entries whose scope contains the row are patched; entries of the same pit whose range
+        only holds the changed water balance of the next day are dropped, the rest are untouched.
+        Falls back to a full invalidation if another write happened in between.
+        """
+        new_version = df_row.attrs.get('data_version')
+        idx = 0 if table == 'sump' else 1
+        key_cols = SUMP_KEY_COLUMNS if table == 'sump' else POMPA_KEY_COLUMNS
+        with self._lock:
+            if new_version is None or self.version is None or new_version != self.version + 1:
+                self._reset(None)
+                return
+            # Query yang sedang berjalan mungkin dimulai sebelum commit -> jangan di-publish
+            self._generation += 1
+            if self._index is not None:
+                fi = self._index.copy()
+                fi.add_rows(table, df_row)
+                self._index = fi
+            r = df_row.iloc[0]
+            wb = df_row.attrs.get('water_balance')
+            if idx == 0 and wb is not None:
+                # Baris sump ikut membawa nilai water balance harinya sendiri
+                df_row = df_row.drop(columns=[c for c in WB_COLUMNS if c in df_row.columns])
+                df_row = df_row.merge(wb, on=SUMP_KEY_COLUMNS, how='left')
+            wb_days = [] if wb is None else list(wb['Tanggal'])
+            for key, frames in list(self._entries.items()):
+                site, pit, start, end = key
+                if (site and r['Site'] != site) or (pit and r['Pit'] != pit):
+                    continue  # pit lain: tidak terpengaruh
+                lo = None if start is None else pd.Timestamp(start)
+                hi = None if end is None else pd.Timestamp(end) + timedelta(days=1)
+                in_range = lambda t: (lo is None or t >= lo) and (hi is None or t < hi)
+                if not in_range(r['Tanggal']):
+                    # Baris di luar rentang, tapi water balance besoknya bisa jatuh di dalamnya
+                    if any(in_range(t) for t in wb_days):
+                        del self._entries[key]
+                    continue
+                frames = list(frames)
+                # Copy-on-write: frame lama tetap utuh untuk session yang sedang membacanya
+                df_old = frames[idx]
+                if not df_old.empty:
+                    # Upsert: buang baris lama dengan natural key yang sama
+                    same = (df_old[key_cols] == df_row[key_cols].iloc[0]).all(axis=1)
+                    df_old = df_old[~same]
+                merged = df_row.reset_index(drop=True) if df_old.empty else pd.concat([df_old, df_row], ignore_index=True)
+                # concat kategori yang berbeda jadi object -> ringkas lagi
+                frames[idx] = compact_frame(merged)
+                if wb_days and not frames[0].empty and 'Volume Teoritis' in frames[0].columns:
+                    # Nilai water balance hari itu & besoknya ikut berubah
+                    frames[0] = _patch_water_balance(frames[0], wb)
+                self._entries[key] = tuple(frames)
+            self.version = new_version
+            self._checked_at = time.monotonic()
+
+    def apply_changeset(self, table, upserts, deletes, new_version):
+        """
+        After apply_changeset(): drop cached frames but update the FilterIndex in place
+        (upserted rows are added, pits that lost rows are re-read from the DB).
+        """
+        if new_version is None:
+            return  # tidak ada perubahan
+        with self._lock:
+            if self._index is None or self.version is None or new_version != self.version + 1:
+                self._reset(None)
+                return
+            self._entries.clear()
+            self._generation += 1
+            gen, idx = self._generation, self._index.copy()
+        idx.add_rows(table, upserts)
+        if not deletes.empty:
+            with get_connection().session as session:
+                idx.refresh_pits(session, zip(deletes['Site'], deletes['Pit']))
+        with self._lock:
+            if self._generation != gen:
+                return  # ada invalidasi lain di tengah jalan; index dibangun ulang saat dibutuhkan
+            self._index = idx
+            self.version = new_version
+            self._checked_at = time.monotonic()
+
+    def memory_usage(self):
+        """(number of cached entries, total deep size in bytes of all cached frames)."""
+        with self._lock:
+            entries = list(self._entries.values())
+        return len(entries), int(sum(df.memory_usage(deep=True).sum() for entry in entries for df in entry))
+
+    def invalidate(self):
+        with self._lock:
+            self._reset(None)
+
+@st.cache_resource
+def get_shared_snapshot():
+    return SharedSnapshot()
+
+def _refresh_after_row(session, df_row):
+    """Refresh water_balance for the row's day and the day after; returns those wb rows."""
+    r = df_row.iloc[0]
+    d0, d1 = r['Tanggal'], r['Tanggal'] + timedelta(days=1)
+    refresh_water_balance(session, r['Site'], r['Pit'], d0, d1)
+    return _load_water_balance_rows(session, r['Site'], r['Pit'], d0, d1)
+
 def save_new_sump(data):
-    """Insert single sump record."""
+    """Upsert single sump record (re-submit = update). Returns the stored row (normalized, 1-row DataFrame)."""
     conn = get_connection()
     with conn.session as session:
-        query = text("""INSERT INTO sump (Tanggal, Site, Pit, Elevasi_Air, Critical_Elevation, Volume_Air_Survey, 
-                      Plan_Curah_Hujan, Curah_Hujan, Actual_Catchment, Groundwater, Status) 
-                      VALUES (:t, :s, :p, :ea, :ce, :vs, :rp, :ra, :ac, :gw, :st)""")
-        session.execute(query, {
-            "t": data['Tanggal'], "s": data['Site'], "p": data['Pit'],
-            "ea": data['Elevasi Air (m)'], "ce": data['Critical Elevation (m)'], "vs": data['Volume Air Survey (m3)'],
-            "rp": data['Plan Curah Hujan (mm)'], "ra": data['Curah Hujan (mm)'], "ac": data['Actual Catchment (Ha)'],
-            "gw": data['Groundwater (m3)'], "st": data['Status']
-        })
+        row = session.execute(_upsert_sql("sump", returning=True), _to_records("sump", pd.DataFrame([data]))[0]).mappings().one()
+        df_row = _normalize_sump(pd.DataFrame([dict(row)]))
+        wb = _refresh_after_row(session, df_row)
+        version = bump_data_version(session)
         session.commit()
+    df_row.attrs['data_version'] = version
+    df_row.attrs['water_balance'] = wb
+    return df_row
 
 def save_new_pompa(data):
-    """Insert single pump record."""
+    """Upsert single pump record (re-submit = update). Returns the stored row (normalized, 1-row DataFrame)."""
+    data = dict(data)
+    # Default '-' jika Status/Remarks kosong
+    data.setdefault('Status Operasi', '-')
+    data.setdefault('Remarks', '-')
     conn = get_connection()
     with conn.session as session:
-        # UPDATE: Menambahkan insert Status_Operasi dan Remarks
-        query = text("""INSERT INTO pompa (Tanggal, Site, Pit, Unit_Code, Debit_Plan, Debit_Actual, EWH_Plan, EWH_Actual, Status_Operasi, Remarks) 
-                      VALUES (:t, :s, :p, :uc, :dp, :da, :ep, :ea, :so, :rm)""")
-        session.execute(query, {
-            "t": data['Tanggal'], "s": data['Site'], "p": data['Pit'],
-            "uc": data['Unit Code'], "dp": data['Debit Plan (m3/h)'], "da": data['Debit Actual (m3/h)'],
-            "ep": data['EWH Plan'], "ea": data['EWH Actual'],
-            "so": data.get('Status Operasi', '-'), # Default '-' jika kosong
-            "rm": data.get('Remarks', '-')         # Default '-' jika kosong
-        })
+        row = session.execute(_upsert_sql("pompa", returning=True), _to_records("pompa", pd.DataFrame([data]))[0]).mappings().one()
+        df_row = _normalize_pompa(pd.DataFrame([dict(row)]))
+        wb = _refresh_after_row(session, df_row)
+        version = bump_data_version(session)
         session.commit()
+    df_row.attrs['data_version'] = version
+    df_row.attrs['water_balance'] = wb
+    return df_row
+
+def _key_frame(table, df):
+    """Natural-key columns of a display-named frame, normalized for comparison."""
+    key_cols = SUMP_KEY_COLUMNS if table == "sump" else POMPA_KEY_COLUMNS
+    k = df[key_cols].copy()
+    k['Tanggal'] = pd.to_datetime(k['Tanggal']).dt.normalize()
+    if table == "pompa":
+        k['Unit Code'] = k['Unit Code'].fillna('-')
+    return k
+
+def build_changeset(table, original, edited):
+    """
+    Row-level diff between the frame shown in st.data_editor and its edited result.
+    Returns (upserts, deletes): display-named rows to upsert and natural keys to delete.
+    A row whose key was edited becomes one delete plus one upsert.
+    """
+    key_cols = SUMP_KEY_COLUMNS if table == "sump" else POMPA_KEY_COLUMNS
+    value_cols = [c for c in (SUMP_COLUMNS if table == "sump" else POMPA_COLUMNS) if c not in key_cols]
+
+    orig = expand_frame(original)
+    orig[key_cols] = _key_frame(table, orig)
+    edit = expand_frame(edited)
+    edit[key_cols] = _key_frame(table, edit)
+    edit = edit.dropna(subset=key_cols).drop_duplicates(subset=key_cols, keep='last')
+
+    m = edit.merge(orig[key_cols + value_cols], on=key_cols, how='left', suffixes=('', '__old'), indicator=True)
+    changed = m['_merge'] == 'left_only'
+    for c in value_cols:
+        new, old = m[c].astype(object), m[c + '__old'].astype(object)
+        changed |= ~((new == old) | (pd.isna(new) & pd.isna(old)))
+    upserts = m.loc[changed, key_cols + value_cols].reset_index(drop=True)
+
+    gone = orig[key_cols].merge(edit[key_cols], on=key_cols, how='left', indicator=True)
+    deletes = gone.loc[gone['_merge'] == 'left_only', key_cols].reset_index(drop=True)
+    return upserts, deletes
+
+def apply_changeset(table, upserts, deletes):
+    """
+    Apply a changeset from build_changeset() in one transaction with batched statements.
+    Returns (upserted, deleted, data version after the write).
+    """
+    col_map, key = _TABLES[table]
+    where = " AND ".join(f"{c} = :{c}" for c in key)
+    del_records = _to_records(table, deletes)
+    conn = get_connection()
+    with conn.session as session:
+        if del_records:
+            session.execute(text(f"DELETE FROM {table} WHERE {where}"), [{c: r[c] for c in key} for r in del_records])
+        n_up = upsert_frame(session, table, upserts)
+        version = None
+        if del_records or n_up:
+            refresh_water_balance_for(session, pd.concat([upserts[['Tanggal', 'Site', 'Pit']], deletes[['Tanggal', 'Site', 'Pit']]]))
+            version = bump_data_version(session)
+        session.commit()
+    return n_up, len(del_records), version
 
 def overwrite_full_db(df_s, df_p):
-    """Bulk replace tables."""
+    """Bulk replace table contents in one transaction (keeps schema, keys & indexes)."""
     conn = get_connection()
-    
-    s_save = df_s.rename(columns={
-        "Elevasi Air (m)": "elevasi_air", "Critical Elevation (m)": "critical_elevation",
-        "Volume Air Survey (m3)": "volume_air_survey", "Plan Curah Hujan (mm)": "plan_curah_hujan",
-        "Curah Hujan (mm)": "curah_hujan", "Actual Catchment (Ha)": "actual_catchment",
-        "Groundwater (m3)": "groundwater"
-    })
-    
-    # UPDATE: Mapping kolom baru untuk bulk save
-    p_save = df_p.rename(columns={
-        "Unit Code": "unit_code", "Debit Plan (m3/h)": "debit_plan",
-        "Debit Actual (m3/h)": "debit_actual", "EWH Plan": "ewh_plan", "EWH Actual": "ewh_actual",
-        "Status Operasi": "status_operasi", "Remarks": "remarks"
-    })
-    
-    s_save.columns = map(str.lower, s_save.columns)
-    p_save.columns = map(str.lower, p_save.columns)
-
-    engine = conn.engine 
-    s_save.to_sql('sump', engine, if_exists='replace', index=False)
-    p_save.to_sql('pompa', engine, if_exists='replace', index=False)
-
-def generate_dummy_data():
-    """Generates dummy data matching the logic."""
+    with conn.session as session:
+        session.execute(text("DELETE FROM sump"))
+        session.execute(text("DELETE FROM pompa"))
+        upsert_frame(session, "sump", df_s)
+        upsert_frame(session, "pompa", df_p)
+        session.execute(text("DELETE FROM water_balance"))
+        refresh_water_balance(session)
+        bump_data_version(session)
+        session.commit()
+
+def generate_dummy_data(sites=3, pits=2, units=2, days=30, seed=None, end=None):
+    """
+    Generate a synthetic fleet (see synthetic.py) ending at `end` (default today) and bulk-load it.
+    All names carry the 'dummy_' prefix, so delete_dummy_data() removes it. Returns rows per table.
+    """
+    import importer
+    import synthetic
+
+    sim = synthetic.simulate(sites, pits, units, days, seed, end)
     conn = get_connection()
-    
-    dummy_prefix = "dummy_" 
-    
-    init_map = {
-        f"{dummy_prefix}Lais Coal Mine (LCM)": [f"{dummy_prefix}Sump Wijaya Barat", f"{dummy_prefix}Sump Wijaya Timur"],
-        f"{dummy_prefix}Wiraduta Sejahtera Langgeng (WSL)": [f"{dummy_prefix}Sump F01", f"{dummy_prefix}Sump F02"],
-        f"{dummy_prefix}Nusantara Energy (NE)": [f"{dummy_prefix}Sump S8"]
-    }
-    
-    units = [f"{dummy_prefix}WP-01", f"{dummy_prefix}WP-02"]
-    
-    today = date.today()
-    sump_rows = []
-    pump_rows = []
-    
-    for i in range(30):
-        d = today - timedelta(days=i)
-        
-        for site, pits in init_map.items():
-            for pit in pits:
-                # --- Sump Data ---
-                elev = 10.0 + (np.sin(i/10) * 2)
-                
-                sump_rows.append({
-                    "tanggal": d, 
-                    "site": site, 
-                    "pit": pit, 
-                    "elevasi_air": round(elev, 2), 
-                    "critical_elevation": 13.0,
-                    "volume_air_survey": int(elev * 5000), 
-                    "plan_curah_hujan": 20.0, 
-                    "curah_hujan": np.random.randint(0, 40),
-                    "actual_catchment": 25.0, 
-                    "groundwater": 0.0,
-                    "status": "BAHAYA" if elev > 13.0 else "AMAN"
-                })
-                
-                # --- Pump Data ---
-                for u in units:
-                    # Logic: Kalau hujan deras, status mungkin Standby Hujan, dsb
-                    curr_status = "Running"
-                    remarks = "Normal Operation"
-                    actual_ewh = round(np.random.uniform(15, 20), 1)
-                    
-                    if np.random.rand() > 0.8:
-                        curr_status = "Standby - General"
-                        remarks = "No Operator"
-                        actual_ewh = 0
-                    
-                    pump_rows.append({
-                        "tanggal": d, 
-                        "site": site, 
-                        "pit": pit, 
-                        "unit_code": u,
-                        "debit_plan": 500, 
-                        "debit_actual": np.random.randint(400, 500) if actual_ewh > 0 else 0, 
-                        "ewh_plan": 20.0, 
-                        "ewh_actual": actual_ewh,
-                        "status_operasi": curr_status,
-                        "remarks": remarks
-                    })
-        
-    # Save to DB
-    df_s_dummy = pd.DataFrame(sump_rows)
-    df_p_dummy = pd.DataFrame(pump_rows)
-    
-    engine = conn.engine
-    df_s_dummy.to_sql('sump', engine, if_exists='append', index=False)
-    df_p_dummy.to_sql('pompa', engine, if_exists='append', index=False)
+    with conn.session as session:
+        # Upsert: generate ulang di hari yang sama tidak menduplikasi baris
+        n_s = importer.bulk_upsert(session, "sump", synthetic.iter_chunks(sim, "sump"))
+        n_p = importer.bulk_upsert(session, "pompa", synthetic.iter_chunks(sim, "pompa"))
+        bump_data_version(session)
+        session.commit()
+    return {"sump": n_s, "pompa": n_p}
 
 def delete_dummy_data():
     """Deletes all data where Site starts with 'dummy_'."""
@@ -242,4 +983,7 @@ def delete_dummy_data():
     with conn.session as session:
         session.execute(text("DELETE FROM sump WHERE Site LIKE 'dummy_%'"))
         session.execute(text("DELETE FROM pompa WHERE Site LIKE 'dummy_%'"))
+        session.execute(text("DELETE FROM water_balance WHERE Site LIKE 'dummy_%'"))
+        session.execute(text("DELETE FROM alerts WHERE Site LIKE 'dummy_%'"))
+        bump_data_version(session)
         session.commit()
@@ -0,0 +1,95 @@
+import io
+
+import pandas as pd
+from sqlalchemy import text
+
+import database as db
+
+# --- EXPORT DATA (Parquet / CSV) ---
+# File hanya dibuat saat tombol download diklik. Baris dibaca dari DB per chunk
+# (stream_results = server-side cursor di PostgreSQL) dan langsung ditulis ke file,
+# jadi memori tidak ikut tumbuh dengan panjang histori.
+
+CHUNK_ROWS = 50_000
+PARQUET_COMPRESSION = "zstd"
+
+# Nama dataset -> (nama file, kolom tampilan)
+DATASETS = {
+    "Sump": ("sump", db.SUMP_COLUMNS),
+    "Pompa": ("pompa", db.POMPA_COLUMNS),
+    # Sama dengan df_wb_dash dari processing.process_water_balance (kolom sump + water balance)
+    "Water Balance": ("water_balance", db.SUMP_COLUMNS + db.WB_COLUMNS),
+}
+
+# Format -> (ekstensi, MIME)
+FORMATS = {
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+    "CSV": ("csv", "text/csv"),
+}
+
+def _query(dataset, site=None, pit=None, start=None, end=None):
+    """SELECT for one dataset in the given scope, ordered by Site, Pit, Tanggal."""
+    if dataset == "Water Balance":
+        where, params = db._build_filter(site, pit, None, start, end, alias="s.")
+        cols = [f"s.{c}" for c in db.SUMP_COLUMN_MAP] + [f"w.{c}" for c in db.WB_COLUMN_MAP]
+        sql = (f"SELECT {', '.join(cols)} FROM sump s LEFT JOIN water_balance w "
+               f"ON w.Site = s.Site AND w.Pit = s.Pit AND w.Tanggal = s.Tanggal{where} "
+               f"ORDER BY s.Site, s.Pit, s.Tanggal")
+    else:
+        table, _ = DATASETS[dataset]
+        col_map, key = db._TABLES[table]
+        where, params = db._build_filter(site, pit, None, start, end)
+        sql = f"SELECT {', '.join(col_map)} FROM {table}{where} ORDER BY Site, Pit, {', '.join(c for c in key if c not in ('site', 'pit'))}"
+    return text(sql), params
+
+def iter_chunks(dataset, site=None, pit=None, start=None, end=None, chunksize=CHUNK_ROWS):
+    """Yield display-named DataFrames of at most `chunksize` rows, streamed from the DB."""
+    _, columns = DATASETS[dataset]
+    stmt, params = _query(dataset, site, pit, start, end)
+    with db.get_connection().session as session:
+        result = session.execute(stmt.execution_options(stream_results=True, yield_per=chunksize), params)
+        for rows in result.partitions(chunksize):
+            df = pd.DataFrame(rows, columns=columns)
+            df['Tanggal'] = pd.to_datetime(df['Tanggal']).dt.date
+            for c in columns:
+                if c != 'Tanggal' and c not in db.DIM_COLUMNS:
+                    df[c] = pd.to_numeric(df[c], errors='coerce')
+            yield df
+
+def write_csv(chunks, columns, fh):
+    """CSV with one header row; chunks are appended as they arrive."""
+    fh.write((",".join(columns) + "\n").encode())
+    for df in chunks:
+        fh.write(df.to_csv(index=False, header=False).encode())
+
+def write_parquet(chunks, columns, fh):
+    """Compressed Parquet, one row group per chunk (fixed schema so empty/NULL chunks still match)."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        (c, pa.date32() if c == 'Tanggal' else pa.string() if c in db.DIM_COLUMNS else pa.float64())
+        for c in columns
+    ])
+    with pq.ParquetWriter(fh, schema, compression=PARQUET_COMPRESSION) as writer:
+        for df in chunks:
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+
+def export_file(dataset, fmt, site=None, pit=None, start=None, end=None):
+    """Build the export for one dataset/scope/format. Returns the file contents (bytes)."""
+    _, columns = DATASETS[dataset]
+    buf = io.BytesIO()
+    chunks = iter_chunks(dataset, site, pit, start, end)
+    if fmt == "Parquet":
+        write_parquet(chunks, columns, buf)
+    else:
+        write_csv(chunks, columns, buf)
+    return buf.getvalue()
+
+def file_name(dataset, fmt, site=None, pit=None, start=None, end=None):
+    name, _ = DATASETS[dataset]
+    ext, _ = FORMATS[fmt]
+    parts = [name] + [str(p).replace(" ", "_") for p in (site, pit) if p]
+    if start is not None or end is not None:
+        parts.append(f"{start or ''}_{end or ''}")
+    return "_".join(parts) + f".{ext}"
@@ -0,0 +1,230 @@
+import warnings
+
+import numpy as np
+import pandas as pd
+
+import processing as proc
+
+# --- FORECAST ELEVASI (Monte Carlo) ---
+# Neraca air yang sama dengan processing.compute_water_balance, dijalankan ke depan:
+#   Volume besok = Volume hari ini + hujan x catchment x 10 + groundwater - debit x EWH
+# Ribuan skenario per pit sekaligus (array skenario x pit, loop hanya per hari horizon):
+# - hujan: block bootstrap dari kalender HISTORY_DAYS hari terakhir, satu indeks hari untuk
+#   semua pit -> pit yang berdekatan tetap basah bersama
+# - pompa: ketersediaan per unit sebagai rantai Markov (peluang rusak / pulih dari histori status)
+# - operasi: pompa memompa turun ke level target (diambil acak dari volume histori pit = pola
+#   operasi yang biasa), dibatasi kapasitas unit yang tersedia
+# Elevasi dihitung dari volume lewat fit linier elevasi~volume per pit.
+
+HISTORY_DAYS = 90           # jendela histori untuk bootstrap hujan & statistik pompa
+RAIN_BLOCK_DAYS = 3         # panjang blok bootstrap (persistensi hujan antar hari)
+DEFAULT_HORIZON = 14
+DEFAULT_SCENARIOS = 1000
+DEFAULT_AREA = 5000.0       # m3 per meter elevasi jika fit elevasi~volume tidak bisa dipakai
+MAX_EWH = 24.0
+
+# Status yang membuat unit tidak bisa dipakai (rusak / tidak ada operator / cuaca)
+_DOWN_PREFIXES = ("Breakdown", "Standby - No Operator", "Standby - Hujan")
+# Prior Markov (pseudo-count) untuk unit dengan histori pendek
+_PRIOR_FAIL, _PRIOR_FIX, _PRIOR_N = 0.03, 0.3, 10
+
+SUMMARY_COLUMNS = ['Site', 'Pit', 'Data Terakhir', 'Elevasi (m)', 'Critical Elevation (m)',
+                   'Peluang Kritis (%)', 'Hari ke Kritis P10', 'Hari ke Kritis P50', 'Elevasi P90 Akhir (m)']
+BAND_COLUMNS = ['Site', 'Pit', 'Tanggal', 'P10', 'P50', 'P90', 'Peluang Kritis (%)']
+
+
+def _grid(shape, day, col, values):
+    """(days x columns) array with `values` placed at [day, col], NaN elsewhere."""
+    out = np.full(shape, np.nan)
+    out[day, col] = values
+    return out
+
+def _fill(a, fallback=0.0):
+    """Fill NaN with the column median (then `fallback` for all-NaN columns)."""
+    med = np.nanmedian(np.where(np.isnan(a).all(axis=0), fallback, a), axis=0)
+    return np.where(np.isnan(a), med, a)
+
+def prepare(df_s, df_p, history_days=HISTORY_DAYS):
+    """
+    Per-pit and per-unit model inputs from display-named sump/pompa rows (any number of pits).
+    Uses the last `history_days` days up to the latest date in df_s. Day x pit series are
+    laid out on one shared calendar.
+    """
+    t_end = df_s['Tanggal'].max()
+    t0 = t_end - pd.Timedelta(days=history_days - 1)
+    df_s = df_s[df_s['Tanggal'] >= t0].sort_values(['Site', 'Pit', 'Tanggal'])
+    g = df_s.groupby(['Site', 'Pit'], observed=True, sort=True)
+    pits = g.size().index
+    code = g.ngroup().values
+    day = ((df_s['Tanggal'] - t0) // pd.Timedelta(days=1)).values.astype(int)
+    shape = (history_days, len(pits))
+    num = {c: proc._num(df_s[c]).values.astype(float) for c in
+           ['Volume Air Survey (m3)', 'Elevasi Air (m)', 'Curah Hujan (mm)', 'Actual Catchment (Ha)', 'Groundwater (m3)']}
+    # Critical kosong / <= 0 = belum diisi (sama dengan aturan ELEVASI_KRITIS di alerts.py), bukan 0 m
+    crit = pd.to_numeric(df_s['Critical Elevation (m)'], errors='coerce').astype(float)
+    last = np.r_[np.flatnonzero(np.diff(code)), len(code) - 1]
+    vol, elev = num['Volume Air Survey (m3)'], num['Elevasi Air (m)']
+
+    # Fit elevasi = a + slope x volume per pit (OLS lewat jumlah per grup)
+    n = np.bincount(code)
+    sv, se = np.bincount(code, vol), np.bincount(code, elev)
+    var = np.bincount(code, vol * vol) - sv ** 2 / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = (np.bincount(code, vol * elev) - sv * se / n) / var
+    # Fit tidak masuk akal (data sedikit / volume konstan) -> luas default
+    slope = np.where((n >= 5) & (var > 0) & (slope > 0), slope, 1 / DEFAULT_AREA)
+
+    catchment = num['Actual Catchment (Ha)'][last]
+    rain = _grid(shape, day, code, num['Curah Hujan (mm)'])
+    levels = _grid(shape, day, code, vol)
+    gw = _grid(shape, day, code, num['Groundwater (m3)'])
+    model = {
+        "pits": pits, "last_date": df_s['Tanggal'].values[last],
+        "vol0": vol[last], "elev0": elev[last],
+        # Critical terakhir yang terisi di jendela histori; NaN = pit tanpa Critical Elevation
+        "critical": crit.where(crit > 0).groupby(code).last().reindex(range(len(pits))).values,
+        "catchment": catchment, "slope": slope,
+        # Hari tanpa data: median pit (hujan / level operasi)
+        "rain": _fill(rain), "levels": _fill(levels),
+        "gw": np.nan_to_num(np.nanmean(np.where(np.isnan(gw).all(axis=0), 0.0, gw), axis=0)),
+    }
+
+    # --- Pompa: outflow harian, kapasitas & rantai Markov per unit ---
+    df_p = df_p[(df_p['Tanggal'] >= t0) & (df_p['Tanggal'] <= t_end)]
+    p_code = pits.get_indexer(pd.MultiIndex.from_arrays([df_p['Site'], df_p['Pit']]))
+    df_p = df_p[p_code >= 0].assign(_pit=p_code[p_code >= 0]).sort_values(['_pit', 'Unit Code', 'Tanggal'])
+    debit = proc._num(df_p['Debit Actual (m3/h)']).values.astype(float)
+    ewh = proc._num(df_p['EWH Actual']).values.astype(float)
+    out = np.zeros(shape)
+    np.add.at(out, (((df_p['Tanggal'] - t0) // pd.Timedelta(days=1)).values.astype(int), df_p['_pit'].values),
+              debit * ewh)
+
+    # Residual neraca air histori (galat survey + aliran tak tercatat) -> noise volume harian
+    resid = levels[1:] - (levels[:-1] + rain[1:] * catchment * 10 + np.nan_to_num(gw[1:]) - out[1:])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)   # pit tanpa pasangan hari berurutan
+        dev = np.abs(resid - np.nanmedian(resid, axis=0))
+        model["resid_sd"] = np.nan_to_num(np.nanmedian(dev, axis=0) * 1.4826)
+
+    if df_p.empty:
+        model.update(unit_pit=np.zeros(0, dtype=int), unit_cap=np.zeros(0), p_fail=np.zeros(0),
+                     p_fix=np.zeros(0), up0=np.zeros(0, dtype=bool))
+        return model
+    down = df_p['Status Operasi'].astype(str).str.startswith(_DOWN_PREFIXES).values
+    running = (debit > 0) & (ewh > 0)
+    gu = df_p.groupby(['_pit', 'Unit Code'], observed=True, sort=True)
+    u_code = gu.ngroup().values
+    units = gu.size().index
+    stats = pd.DataFrame({
+        'd': np.where(running, debit, np.nan), 'h': np.where(running, ewh, np.nan),
+        'dp': proc._num(df_p['Debit Plan (m3/h)']).values, 'hp': proc._num(df_p['EWH Plan']).values,
+    }).groupby(u_code)
+    cap_debit = stats['d'].median().fillna(stats['dp'].median()).values
+    cap_ewh = stats['h'].quantile(0.9).fillna(stats['hp'].median()).clip(upper=MAX_EWH).values
+
+    # Transisi hari ke hari dalam unit yang sama (rows sudah urut unit, tanggal)
+    same = np.r_[False, u_code[1:] == u_code[:-1]]
+    prev_down = np.r_[False, down[:-1]]
+    up_n = np.bincount(u_code, same & ~prev_down)
+    fail = np.bincount(u_code, same & ~prev_down & down)
+    down_n = np.bincount(u_code, same & prev_down)
+    fix = np.bincount(u_code, same & prev_down & ~down)
+    u_last = np.r_[np.flatnonzero(np.diff(u_code)), len(u_code) - 1]
+    model.update(
+        unit_pit=units.get_level_values(0).values.astype(int),
+        unit_cap=np.nan_to_num(cap_debit * cap_ewh),
+        p_fail=(fail + _PRIOR_FAIL * _PRIOR_N) / (up_n + _PRIOR_N),
+        p_fix=(fix + _PRIOR_FIX * _PRIOR_N) / (down_n + _PRIOR_N),
+        up0=~down[u_last],
+    )
+    return model
+
+def simulate(model, horizon=DEFAULT_HORIZON, n_scenarios=DEFAULT_SCENARIOS, seed=0):
+    """
+    Run all scenarios for all pits. Returns (elevation quantiles [horizon, 3, pits] for
+    P10/P50/P90, daily share of scenarios at/above critical [horizon, pits],
+    first day reaching critical per scenario [scenarios, pits], inf when never or no critical).
+    """
+    rng = np.random.default_rng(seed)
+    S, P, U = n_scenarios, len(model["pits"]), len(model["unit_cap"])
+    rain_hist, levels = model["rain"], model["levels"]
+    W = len(rain_hist)
+    pit_cols = np.arange(P)
+
+    # Block bootstrap indeks hari histori, sama untuk semua pit dalam satu skenario
+    L = min(RAIN_BLOCK_DAYS, W)
+    n_blocks = -(-horizon // L)
+    starts = rng.integers(0, W - L + 1, size=(S, n_blocks))
+    day_idx = (starts[:, :, None] + np.arange(L)).reshape(S, -1)[:, :horizon]
+
+    # Unit -> pit sebagai matriks (U x P) agar kapasitas per pit = satu perkalian matriks
+    to_pit = np.zeros((U, P))
+    to_pit[np.arange(U), model["unit_pit"]] = 1.0
+    up = np.broadcast_to(model["up0"], (S, U)).copy()
+
+    vol0, slope = model["vol0"], model["slope"]
+    crit_vol = vol0 + (model["critical"] - model["elev0"]) / slope
+    vol = np.broadcast_to(vol0, (S, P)).copy()
+    first = np.full((S, P), np.inf)
+    bands = np.empty((horizon, 3, P))
+    p_crit = np.empty((horizon, P))
+
+    for h in range(horizon):
+        # float32 untuk bilangan acak: separuh waktu generator, presisi jauh di atas galat survey
+        z = rng.standard_normal((2, S, P), dtype=np.float32)
+        inflow = rain_hist[day_idx[:, h]] * model["catchment"] * 10 + model["gw"] * np.exp(0.2 * z[0])
+        u = rng.random((S, U), dtype=np.float32)
+        up = np.where(up, u >= model["p_fail"], u < model["p_fix"])
+        cap = (up * model["unit_cap"]) @ to_pit
+        target = levels[rng.integers(0, W, (S, P)), pit_cols]
+        out = np.minimum(cap, np.maximum(vol + inflow - target, 0))
+        vol = np.maximum(vol + inflow - out + z[1] * model["resid_sd"], 0)
+        hit = vol >= crit_vol
+        first[hit & np.isinf(first)] = h + 1
+        elev = model["elev0"] + (vol - vol0) * slope
+        bands[h] = np.percentile(elev, [10, 50, 90], axis=0)
+        p_crit[h] = hit.mean(axis=0)
+    return bands, p_crit, first
+
+def forecast(df_s, df_p, horizon=DEFAULT_HORIZON, n_scenarios=DEFAULT_SCENARIOS, seed=0):
+    """
+    Probabilistic elevation forecast for every pit in df_s (display-named sump/pompa rows).
+    Returns (summary: one row per pit, bands: one row per pit per forecast day).
+    A fixed seed keeps results stable between reruns on the same data. Pits without a
+    Critical Elevation get NaN risk columns (elevation bands are still forecast).
+    """
+    if df_s.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS), pd.DataFrame(columns=BAND_COLUMNS)
+    model = prepare(df_s, df_p)
+    bands, p_crit, first = simulate(model, horizon, n_scenarios, seed)
+    P = len(model["pits"])
+    sites = model["pits"].get_level_values(0).astype(str)
+    pits = model["pits"].get_level_values(1).astype(str)
+
+    # Hari ke kritis: P10 = 10% skenario terburuk sudah kritis di hari itu; NaN = tidak dalam horizon
+    ttc = np.percentile(np.minimum(first, horizon + 1), [10, 50], axis=0)
+    summary = pd.DataFrame({
+        'Site': sites, 'Pit': pits, 'Data Terakhir': model["last_date"],
+        'Elevasi (m)': model["elev0"], 'Critical Elevation (m)': model["critical"],
+        'Peluang Kritis (%)': np.round(np.isfinite(first).mean(axis=0) * 100, 1),
+        'Hari ke Kritis P10': np.where(ttc[0] <= horizon, ttc[0], np.nan),
+        'Hari ke Kritis P50': np.where(ttc[1] <= horizon, ttc[1], np.nan),
+        'Elevasi P90 Akhir (m)': bands[-1, 2].round(2),
+    })
+    # Pit yang sudah di atas kritis hari ini
+    risk_cols = ['Peluang Kritis (%)', 'Hari ke Kritis P10', 'Hari ke Kritis P50']
+    no_crit = np.isnan(model["critical"])
+    now = ~no_crit & (model["elev0"] >= model["critical"])
+    summary.loc[now, risk_cols] = [100.0, 0.0, 0.0]
+    summary.loc[no_crit, risk_cols] = np.nan
+    p_crit[:, no_crit] = np.nan
+
+    days = np.arange(1, horizon + 1)
+    bands_df = pd.DataFrame({
+        'Site': np.repeat(sites, horizon), 'Pit': np.repeat(pits, horizon),
+        'Tanggal': (np.repeat(model["last_date"], horizon) + np.tile(days, P) * np.timedelta64(1, 'D')),
+        'P10': bands[:, 0].T.ravel().round(2), 'P50': bands[:, 1].T.ravel().round(2),
+        'P90': bands[:, 2].T.ravel().round(2),
+        'Peluang Kritis (%)': (p_crit.T.ravel() * 100).round(1),
+    })
+    return summary.sort_values('Peluang Kritis (%)', ascending=False).reset_index(drop=True), bands_df
@@ -0,0 +1,193 @@
+import io
+import time
+
+import pandas as pd
+from sqlalchemy import text
+
+import database as db
+
+# --- BULK IMPORT CSV / EXCEL ---
+# Alur: baca file per chunk -> mapping nama kolom -> validasi tipe ->
+# load ke staging table (COPY di PostgreSQL, executemany di SQLite) -> merge (upsert) ke tabel utama.
+
+CHUNK_ROWS = 50_000
+
+_TEXT_COLS = {"site", "pit", "unit_code", "status", "status_operasi", "remarks"}
+
+def _col_type(col):
+    if col == "tanggal":
+        return "DATE"
+    return "TEXT" if col in _TEXT_COLS else "REAL"
+
+def _header_map(table):
+    """Accepted headers (display names as in load_data, or DB names), case-insensitive -> DB column."""
+    col_map, _ = db._TABLES[table]
+    m = {}
+    for db_col, label in col_map.items():
+        m[db_col] = db_col
+        m[label.lower()] = db_col
+        m[label.lower().replace(" ", "_")] = db_col
+    return m
+
+def read_chunks(file, filename, chunksize=CHUNK_ROWS):
+    """Yield raw DataFrame chunks from a CSV (streamed) or XLSX upload."""
+    if filename.lower().endswith((".xlsx", ".xls")):
+        # pandas tidak bisa stream Excel; dibaca sekali lalu diproses per chunk
+        df = pd.read_excel(file)
+        for i in range(0, len(df), chunksize):
+            yield df.iloc[i:i + chunksize]
+    else:
+        yield from pd.read_csv(file, chunksize=chunksize)
+
+def _parse_dates(src):
+    """ISO dates (what our exports write) parsed strictly; only the rest as day-first (dd/mm/yyyy)."""
+    out = pd.to_datetime(src, errors="coerce", format="ISO8601")
+    rest = out.isna() & src.notna()
+    if rest.any():
+        # format="mixed" + dayfirst akan membalik 2026-10-05 jadi 10 Mei, jadi hanya untuk sisanya
+        out[rest] = pd.to_datetime(src[rest], errors="coerce", format="mixed", dayfirst=True)
+    return out
+
+def normalize_chunk(table, df):
+    """
+    Map headers to DB columns and coerce types.
+    Returns (clean DB-named frame, rejected row count, bad numeric cell count).
+    """
+    col_map, key = db._TABLES[table]
+    hmap = _header_map(table)
+    df = df.rename(columns={c: hmap[str(c).strip().lower()] for c in df.columns if str(c).strip().lower() in hmap})
+
+    missing = [c for c in key if c not in df.columns and not (table == "pompa" and c == "unit_code")]
+    if missing:
+        raise ValueError(f"Kolom wajib tidak ditemukan: {', '.join(col_map[c] for c in missing)}")
+
+    out = pd.DataFrame(index=df.index)
+    bad_values = 0
+    for c in col_map:
+        src = df[c] if c in df.columns else pd.Series(None, index=df.index, dtype=object)
+        t = _col_type(c)
+        if t == "DATE":
+            out[c] = _parse_dates(src).dt.date
+        elif t == "REAL":
+            num = pd.to_numeric(src, errors="coerce")
+            bad_values += int((num.isna() & src.notna()).sum())
+            out[c] = num
+        else:
+            out[c] = src.where(src.isna(), src.astype(str).str.strip())
+
+    if table == "pompa":
+        out["unit_code"] = out["unit_code"].fillna("-")
+    if table == "sump":
+        # Status otomatis jika kosong (sama dengan form input)
+        auto = (out["elevasi_air"] > out["critical_elevation"]).map({True: "BAHAYA", False: "AMAN"})
+        out["status"] = out["status"].fillna(auto)
+
+    valid = out[key].notna().all(axis=1)
+    return out[valid], int((~valid).sum()), bad_values
+
+def _create_staging(session, table):
+    col_map, _ = db._TABLES[table]
+    staging = f"import_staging_{table}"
+    cols = ", ".join(f"{c} {_col_type(c)}" for c in col_map)
+    session.execute(text(f"DROP TABLE IF EXISTS {staging}"))
+    session.execute(text(f"CREATE TEMPORARY TABLE {staging} ({cols}, _seq BIGINT)"))
+    return staging
+
+def _stage_chunk(session, staging, df):
+    dialect = session.get_bind().dialect.name
+    cols = list(df.columns)
+    if dialect == "postgresql":
+        # COPY lewat koneksi DBAPI (psycopg2) di transaksi yang sama
+        buf = io.StringIO()
+        df.to_csv(buf, index=False, header=False)
+        buf.seek(0)
+        cur = session.connection().connection.cursor()
+        cur.copy_expert(f"COPY {staging} ({', '.join(cols)}) FROM STDIN WITH (FORMAT csv)", buf)
+        cur.close()
+    else:
+        # executemany langsung di cursor DBAPI (tuple posisional), tanpa overhead bind-param SQLAlchemy
+        df = df.assign(tanggal=df["tanggal"].astype(str))
+        rows = list(df.astype(object).where(pd.notna(df), None).itertuples(index=False, name=None))
+        mark = "?" if session.get_bind().dialect.paramstyle == "qmark" else "%s"
+        cur = session.connection().connection.cursor()
+        cur.executemany(f"INSERT INTO {staging} ({', '.join(cols)}) VALUES ({', '.join([mark] * len(cols))})", rows)
+        cur.close()
+
+def _merge_staging(session, table, staging):
+    """Upsert staging into the main table; for duplicate keys the last row in the file wins."""
+    col_map, key = db._TABLES[table]
+    cols = ", ".join(col_map)
+    sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in col_map if c not in key)
+    if session.get_bind().dialect.name == "postgresql":
+        select = f"SELECT DISTINCT ON ({', '.join(key)}) {cols} FROM {staging} ORDER BY {', '.join(key)}, _seq DESC"
+    else:
+        select = f"SELECT {cols} FROM {staging} WHERE 1=1 ORDER BY _seq"
+    res = session.execute(text(
+        f"INSERT INTO {table} ({cols}) {select} ON CONFLICT ({', '.join(key)}) DO UPDATE SET {sets}"
+    ))
+    return res.rowcount
+
+def _refresh_water_balance(session, staging):
+    """Recompute water_balance only for the (Site, Pit) date ranges touched by the import."""
+    ranges = session.execute(text(
+        f"SELECT site, pit, MIN(tanggal), MAX(tanggal) FROM {staging} GROUP BY site, pit"
+    )).fetchall()
+    for site, pit, d_min, d_max in ranges:
+        end = pd.to_datetime(d_max).date() + pd.Timedelta(days=1)
+        db.refresh_water_balance(session, site, pit, pd.to_datetime(d_min).date(), end)
+
+def bulk_upsert(session, table, chunks):
+    """
+    Stage already-clean DB-named frames (COPY on PostgreSQL) and merge them with one upsert,
+    then refresh water_balance for the touched pits. Caller bumps the data version and commits.
+    Returns the number of rows staged.
+    """
+    staging = _create_staging(session, table)
+    staged = 0
+    for df in chunks:
+        _stage_chunk(session, staging, df.assign(_seq=range(staged, staged + len(df))))
+        staged += len(df)
+    if staged:
+        _merge_staging(session, table, staging)
+        _refresh_water_balance(session, staging)
+    session.execute(text(f"DROP TABLE {staging}"))
+    return staged
+
+def import_file(table, file, filename, chunksize=CHUNK_ROWS, progress=None):
+    """
+    Import a CSV/XLSX file into `sump` or `pompa` in one transaction.
+    `progress(rows_staged)` is called after every chunk. Returns a summary dict.
+    """
+    t0 = time.perf_counter()
+    staged = rejected = bad_values = 0
+    conn = db.get_connection()
+    with conn.session as session:
+        staging = _create_staging(session, table)
+        try:
+            for chunk in read_chunks(file, filename, chunksize):
+                clean, n_rej, n_bad = normalize_chunk(table, chunk)
+                rejected += n_rej
+                bad_values += n_bad
+                if clean.empty:
+                    continue
+                clean = clean.assign(_seq=range(staged, staged + len(clean)))
+                _stage_chunk(session, staging, clean)
+                staged += len(clean)
+                if progress:
+                    progress(staged)
+            merged = _merge_staging(session, table, staging) if staged else 0
+            if staged:
+                # pompa juga mempengaruhi Volume Out, jadi kedua tabel memicu refresh
+                _refresh_water_balance(session, staging)
+                db.bump_data_version(session)
+            session.execute(text(f"DROP TABLE {staging}"))
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+
+    secs = time.perf_counter() - t0
+    return {
+        "rows": staged, "merged": merged, "rejected": rejected, "bad_values": bad_values,
+        "seconds": round(secs, 2), "rows_per_sec": int(staged / secs) if secs > 0 else staged,
+    }
@@ -0,0 +1,297 @@
+from sqlalchemy import text
+
+# --- VERSIONED SCHEMA MIGRATIONS ---
+# Setiap migrasi dijalankan sekali, tercatat di tabel schema_version.
+# SQL ditulis agar jalan di Neon (PostgreSQL) maupun SQLite (stand-in lokal).
+
+def _dialect(session):
+    return session.get_bind().dialect.name
+
+def _columns(session, table):
+    if _dialect(session) == "sqlite":
+        rows = session.execute(text(f"PRAGMA table_info({table})")).fetchall()
+        return {r[1].lower() for r in rows}
+    rows = session.execute(
+        text("SELECT column_name FROM information_schema.columns WHERE table_name = :t"), {"t": table}
+    ).fetchall()
+    return {r[0].lower() for r in rows}
+
+def _m001_base_tables(session):
+    """Tabel awal (layout lama, tanpa key)."""
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS sump (
+            Tanggal DATE, Site TEXT, Pit TEXT, Elevasi_Air REAL, Critical_Elevation REAL,
+            Volume_Air_Survey REAL, Plan_Curah_Hujan REAL, Curah_Hujan REAL,
+            Actual_Catchment REAL, Groundwater REAL, Status TEXT
+        )'''))
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS pompa (
+            Tanggal DATE, Site TEXT, Pit TEXT, Unit_Code TEXT,
+            Debit_Plan REAL, Debit_Actual REAL, EWH_Plan REAL, EWH_Actual REAL,
+            Status_Operasi TEXT, Remarks TEXT
+        )'''))
+    # Counter versi data: dinaikkan oleh setiap writer, dipakai untuk invalidasi cache
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY, version BIGINT NOT NULL
+        )'''))
+    session.execute(text("INSERT INTO data_version (id, version) VALUES (1, 0) ON CONFLICT (id) DO NOTHING"))
+
+def _m002_status_columns(session):
+    """Database lama belum punya Status_Operasi & Remarks di tabel pompa."""
+    cols = _columns(session, "pompa")
+    for col in ("status_operasi", "remarks"):
+        if col not in cols:
+            session.execute(text(f"ALTER TABLE pompa ADD COLUMN {col} TEXT"))
+
+def _m003_natural_keys(session):
+    """
+    Rebuild sump/pompa with natural primary keys (Site, Pit, Tanggal[, Unit_Code]).
+    Existing duplicates are collapsed, keeping the most recently inserted row.
+    """
+    row_order = "ctid DESC" if _dialect(session) == "postgresql" else "rowid DESC"
+
+    session.execute(text("DROP TABLE IF EXISTS sump_new"))
+    session.execute(text('''
+        CREATE TABLE sump_new (
+            Tanggal DATE NOT NULL, Site TEXT NOT NULL, Pit TEXT NOT NULL,
+            Elevasi_Air REAL, Critical_Elevation REAL,
+            Volume_Air_Survey REAL, Plan_Curah_Hujan REAL, Curah_Hujan REAL,
+            Actual_Catchment REAL, Groundwater REAL, Status TEXT,
+            PRIMARY KEY (Site, Pit, Tanggal)
+        )'''))
+    session.execute(text(f'''
+        INSERT INTO sump_new
+        SELECT DATE(Tanggal), Site, Pit, Elevasi_Air, Critical_Elevation, Volume_Air_Survey,
+               Plan_Curah_Hujan, Curah_Hujan, Actual_Catchment, Groundwater, Status
+        FROM sump
+        WHERE Tanggal IS NOT NULL AND Site IS NOT NULL AND Pit IS NOT NULL
+        ORDER BY {row_order}
+        ON CONFLICT (Site, Pit, Tanggal) DO NOTHING'''))
+    session.execute(text("DROP TABLE sump"))
+    session.execute(text("ALTER TABLE sump_new RENAME TO sump"))
+
+    session.execute(text("DROP TABLE IF EXISTS pompa_new"))
+    session.execute(text('''
+        CREATE TABLE pompa_new (
+            Tanggal DATE NOT NULL, Site TEXT NOT NULL, Pit TEXT NOT NULL, Unit_Code TEXT NOT NULL,
+            Debit_Plan REAL, Debit_Actual REAL, EWH_Plan REAL, EWH_Actual REAL,
+            Status_Operasi TEXT, Remarks TEXT,
+            PRIMARY KEY (Site, Pit, Tanggal, Unit_Code)
+        )'''))
+    session.execute(text(f'''
+        INSERT INTO pompa_new
+        SELECT DATE(Tanggal), Site, Pit, COALESCE(Unit_Code, '-'), Debit_Plan, Debit_Actual,
+               EWH_Plan, EWH_Actual, Status_Operasi, Remarks
+        FROM pompa
+        WHERE Tanggal IS NOT NULL AND Site IS NOT NULL AND Pit IS NOT NULL
+        ORDER BY {row_order}
+        ON CONFLICT (Site, Pit, Tanggal, Unit_Code) DO NOTHING'''))
+    session.execute(text("DROP TABLE pompa"))
+    session.execute(text("ALTER TABLE pompa_new RENAME TO pompa"))
+
+def _m004_water_balance(session):
+    """Tabel water balance harian per (Site, Pit, Tanggal); diisi oleh database.refresh_water_balance."""
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS water_balance (
+            Site TEXT NOT NULL, Pit TEXT NOT NULL, Tanggal DATE NOT NULL,
+            Volume_Out REAL, Volume_In_Rain REAL, Volume_In_GW REAL, Volume_Kemarin REAL,
+            Volume_Teoritis REAL, Diff_Volume REAL, Error_Pct REAL,
+            PRIMARY KEY (Site, Pit, Tanggal)
+        )'''))
+
+def now_epoch_sql(dialect):
+    """SQL expression for the DB clock as epoch seconds (float, sub-second precision)."""
+    if dialect == "postgresql":
+        return "EXTRACT(EPOCH FROM clock_timestamp())"
+    return "((julianday('now') - 2440587.5) * 86400.0)"
+
+def _m005_sync_metadata(session):
+    """
+    Change tracking for replica sync (lihat replica.py):
+    updated_at (epoch detik) di sump/pompa, di-stamp trigger bila writer tidak mengisinya,
+    sync_tombstone dicatat trigger setiap DELETE, dan sync_state untuk watermark per peer.
+    """
+    dialect = _dialect(session)
+    now = now_epoch_sql(dialect)
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS sync_tombstone (
+            tbl TEXT NOT NULL, Site TEXT NOT NULL, Pit TEXT NOT NULL, Tanggal DATE NOT NULL,
+            Unit_Code TEXT NOT NULL, deleted_at DOUBLE PRECISION NOT NULL,
+            PRIMARY KEY (tbl, Site, Pit, Tanggal, Unit_Code)
+        )'''))
+    session.execute(text("CREATE INDEX IF NOT EXISTS sync_tombstone_deleted_at ON sync_tombstone (deleted_at)"))
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS sync_state (
+            peer TEXT PRIMARY KEY, pushed_at DOUBLE PRECISION, pulled_at DOUBLE PRECISION,
+            synced_at DOUBLE PRECISION
+        )'''))
+
+    for table in ("sump", "pompa"):
+        if "updated_at" not in _columns(session, table):
+            session.execute(text(f"ALTER TABLE {table} ADD COLUMN updated_at DOUBLE PRECISION"))
+            # Baris lama: 0 di semua sisi -> tidak dianggap konflik saat sync pertama
+            session.execute(text(f"UPDATE {table} SET updated_at = 0"))
+        session.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_updated_at ON {table} (updated_at)"))
+
+    if dialect == "postgresql":
+        session.execute(text(f'''
+            CREATE OR REPLACE FUNCTION dms_stamp_updated_at() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    IF NEW.updated_at IS NULL THEN NEW.updated_at := {now}; END IF;
+                ELSIF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+                    NEW.updated_at := {now};
+                END IF;
+                RETURN NEW;
+            END $$ LANGUAGE plpgsql'''))
+        session.execute(text(f'''
+            CREATE OR REPLACE FUNCTION dms_tombstone() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO sync_tombstone (tbl, Site, Pit, Tanggal, Unit_Code, deleted_at)
+                VALUES (TG_TABLE_NAME, OLD.Site, OLD.Pit, OLD.Tanggal,
+                        COALESCE(to_jsonb(OLD) ->> 'unit_code', '-'), {now})
+                ON CONFLICT (tbl, Site, Pit, Tanggal, Unit_Code) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+                RETURN OLD;
+            END $$ LANGUAGE plpgsql'''))
+        for table in ("sump", "pompa"):
+            session.execute(text(f"DROP TRIGGER IF EXISTS {table}_stamp ON {table}"))
+            session.execute(text(f"CREATE TRIGGER {table}_stamp BEFORE INSERT OR UPDATE ON {table} "
+                                 f"FOR EACH ROW EXECUTE FUNCTION dms_stamp_updated_at()"))
+            session.execute(text(f"DROP TRIGGER IF EXISTS {table}_tombstone ON {table}"))
+            session.execute(text(f"CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table} "
+                                 f"FOR EACH ROW EXECUTE FUNCTION dms_tombstone()"))
+    else:
+        for table in ("sump", "pompa"):
+            unit = "OLD.Unit_Code" if table == "pompa" else "'-'"
+            session.execute(text(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_stamp_insert AFTER INSERT ON {table}
+                FOR EACH ROW WHEN NEW.updated_at IS NULL
+                BEGIN UPDATE {table} SET updated_at = {now} WHERE rowid = NEW.rowid; END'''))
+            session.execute(text(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_stamp_update AFTER UPDATE ON {table}
+                FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at
+                BEGIN UPDATE {table} SET updated_at = {now} WHERE rowid = NEW.rowid; END'''))
+            session.execute(text(f'''
+                CREATE TRIGGER IF NOT EXISTS {table}_tombstone AFTER DELETE ON {table}
+                FOR EACH ROW
+                BEGIN
+                    INSERT OR REPLACE INTO sync_tombstone (tbl, Site, Pit, Tanggal, Unit_Code, deleted_at)
+                    VALUES ('{table}', OLD.Site, OLD.Pit, OLD.Tanggal, {unit}, {now});
+                END'''))
+
+def _m006_alerts(session):
+    """Alert aktif per (Site, Pit, Rule); dirawat oleh alerts.refresh (lihat alerts.py)."""
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            Site TEXT NOT NULL, Pit TEXT NOT NULL, Rule TEXT NOT NULL, Severity TEXT NOT NULL,
+            Tanggal DATE, Nilai REAL, Pesan TEXT, Sejak DATE,
+            PRIMARY KEY (Site, Pit, Rule)
+        )'''))
+
+def _m007_date_indexes(session):
+    """Index (Tanggal, natural key) untuk paginasi keyset urut tanggal lintas pit (lihat database.load_page)."""
+    session.execute(text("CREATE INDEX IF NOT EXISTS sump_tanggal ON sump (Tanggal, Site, Pit)"))
+    session.execute(text("CREATE INDEX IF NOT EXISTS pompa_tanggal ON pompa (Tanggal, Site, Pit, Unit_Code)"))
+
+def _m008_received_at(session):
+    """
+    received_at (epoch detik, jam DB ini) di sump/pompa/sync_tombstone: di-stamp trigger pada setiap
+    INSERT/UPDATE, termasuk baris yang datang lewat sync. Watermark sync memakai kolom ini;
+    updated_at/deleted_at tetap dari penulis asal dan hanya untuk last-writer-wins.
+    """
+    dialect = _dialect(session)
+    now = now_epoch_sql(dialect)
+    for table, since in (("sump", "updated_at"), ("pompa", "updated_at"), ("sync_tombstone", "deleted_at")):
+        if "received_at" not in _columns(session, table):
+            session.execute(text(f"ALTER TABLE {table} ADD COLUMN received_at DOUBLE PRECISION"))
+            session.execute(text(f"UPDATE {table} SET received_at = {since}"))
+        session.execute(text(f"CREATE INDEX IF NOT EXISTS {table}_received_at ON {table} (received_at)"))
+
+    if dialect == "postgresql":
+        # Trigger sump/pompa dari migrasi 5 sudah BEFORE INSERT OR UPDATE: cukup ganti fungsinya
+        session.execute(text(f'''
+            CREATE OR REPLACE FUNCTION dms_stamp_updated_at() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    IF NEW.updated_at IS NULL THEN NEW.updated_at := {now}; END IF;
+                ELSIF NEW.updated_at IS NOT DISTINCT FROM OLD.updated_at THEN
+                    NEW.updated_at := {now};
+                END IF;
+                NEW.received_at := {now};
+                RETURN NEW;
+            END $$ LANGUAGE plpgsql'''))
+        session.execute(text(f'''
+            CREATE OR REPLACE FUNCTION dms_stamp_received_at() RETURNS trigger AS $$
+            BEGIN
+                NEW.received_at := {now};
+                RETURN NEW;
+            END $$ LANGUAGE plpgsql'''))
+        session.execute(text("DROP TRIGGER IF EXISTS sync_tombstone_stamp ON sync_tombstone"))
+        session.execute(text("CREATE TRIGGER sync_tombstone_stamp BEFORE INSERT OR UPDATE ON sync_tombstone "
+                             "FOR EACH ROW EXECUTE FUNCTION dms_stamp_received_at()"))
+    else:
+        # SQLite: trigger AFTER yang meng-UPDATE barisnya sendiri; satu UPDATE mengisi kedua kolom,
+        # dan WHEN pada received_at mencegah trigger terpicu lagi oleh UPDATE-nya sendiri
+        for table in ("sump", "pompa"):
+            session.execute(text(f"DROP TRIGGER IF EXISTS {table}_stamp_insert"))
+            session.execute(text(f"DROP TRIGGER IF EXISTS {table}_stamp_update"))
+            session.execute(text(f'''
+                CREATE TRIGGER {table}_stamp_insert AFTER INSERT ON {table}
+                FOR EACH ROW
+                BEGIN UPDATE {table} SET updated_at = COALESCE(NEW.updated_at, {now}), received_at = {now}
+                      WHERE rowid = NEW.rowid; END'''))
+            session.execute(text(f'''
+                CREATE TRIGGER {table}_stamp_update AFTER UPDATE ON {table}
+                FOR EACH ROW WHEN NEW.received_at IS OLD.received_at
+                BEGIN UPDATE {table}
+                      SET updated_at = CASE WHEN NEW.updated_at IS OLD.updated_at THEN {now} ELSE NEW.updated_at END,
+                          received_at = {now}
+                      WHERE rowid = NEW.rowid; END'''))
+        session.execute(text(f'''
+            CREATE TRIGGER IF NOT EXISTS sync_tombstone_stamp_insert AFTER INSERT ON sync_tombstone
+            FOR EACH ROW
+            BEGIN UPDATE sync_tombstone SET received_at = {now} WHERE rowid = NEW.rowid; END'''))
+        session.execute(text(f'''
+            CREATE TRIGGER IF NOT EXISTS sync_tombstone_stamp_update AFTER UPDATE ON sync_tombstone
+            FOR EACH ROW WHEN NEW.received_at IS OLD.received_at
+            BEGIN UPDATE sync_tombstone SET received_at = {now} WHERE rowid = NEW.rowid; END'''))
+
+# (version, description, fn) - urutan penting, jangan ubah migrasi yang sudah rilis
+MIGRATIONS = [
+    (1, "base tables + data_version", _m001_base_tables),
+    (2, "pompa status_operasi/remarks", _m002_status_columns),
+    (3, "natural primary keys sump/pompa", _m003_natural_keys),
+    (4, "daily water_balance table", _m004_water_balance),
+    (5, "sync metadata: updated_at, tombstones, watermarks", _m005_sync_metadata),
+    (6, "alerts table", _m006_alerts),
+    (7, "date indexes for keyset paging", _m007_date_indexes),
+    (8, "sync arrival stamp received_at", _m008_received_at),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(session):
+    session.execute(text('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY, description TEXT, applied_at TIMESTAMP
+        )'''))
+    v = session.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return v or 0
+
+def migrate(session):
+    """Apply pending migrations, each in its own transaction. Returns the list of applied versions."""
+    applied = []
+    start = current_version(session)
+    session.commit()
+    for version, desc, fn in MIGRATIONS:
+        if version <= start:
+            continue
+        fn(session)
+        session.execute(
+            text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, CURRENT_TIMESTAMP)"),
+            {"v": version, "d": desc}
+        )
+        session.commit()
+        applied.append(version)
+    return applied
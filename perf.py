@@ -0,0 +1,224 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+from sqlalchemy import event
+
+# --- PERFORMANCE TRACING (span per rerun) ---
+# Span waktu di sekitar query DB, tahap processing dan pembuatan grafik, dikumpulkan per rerun
+# (per thread script Streamlit). Rerun yang selesai disimpan di ring buffer proses (panel
+# Performance di tab Super Admin) dan opsional ditulis sebagai log JSON, satu baris per rerun.
+# Saat nonaktif span() hanya satu pengecekan atribut thread-local.
+
+ENABLED = os.environ.get("DMS_PERF", "0") == "1"
+LOG_JSON = os.environ.get("DMS_PERF_LOG", "0") == "1"
+HISTORY = 200          # rerun terakhir yang disimpan
+MAX_SPANS = 2000       # batas span per rerun (sisanya hanya dihitung)
+
+log = logging.getLogger("dms.perf")
+
+_tls = threading.local()
+_history = deque(maxlen=HISTORY)
+_history_lock = threading.Lock()
+
+
+def set_enabled(enabled=None, log_json=None):
+    """Process-wide switches (admin panel); None leaves a switch unchanged."""
+    global ENABLED, LOG_JSON
+    if enabled is not None:
+        ENABLED = bool(enabled)
+    if log_json is not None:
+        LOG_JSON = bool(log_json)
+
+def active():
+    """True when the current thread is collecting a trace."""
+    return getattr(_tls, "trace", None) is not None
+
+def _record(trace, rec):
+    if len(trace["spans"]) < MAX_SPANS:
+        trace["spans"].append(rec)
+    else:
+        trace["dropped"] = trace.get("dropped", 0) + 1
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "t0", "depth")
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.depth = self.trace["_depth"]
+        self.trace["_depth"] += 1
+        self.t0 = time.perf_counter()
+        return self.attrs
+
+    def __exit__(self, exc_type, exc, tb):
+        t1 = time.perf_counter()
+        tr = self.trace
+        tr["_depth"] -= 1
+        rec = {"name": self.name, "depth": self.depth,
+               "start_ms": (self.t0 - tr["_t0"]) * 1000, "ms": (t1 - self.t0) * 1000}
+        rec.update(self.attrs)
+        if exc_type is not None:
+            rec["error"] = exc_type.__name__
+        _record(tr, rec)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL = _NullSpan()
+
+
+def span(name, **attrs):
+    """
+    Context manager timing one step of the current rerun. Yields a dict for attributes known
+    only afterwards (rows, bytes, ...). Outside a trace it is a shared no-op.
+    """
+    tr = getattr(_tls, "trace", None)
+    if tr is None:
+        return _NULL
+    return _Span(tr, name, attrs)
+
+def begin(name="rerun", **attrs):
+    """Start tracing this thread's rerun (no-op when disabled). An unfinished previous trace is dropped."""
+    if not ENABLED:
+        _tls.trace = None
+        return
+    _tls.trace = dict(attrs, name=name, at=time.time(), spans=[], _t0=time.perf_counter(), _depth=0)
+
+def end():
+    """Finish the current trace, keep it in the history (and log it). Returns the trace or None."""
+    tr = getattr(_tls, "trace", None)
+    if tr is None:
+        return None
+    _tls.trace = None
+    tr["ms"] = (time.perf_counter() - tr.pop("_t0")) * 1000
+    tr.pop("_depth")
+    with _history_lock:
+        _history.append(tr)
+    if LOG_JSON:
+        _emit(tr)
+    return tr
+
+@contextmanager
+def trace(name, **attrs):
+    """Root trace for a fragment rerun, or just a span when a full rerun is already being traced."""
+    if active():
+        with span(name, **attrs):
+            yield
+        return
+    begin(name, **attrs)
+    try:
+        yield
+    finally:
+        end()
+
+def traced(name):
+    """Decorator form of trace() (used on the view fragments)."""
+    def deco(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED and not active():
+                return fn(*args, **kwargs)
+            with trace(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def _emit(tr):
+    if not log.handlers:
+        # Satu baris JSON per rerun ke stderr, terpisah dari log Streamlit
+        h = logging.StreamHandler(sys.stderr)
+        h.setFormatter(logging.Formatter("%(message)s"))
+        log.addHandler(h)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    log.info(json.dumps(dict(tr, event="dms.perf"), default=str))
+
+# --- DB: setiap statement jadi span "sql.<verb>" ---
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and getattr(_tls, "trace", None) is not None:
+        context._dms_perf_t0 = time.perf_counter()
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    tr = getattr(_tls, "trace", None)
+    t0 = getattr(context, "_dms_perf_t0", None)
+    if tr is None or t0 is None:
+        return
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "?"
+    rec = {"name": f"sql.{verb}", "depth": tr["_depth"],
+           "start_ms": (t0 - tr["_t0"]) * 1000, "ms": (time.perf_counter() - t0) * 1000}
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        rec["rows"] = cursor.rowcount
+    if executemany:
+        rec["batch"] = len(parameters)
+    _record(tr, rec)
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_execute)
+    event.listen(engine, "after_cursor_execute", _after_execute)
+
+# --- RINGKASAN (panel Performance) ---
+def history(n=None):
+    """Finished traces, oldest first (at most the last `n`)."""
+    with _history_lock:
+        traces = list(_history)
+    return traces[-n:] if n else traces
+
+def clear():
+    with _history_lock:
+        _history.clear()
+
+def rerun_table(traces):
+    """One row per rerun: total, time in SQL statements, statement count, rows read."""
+    rows = []
+    for tr in reversed(traces):
+        sql = [s for s in tr["spans"] if s["name"].startswith("sql.")]
+        rows.append({
+            "Waktu": time.strftime("%H:%M:%S", time.localtime(tr["at"])),
+            "Rerun": tr["name"],
+            "Total (ms)": round(tr["ms"], 1),
+            "DB (ms)": round(sum(s["ms"] for s in sql), 1),
+            "Statement": len(sql),
+            "Baris dibaca": sum(s.get("rows", 0) for s in tr["spans"] if s["name"] == "db.read_sql"),
+            "Span": len(tr["spans"]) + tr.get("dropped", 0),
+        })
+    return pd.DataFrame(rows)
+
+def percentiles(traces):
+    """Per span name (plus whole reruns per rerun name): count, p50/p90/p99/max and mean rows/bytes."""
+    recs = [dict(s) for tr in traces for s in tr["spans"]]
+    recs += [{"name": f"[{tr['name']}]", "ms": tr["ms"]} for tr in traces]
+    if not recs:
+        return pd.DataFrame()
+    df = pd.DataFrame(recs)
+    for c in ("rows", "bytes"):
+        if c not in df.columns:
+            df[c] = float("nan")
+    g = df.groupby("name")
+    out = pd.DataFrame({
+        "n": g.size(),
+        "p50 (ms)": g["ms"].quantile(0.5), "p90 (ms)": g["ms"].quantile(0.9),
+        "p99 (ms)": g["ms"].quantile(0.99), "max (ms)": g["ms"].max(),
+        "total (ms)": g["ms"].sum(),
+        "rows (avg)": g["rows"].mean(), "bytes (avg)": g["bytes"].mean(),
+    })
+    return out.sort_values("total (ms)", ascending=False).round(1).reset_index().rename(columns={"name": "Span"})
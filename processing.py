@@ -1,9 +1,167 @@
 import pandas as pd
 import numpy as np
 
-def process_water_balance(df_s, df_p, selected_site, selected_pit, selected_unit, year, month_int):
+import perf
+
+WB_KEYS = ['Site', 'Pit', 'Tanggal']
+WB_COLUMNS = ['Volume Out', 'Volume In (Rain)', 'Volume In (GW)', 'Volume Kemarin',
+              'Volume Teoritis', 'Diff Volume', 'Error %']
+
+def _num(series):
+    return pd.to_numeric(series, errors='coerce').fillna(0)
+
+def compute_water_balance(df_s, df_p, start=None, end=None):
+    """
+    Batch engine: water balance for every (Site, Pit) in df_s in one vectorized pass.
+    Volume Out is the summed pump outflow of the pit that day; Volume Kemarin is the
+    survey of the previous calendar day of the same pit (NaN if missing), same rules as
+    the water_balance table. Pass one extra day before `start` so the first day has a lag.
+    Returns the sump rows in [start, end] with the balance columns, sorted by Site, Pit, Tanggal.
+    """
+    if df_s.empty:
+        return pd.DataFrame(columns=[c for c in df_s.columns if c not in WB_COLUMNS] + WB_COLUMNS)
+    df_wb = df_s.drop(columns=[c for c in WB_COLUMNS if c in df_s.columns])
+    df_wb['Tanggal'] = pd.to_datetime(df_wb['Tanggal']).dt.normalize()
+
+    # A. Volume Out: total semua pompa per (Site, Pit, Tanggal)
+    if df_p is not None and not df_p.empty:
+        out = pd.DataFrame({
+            'Site': df_p['Site'].values, 'Pit': df_p['Pit'].values,
+            'Tanggal': pd.to_datetime(df_p['Tanggal']).dt.normalize().values,
+            'Volume Out': (_num(df_p['Debit Actual (m3/h)']) * _num(df_p['EWH Actual'])).values,
+        }).groupby(WB_KEYS, observed=True, as_index=False)['Volume Out'].sum()
+        df_wb = df_wb.merge(out, on=WB_KEYS, how='left')
+        df_wb['Volume Out'] = df_wb['Volume Out'].fillna(0)
+    else:
+        df_wb['Volume Out'] = 0.0
+
+    # B. Inflow
+    for col in ['Curah Hujan (mm)', 'Actual Catchment (Ha)', 'Groundwater (m3)', 'Volume Air Survey (m3)']:
+        df_wb[col] = _num(df_wb[col])
+    df_wb['Volume In (Rain)'] = df_wb['Curah Hujan (mm)'] * df_wb['Actual Catchment (Ha)'] * 10
+    df_wb['Volume In (GW)'] = df_wb['Groundwater (m3)']
+
+    # Lag per pit: survey hari sebelumnya (kalender) dari pit yang sama
+    prev = df_wb[WB_KEYS + ['Volume Air Survey (m3)']].rename(columns={'Volume Air Survey (m3)': 'Volume Kemarin'})
+    prev['Tanggal'] = prev['Tanggal'] + pd.Timedelta(days=1)
+    df_wb = df_wb.merge(prev.drop_duplicates(WB_KEYS, keep='last'), on=WB_KEYS, how='left')
+
+    # C. Balance Equation
+    df_wb['Volume Teoritis'] = df_wb['Volume Kemarin'] + df_wb['Volume In (Rain)'] + df_wb['Volume In (GW)'] - df_wb['Volume Out']
+    df_wb['Diff Volume'] = df_wb['Volume Air Survey (m3)'] - df_wb['Volume Teoritis']
+    df_wb['Error %'] = np.where(
+        df_wb['Volume Air Survey (m3)'] > 0,
+        (df_wb['Diff Volume'].abs() / df_wb['Volume Air Survey (m3)']) * 100,
+        0.0
+    )
+
+    if start is not None:
+        df_wb = df_wb[df_wb['Tanggal'] >= pd.Timestamp(start)]
+    if end is not None:
+        df_wb = df_wb[df_wb['Tanggal'] <= pd.Timestamp(end)]
+    return df_wb.sort_values(WB_KEYS).reset_index(drop=True)
+
+def site_rollup(df_wb):
+    """
+    Daily site-level totals from per-pit water balance rows (output of compute_water_balance
+    or load_data). Volumes are summed across pits; the balance is recomputed on the totals,
+    so a site day with any pit missing its previous survey has no Teoritis/Diff.
+    """
+    if df_wb.empty:
+        return pd.DataFrame(columns=['Site', 'Tanggal', 'Jumlah Pit', 'Pit BAHAYA', 'Volume Air Survey (m3)',
+                                     'Volume Out', 'Volume In (Rain)', 'Volume In (GW)', 'Volume Kemarin',
+                                     'Volume Teoritis', 'Diff Volume', 'Error %'])
+    df = df_wb.assign(_bahaya=(df_wb['Status'] == 'BAHAYA').astype(int))
+    g = df.groupby(['Site', 'Tanggal'], observed=True)
+    roll = pd.DataFrame({
+        'Jumlah Pit': g['Pit'].nunique(),
+        'Pit BAHAYA': g['_bahaya'].sum(),
+        'Volume Air Survey (m3)': g['Volume Air Survey (m3)'].sum(),
+        'Volume Out': g['Volume Out'].sum(),
+        'Volume In (Rain)': g['Volume In (Rain)'].sum(),
+        'Volume In (GW)': g['Volume In (GW)'].sum(),
+        # skipna=False: satu pit tanpa data kemarin -> total kemarin tidak diketahui
+        'Volume Kemarin': g['Volume Kemarin'].agg(lambda x: x.sum(skipna=False)),
+    }).reset_index()
+    roll['Volume Teoritis'] = roll['Volume Kemarin'] + roll['Volume In (Rain)'] + roll['Volume In (GW)'] - roll['Volume Out']
+    roll['Diff Volume'] = roll['Volume Air Survey (m3)'] - roll['Volume Teoritis']
+    roll['Error %'] = np.where(
+        roll['Volume Air Survey (m3)'] > 0,
+        (roll['Diff Volume'].abs() / roll['Volume Air Survey (m3)']) * 100,
+        0.0
+    )
+    return roll.sort_values(['Site', 'Tanggal']).reset_index(drop=True)
+
+MONTHLY_COLUMNS = ['Site', 'Pit', 'Bulan', 'Hari Data', 'Hari BAHAYA', 'Elevasi Max (m)',
+                   'Survey Awal (m3)', 'Survey Akhir (m3)', 'Volume In (Rain)', 'Volume In (GW)',
+                   'Volume Out', 'Diff Volume', 'Error % Rata-rata', 'Error % Max']
+
+def monthly_summary(df_wb):
+    """
+    Month-end reconciliation per (Site, Pit, Bulan) from daily water balance rows:
+    flows and Diff Volume summed over the month, survey volume on the first/last data day.
+    """
+    if df_wb.empty:
+        return pd.DataFrame(columns=MONTHLY_COLUMNS)
+    df = df_wb.sort_values(WB_KEYS).assign(
+        Bulan=df_wb['Tanggal'].dt.to_period('M').astype(str),
+        _bahaya=(df_wb['Status'] == 'BAHAYA').astype(int),
+    )
+    out = df.groupby(['Site', 'Pit', 'Bulan'], observed=True).agg(**{
+        'Hari Data': ('Tanggal', 'count'),
+        'Hari BAHAYA': ('_bahaya', 'sum'),
+        'Elevasi Max (m)': ('Elevasi Air (m)', 'max'),
+        'Survey Awal (m3)': ('Volume Air Survey (m3)', 'first'),
+        'Survey Akhir (m3)': ('Volume Air Survey (m3)', 'last'),
+        'Volume In (Rain)': ('Volume In (Rain)', 'sum'),
+        'Volume In (GW)': ('Volume In (GW)', 'sum'),
+        'Volume Out': ('Volume Out', 'sum'),
+        'Diff Volume': ('Diff Volume', 'sum'),
+        'Error % Rata-rata': ('Error %', 'mean'),
+        'Error % Max': ('Error %', 'max'),
+    }).reset_index()
+    return out[MONTHLY_COLUMNS]
+
+OVERVIEW_COLUMNS = ['Site', 'Pit', 'Data Terakhir', 'Status', 'Elevasi Air (m)', 'Critical Elevation (m)',
+                    'Sisa ke Critical (m)', 'Hujan MTD (mm)', 'Volume Pompa MTD (m3)', 'Error WB (%)',
+                    'Availability Pompa (%)', 'Hari Survey']
+
+def overview_metrics(df_ov):
+    """
+    Overview matrix columns from database.load_overview (one row per pit, already aggregated in SQL).
+    Availability = share of pump unit-days in the period not in Breakdown.
+    """
+    if df_ov.empty:
+        return pd.DataFrame(columns=OVERVIEW_COLUMNS)
+    elev, crit = _num(df_ov['Elevasi Air (m)']), pd.to_numeric(df_ov['Critical Elevation (m)'], errors='coerce')
+    unit_days = pd.to_numeric(df_ov['Unit-Hari'], errors='coerce')
+    out = pd.DataFrame({
+        'Site': df_ov['Site'], 'Pit': df_ov['Pit'], 'Data Terakhir': df_ov['Tanggal'],
+        'Status': np.where(elev >= crit, 'BAHAYA', 'AMAN'),
+        'Elevasi Air (m)': elev, 'Critical Elevation (m)': crit, 'Sisa ke Critical (m)': crit - elev,
+        'Hujan MTD (mm)': _num(df_ov['Curah Hujan (mm)']), 'Volume Pompa MTD (m3)': _num(df_ov['Volume Out']),
+        'Error WB (%)': pd.to_numeric(df_ov['Error %'], errors='coerce'),
+        'Availability Pompa (%)': (1 - _num(df_ov['Unit-Hari BD']) / unit_days.where(unit_days > 0)) * 100,
+        'Hari Survey': _num(df_ov['Hari Survey']).astype(int),
+    })
+    return out.sort_values(['Site', 'Pit']).reset_index(drop=True)[OVERVIEW_COLUMNS]
+
+def run_fleet_batch(df_s, df_p, start=None, end=None):
+    """
+    Evaluate the whole fleet in one call: (per-pit water balance, per-site daily roll-up)
+    for every site and pit in df_s/df_p. See compute_water_balance for the `start` lag note.
+    """
+    df_pit = compute_water_balance(df_s, df_p, start, end)
+    return df_pit, site_rollup(df_pit)
+
+def process_water_balance(df_s, df_p, selected_site, selected_pit, selected_unit, year=None, month_int=None, start=None, end=None,
+                          recompute=False):
     """
     Filters data and calculates water balance logic.
+    Period is either year + month_int, or an inclusive start/end date range (any length).
+    df_s may include the day before the period: it is only used as Volume Kemarin of the first day
+    when the balance is computed here instead of read from the water_balance columns
+    (missing columns, or recompute=True because rows not yet in the DB are in scope).
     Returns: df_wb_dash (for dashboard), df_p_display (for pump charts), title_suffix
     """
     # 1. Filter Data by Site & Pit
@@ -26,90 +184,130 @@ def process_water_balance(df_s, df_p, selected_site, selected_pit, selected_unit
     if df_s.empty:
         return df_wb_dash, df_p_display, title_suffix
 
-    # 2. Time Filter (Year & Month)
-    # Filter Sump
-    mask_s = (df_s['Tanggal'].dt.year == year) & (df_s['Tanggal'].dt.month == month_int)
-    df_s_filt = df_s[mask_s].sort_values(by="Tanggal")
-    
-    # Filter Pompa
-    if not df_p.empty:
-        mask_p = (df_p['Tanggal'].dt.year == year) & (df_p['Tanggal'].dt.month == month_int)
-        df_p_filt = df_p[mask_p].sort_values(by="Tanggal")
-    else:
-        df_p_filt = pd.DataFrame()
+    # 2. Time Filter (Year & Month, atau rentang tanggal)
+    def period_mask(df):
+        if start is not None or end is not None:
+            mask = pd.Series(True, index=df.index)
+            if start is not None:
+                mask &= df['Tanggal'] >= pd.Timestamp(start)
+            if end is not None:
+                mask &= df['Tanggal'] < pd.Timestamp(end) + pd.Timedelta(days=1)
+            return mask
+        return (df['Tanggal'].dt.year == year) & (df['Tanggal'].dt.month == month_int)
 
-    # 3. Prepare Pump Display Data (For Charts)
-    if not df_p_filt.empty:
-        if selected_unit != "All Units":
-            # Jika unit spesifik dipilih, kita ambil semua kolom (termasuk Status & Remarks)
-            df_p_display = df_p_filt[df_p_filt['Unit Code'] == selected_unit].sort_values(by="Tanggal")
-            title_suffix = f"Unit: {selected_unit}"
+    with perf.span("proc.filter_period") as sp:
+        # Filter Sump
+        df_s_filt = df_s[period_mask(df_s)].sort_values(by="Tanggal")
+        # Hari sebelum periode (lag), hanya untuk jalur computed
+        if start is not None:
+            first_day = pd.Timestamp(start)
+        elif end is None and year is not None and month_int is not None:
+            first_day = pd.Timestamp(year, month_int, 1)
         else:
-            # FIX: Jika All Units, pastikan kolom yang akan dirata-rata bertipe NUMERIK
-            cols_to_avg = ['Debit Plan (m3/h)', 'Debit Actual (m3/h)', 'EWH Plan', 'EWH Actual']
-            
-            # Konversi paksa ke numeric (jika ada error jadi NaN)
-            for col in cols_to_avg:
-                if col in df_p_filt.columns:
-                    df_p_filt[col] = pd.to_numeric(df_p_filt[col], errors='coerce')
-
-            # Groupby dengan numeric_only=True agar aman
-            df_p_display = df_p_filt.groupby('Tanggal')[cols_to_avg].mean(numeric_only=True).reset_index()
-            title_suffix = "Rata-rata Semua Unit"
+            first_day = None
+        df_s_lag = df_s[df_s['Tanggal'] == first_day - pd.Timedelta(days=1)] if first_day is not None else df_s.iloc[:0]
 
-    # 4. Water Balance Calculation
-    if not df_s_filt.empty:
-        # A. Hitung Volume Out (Total semua pompa di Pit tersebut)
-        if not df_p_filt.empty:
-            df_p_total = df_p_filt.copy()
-            
-            # Pastikan tipe data numerik sebelum perkalian
-            df_p_total['Debit Actual (m3/h)'] = pd.to_numeric(df_p_total['Debit Actual (m3/h)'], errors='coerce').fillna(0)
-            df_p_total['EWH Actual'] = pd.to_numeric(df_p_total['EWH Actual'], errors='coerce').fillna(0)
-            
-            df_p_total['Volume Out'] = df_p_total['Debit Actual (m3/h)'] * df_p_total['EWH Actual']
-            
-            # Group by Tanggal, Site, Pit untuk mendapatkan total volume buang harian
-            daily_out = df_p_total.groupby(['Site', 'Pit', 'Tanggal'])['Volume Out'].sum().reset_index()
-            
-            # Merge ke data Sump
-            df_wb = pd.merge(df_s_filt, daily_out, on=['Site', 'Pit', 'Tanggal'], how='left')
-            df_wb['Volume Out'] = df_wb['Volume Out'].fillna(0)
+        # Filter Pompa
+        if not df_p.empty:
+            df_p_filt = df_p[period_mask(df_p)].sort_values(by="Tanggal")
         else:
+            df_p_filt = pd.DataFrame()
+        sp["rows"] = len(df_s_filt) + len(df_p_filt)
+
+    # 3. Prepare Pump Display Data (For Charts)
+    with perf.span("proc.pump_display"):
+        if not df_p_filt.empty:
+            if selected_unit != "All Units":
+                # Jika unit spesifik dipilih, kita ambil semua kolom (termasuk Status & Remarks)
+                df_p_display = df_p_filt[df_p_filt['Unit Code'] == selected_unit].sort_values(by="Tanggal")
+                title_suffix = f"Unit: {selected_unit}"
+            else:
+                # FIX: Jika All Units, pastikan kolom yang akan dirata-rata bertipe NUMERIK
+                cols_to_avg = ['Debit Plan (m3/h)', 'Debit Actual (m3/h)', 'EWH Plan', 'EWH Actual']
+
+                # Konversi paksa ke numeric (jika ada error jadi NaN)
+                for col in cols_to_avg:
+                    if col in df_p_filt.columns:
+                        df_p_filt[col] = pd.to_numeric(df_p_filt[col], errors='coerce')
+
+                # Groupby dengan numeric_only=True agar aman
+                df_p_display = df_p_filt.groupby('Tanggal')[cols_to_avg].mean(numeric_only=True).reset_index()
+                title_suffix = "Rata-rata Semua Unit"
+
+    # 4. Water Balance Calculation
+    if (not recompute and not df_s_filt.empty and all(c in df_s_filt.columns for c in WB_COLUMNS)
+            and df_s_filt['Volume Out'].notna().all()):
+        # Sudah dihitung di tabel water_balance (database.refresh_water_balance) - tinggal dibaca
+        with perf.span("proc.water_balance", source="db", rows=len(df_s_filt)):
             df_wb = df_s_filt.copy()
-            df_wb['Volume Out'] = 0
-
-        # B. Inflow Logic
-        # Pastikan data numerik
-        df_wb['Curah Hujan (mm)'] = pd.to_numeric(df_wb['Curah Hujan (mm)'], errors='coerce').fillna(0)
-        df_wb['Actual Catchment (Ha)'] = pd.to_numeric(df_wb['Actual Catchment (Ha)'], errors='coerce').fillna(0)
-        df_wb['Groundwater (m3)'] = pd.to_numeric(df_wb['Groundwater (m3)'], errors='coerce').fillna(0)
-        df_wb['Volume Air Survey (m3)'] = pd.to_numeric(df_wb['Volume Air Survey (m3)'], errors='coerce').fillna(0)
-
-        # Asumsi: Actual Catchment x Curah Hujan x 10 = Volume Hujan (m3)
-        df_wb['Volume In (Rain)'] = df_wb['Curah Hujan (mm)'] * df_wb['Actual Catchment (Ha)'] * 10
-        df_wb['Volume In (GW)'] = df_wb['Groundwater (m3)']
-
-        # Sort agar perhitungan shift (kemarin) benar
-        df_wb = df_wb.sort_values(by="Tanggal")
-        
-        # Ambil Volume Survey Hari Sebelumnya (Shift 1)
-        df_wb['Volume Kemarin'] = df_wb['Volume Air Survey (m3)'].shift(1)
-
-        # C. Balance Equation
-        # Teoritis hari ini = Vol Kemarin + Hujan + Groundwater - Pompa
-        df_wb['Volume Teoritis'] = df_wb['Volume Kemarin'] + df_wb['Volume In (Rain)'] + df_wb['Volume In (GW)'] - df_wb['Volume Out']
-        
-        # Diff = Survey Aktual - Teoritis
-        df_wb['Diff Volume'] = df_wb['Volume Air Survey (m3)'] - df_wb['Volume Teoritis']
-        
-        # Error % (Handle division by zero)
-        df_wb['Error %'] = np.where(
-            df_wb['Volume Air Survey (m3)'] > 0,
-            (df_wb['Diff Volume'].abs() / df_wb['Volume Air Survey (m3)']) * 100,
-            0.0
-        )
-        
-        df_wb_dash = df_wb
+            for col in WB_COLUMNS + ['Curah Hujan (mm)', 'Volume Air Survey (m3)']:
+                df_wb[col] = pd.to_numeric(df_wb[col], errors='coerce')
+            df_wb_dash = df_wb.sort_values(by="Tanggal")
+    elif not df_s_filt.empty:
+        # Hitung di tempat dengan batch engine (lag per Site/Pit, bukan per urutan baris)
+        with perf.span("proc.water_balance", source="computed", rows=len(df_s_filt)):
+            df_wb_dash = compute_water_balance(pd.concat([df_s_lag, df_s_filt]), df_p_filt, start=first_day).sort_values(by="Tanggal")
 
     return df_wb_dash, df_p_display, title_suffix
+
+# --- AGREGASI & DOWNSAMPLING UNTUK GRAFIK ---
+CHART_POINT_BUDGET = 1500   # maksimum titik per figure (baris x jumlah trace)
+AGG_LEVELS = {"Harian": 1, "Mingguan": 7, "Bulanan": 30}
+_PERIOD_CODE = {"Mingguan": "W", "Bulanan": "M"}
+
+def choose_agg_level(n_days, n_traces, budget=CHART_POINT_BUDGET):
+    """Finest level whose point count fits the budget (falls back to Bulanan)."""
+    for level, days in AGG_LEVELS.items():
+        if n_days / days * n_traces <= budget:
+            return level
+    return "Bulanan"
+
+def aggregate_period(df, level, sum_cols=(), time_sum_cols=(), max_cols=()):
+    """
+    One row per day/week/month (Tanggal = period start) for charts.
+    Rows sharing a day (several pits under "All Sumps") are combined first: `sum_cols` summed,
+    `max_cols` max, other numeric columns averaged. Over time `sum_cols` and `time_sum_cols`
+    (e.g. rainfall in mm) are summed, `max_cols` max, the rest averaged.
+    """
+    if df.empty:
+        return df
+    num = list(df.select_dtypes('number').columns)
+    per_day = {c: 'sum' if c in sum_cols else 'max' if c in max_cols else 'mean' for c in num}
+    out = df[['Tanggal'] + num]
+    if out['Tanggal'].duplicated().any():
+        out = out.groupby('Tanggal', as_index=False).agg(per_day)
+    if level in _PERIOD_CODE:
+        per_period = {c: 'sum' if c in sum_cols or c in time_sum_cols else 'max' if c in max_cols else 'mean' for c in num}
+        key = out['Tanggal'].dt.to_period(_PERIOD_CODE[level]).dt.start_time
+        out = out[num].groupby(key.rename('Tanggal')).agg(per_period).reset_index()
+    return out.sort_values('Tanggal').reset_index(drop=True)
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: positions of `n_out` points that keep the visual
+    shape of (x, y), always including the first and last point.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype='float64')
+    y = pd.Series(np.asarray(y, dtype='float64')).interpolate().bfill().ffill().fillna(0).to_numpy()
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nlo, nhi = edges[i + 1], (edges[i + 2] if i + 2 < len(edges) else n)
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        idx[i + 1] = a
+    return idx
+
+def downsample(df, y_col, max_rows):
+    """Keep at most `max_rows` rows, chosen by LTTB on `y_col` over Tanggal (other columns follow)."""
+    if len(df) <= max_rows or y_col not in df.columns:
+        return df
+    x = df['Tanggal'].astype('int64')
+    return df.iloc[lttb_indices(x, df[y_col], max_rows)]
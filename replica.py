@@ -0,0 +1,204 @@
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy import text
+
+import database as db
+import importer
+import migrations
+
+# --- REPLICA LOKAL + SYNC INKREMENTAL DUA ARAH (offline-first) ---
+# App membaca/menulis ke file SQLite lokal (database.REPLICA_PATH); worker ini mengirim perubahan
+# lokal ke Neon (push) lalu mengambil perubahan Neon (pull), masing-masing sejak watermark terakhir.
+# Perubahan dilacak lewat received_at (migrasi 8): jam DB penerima saat baris/tombstone tiba, juga
+# lewat sync, sehingga edit replica yang lama offline tetap lolos watermark peer lain. Konflik pada
+# natural key diselesaikan last-writer-wins: updated_at asal yang lebih baru menang, juga terhadap
+# tombstone (deleted_at).
+
+PEER = "neon"
+SYNC_SECONDS = 30        # interval sync saat online
+OVERLAP_SECONDS = 600    # watermark dimundurkan agar transaksi panjang yang commit terlambat tetap terbaca
+BACKOFF_BASE = 2.0       # detik, dikali 2 setiap gagal berturut-turut (offline)
+BACKOFF_MAX = 300.0
+
+_TOMBSTONE_COLUMNS = ["tbl", "site", "pit", "tanggal", "unit_code", "deleted_at"]
+
+
+def _dialect(session):
+    return session.get_bind().dialect.name
+
+def _clock(session):
+    """Current time of the DB behind `session` (epoch seconds); watermarks always use the DB's own clock."""
+    return float(session.execute(text(f"SELECT {migrations.now_epoch_sql(_dialect(session))}")).scalar())
+
+def _ensure_schema(session):
+    if migrations.current_version(session) < migrations.LATEST_VERSION:
+        if 4 in migrations.migrate(session):
+            db.refresh_water_balance(session)
+    session.commit()
+
+def changes_since(session, since):
+    """Rows of sump/pompa and tombstones received after `since` (epoch seconds, this DB's clock)."""
+    out = {}
+    for table, (col_map, _) in db._TABLES.items():
+        cols = list(col_map) + ["updated_at"]
+        rows = session.execute(
+            text(f"SELECT {', '.join(cols)} FROM {table} WHERE received_at > :since"), {"since": since}
+        ).fetchall()
+        out[table] = pd.DataFrame(rows, columns=cols)
+    rows = session.execute(
+        text(f"SELECT {', '.join(_TOMBSTONE_COLUMNS)} FROM sync_tombstone WHERE received_at > :since"), {"since": since}
+    ).fetchall()
+    out["tombstone"] = pd.DataFrame(rows, columns=_TOMBSTONE_COLUMNS)
+    return out
+
+def _stage(session, name, df):
+    """Load `df` into a temporary table (same loader as the bulk importer)."""
+    types = {"updated_at": "DOUBLE PRECISION", "deleted_at": "DOUBLE PRECISION", "tbl": "TEXT"}
+    cols = ", ".join(f"{c} {types.get(c) or importer._col_type(c)}" for c in df.columns)
+    session.execute(text(f"DROP TABLE IF EXISTS {name}"))
+    session.execute(text(f"CREATE TEMPORARY TABLE {name} ({cols})"))
+    importer._stage_chunk(session, name, df)
+    return name
+
+def apply_changes(session, changes):
+    """
+    Apply changes_since() output from the other side, last-writer-wins per natural key.
+    Rows that actually changed get their water_balance refreshed and bump the data version.
+    Caller commits. Returns the number of rows inserted, updated or deleted.
+    """
+    touched = []
+    tomb = changes["tombstone"]
+    if not tomb.empty:
+        staging = _stage(session, "sync_stage_tombstone", tomb)
+        for table, (_, key) in db._TABLES.items():
+            match = " AND ".join(f"x.{c} = {table}.{c}" for c in key)
+            touched += session.execute(text(f'''
+                DELETE FROM {table} WHERE EXISTS (
+                    SELECT 1 FROM {staging} x WHERE x.tbl = '{table}' AND {match}
+                    AND ({table}.updated_at IS NULL OR {table}.updated_at < x.deleted_at)
+                ) RETURNING Site, Pit, Tanggal''')).fetchall()
+        # Trigger mencatat jam lokal; simpan deleted_at asal agar tidak menghapus baris yang dibuat ulang sesudahnya.
+        # Tombstone yang sudah sama tidak ditulis ulang (received_at tetap -> tidak bolak-balik antar peer)
+        cols = ", ".join(_TOMBSTONE_COLUMNS)
+        session.execute(text(f'''
+            INSERT INTO sync_tombstone ({cols}) SELECT {cols} FROM {staging} WHERE 1=1
+            ON CONFLICT (tbl, Site, Pit, Tanggal, Unit_Code) DO UPDATE SET deleted_at = EXCLUDED.deleted_at
+            WHERE sync_tombstone.deleted_at <> EXCLUDED.deleted_at'''))
+        session.execute(text(f"DROP TABLE {staging}"))
+
+    for table, (col_map, key) in db._TABLES.items():
+        df = changes[table]
+        if df.empty:
+            continue
+        staging = _stage(session, f"sync_stage_{table}", df)
+        cols = list(col_map) + ["updated_at"]
+        sets = ", ".join(f"{c} = EXCLUDED.{c}" for c in cols if c not in key)
+        # Baris yang sudah dihapus di sisi ini sesudah updated_at-nya tidak dihidupkan lagi
+        dead = " AND ".join(f"t.{c} = x.{c}" for c in key)
+        touched += session.execute(text(f'''
+            INSERT INTO {table} ({', '.join(cols)}) SELECT {', '.join(cols)} FROM {staging} x
+            WHERE NOT EXISTS (SELECT 1 FROM sync_tombstone t WHERE t.tbl = '{table}' AND {dead}
+                              AND t.deleted_at >= x.updated_at)
+            ON CONFLICT ({', '.join(key)}) DO UPDATE SET {sets}
+            WHERE {table}.updated_at IS NULL OR EXCLUDED.updated_at > {table}.updated_at
+            RETURNING Site, Pit, Tanggal''')).fetchall()
+        session.execute(text(f"DROP TABLE {staging}"))
+
+    if touched:
+        db.refresh_water_balance_for(session, pd.DataFrame(touched, columns=['Site', 'Pit', 'Tanggal']))
+        db.bump_data_version(session)
+    return len(touched)
+
+def sync(local, remote, peer=PEER):
+    """
+    One bidirectional incremental sync between two sessions (replica and peer).
+    Push commits on the peer before the pull; the watermarks are stored in the replica's
+    sync_state only after both directions succeeded, so an interrupted sync is simply repeated.
+    Returns {"pushed": n, "pulled": n} counting rows that actually changed.
+    """
+    _ensure_schema(local)
+    _ensure_schema(remote)
+    state = local.execute(text("SELECT pushed_at, pulled_at FROM sync_state WHERE peer = :p"), {"p": peer}).fetchone()
+    pushed_at, pulled_at = (state[0] or 0.0, state[1] or 0.0) if state else (0.0, 0.0)
+
+    # Push dulu: delete lokal saat offline sampai ke peer sebelum baris lama peer ditarik kembali
+    local_now = _clock(local)
+    pushed = apply_changes(remote, changes_since(local, pushed_at - OVERLAP_SECONDS))
+    remote.commit()
+
+    remote_now = _clock(remote)
+    pulled = apply_changes(local, changes_since(remote, pulled_at - OVERLAP_SECONDS))
+    local.execute(text('''
+        INSERT INTO sync_state (peer, pushed_at, pulled_at, synced_at) VALUES (:p, :pushed, :pulled, :now)
+        ON CONFLICT (peer) DO UPDATE SET pushed_at = EXCLUDED.pushed_at, pulled_at = EXCLUDED.pulled_at,
+                                         synced_at = EXCLUDED.synced_at'''),
+        {"p": peer, "pushed": local_now, "pulled": remote_now, "now": local_now})
+    local.commit()
+    return {"pushed": pushed, "pulled": pulled}
+
+
+class ReplicaSync:
+    """Background worker that keeps the local replica and Neon in sync, backing off while offline."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.status = {
+            "last_sync_at": None, "pushed": 0, "pulled": 0,
+            "last_error": None, "failures": 0, "next_retry_at": None,
+        }
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="dms-replica-sync", daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def last_synced(self, peer=PEER):
+        """Replica clock time of the last completed sync with `peer` (None for a fresh replica)."""
+        db.ensure_schema()
+        with db.get_connection().session as session:
+            return session.execute(text("SELECT synced_at FROM sync_state WHERE peer = :p"), {"p": peer}).scalar()
+
+    def sync_now(self):
+        """Run one sync immediately (also used by the admin button). Raises when the peer is unreachable."""
+        with self._lock:
+            with db.get_connection().session as local, db.get_remote_connection().session as remote:
+                stats = sync(local, remote)
+        self.status.update(last_sync_at=time.time(), last_error=None, failures=0, next_retry_at=None, **stats)
+        return stats
+
+    def _run(self):
+        while True:
+            retry_at = self.status["next_retry_at"]
+            if not retry_at or time.time() >= retry_at:
+                try:
+                    self.sync_now()
+                except Exception as e:
+                    n = self.status["failures"] + 1
+                    delay = min(BACKOFF_BASE * 2 ** (n - 1), BACKOFF_MAX)
+                    self.status.update(failures=n, last_error=str(e).splitlines()[0],
+                                       next_retry_at=time.time() + delay)
+            retry_at = self.status["next_retry_at"]
+            self._wake.wait(max(0.5, retry_at - time.time()) if retry_at else SYNC_SECONDS)
+            self._wake.clear()
+
+
+@st.cache_resource
+def get_replica_sync():
+    """Process-wide sync worker (only started when database.REPLICA_PATH is set)."""
+    s = ReplicaSync()
+    if s.last_synced() is None:
+        # Replica baru: isi dulu dari Neon sebelum render pertama (gagal -> worker yang mencoba lagi)
+        try:
+            s.sync_now()
+        except Exception as e:
+            s.status.update(failures=1, last_error=str(e).splitlines()[0], next_retry_at=time.time() + BACKOFF_BASE)
+    s.start()
+    return s
@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+# --- DATA SINTETIS (dummy & load test) ---
+# Simulasi harian per pit, vektor di semua pit/unit sekaligus (loop hanya per hari):
+# hujan musiman + cuaca regional per site (pit di site yang sama ikut basah bersama),
+# pompa dengan status Markov (breakdown berlangsung beberapa hari), jam pompa diatur untuk
+# menahan elevasi di sekitar target, dan volume mengikuti neraca air -> elevasi naik saat
+# hujan deras / pompa breakdown, Status BAHAYA muncul dengan sendirinya.
+# Output memakai nama kolom DB (sump/pompa), dipotong per blok pit agar bisa dimuat bertahap.
+
+DEFAULT_PREFIX = "dummy_"
+CHUNK_ROWS = 200_000        # perkiraan baris pompa per chunk
+
+# Nama site/pit lama dipakai untuk site pertama (tampilan sama seperti dummy sebelumnya)
+_SITES = [
+    ("Lais Coal Mine (LCM)", ["Sump Wijaya Barat", "Sump Wijaya Timur"]),
+    ("Wiraduta Sejahtera Langgeng (WSL)", ["Sump F01", "Sump F02"]),
+    ("Nusantara Energy (NE)", ["Sump S8"]),
+]
+
+RAIN_AR = 0.6               # persistensi cuaca harian (AR(1) laten per site)
+HEAVY_RAIN_MM = 40.0        # di atas ini sebagian pompa standby hujan/licin
+
+# Status Markov pompa: (Status Operasi, Remarks, peluang masuk per hari dari Running)
+STATUS = [
+    ("Running", "Normal Operation", None),
+    ("Standby - Kandas (Air Habis)", "Air sump habis", None),
+    ("Standby - Hujan/Licin", "Hujan deras, akses licin", None),
+    ("Standby - No Operator", "No Operator", 0.02),
+    ("Standby - General", "Standby", 0.02),
+    ("Breakdown (BD) Unit", "Breakdown engine", 0.015),
+    ("Breakdown (BD) Pipa", "Pipa bocor", 0.01),
+]
+_KANDAS, _HUJAN, _GENERAL, _BD_UNIT, _BD_PIPA = 1, 2, 4, 5, 6
+BD_STAY = 0.75              # peluang breakdown berlanjut besok (rata-rata 4 hari)
+
+
+def names(sites, pits, units, prefix=DEFAULT_PREFIX):
+    """(site names, per-site pit names, unit codes), all with `prefix`."""
+    site_names, pit_names = [], []
+    for i in range(sites):
+        site, known = _SITES[i] if i < len(_SITES) else (f"Site {i + 1:02d}", [])
+        site_names.append(prefix + site)
+        pit_names.append([prefix + (known[j] if j < len(known) else f"Sump P{j + 1:02d}") for j in range(pits)])
+    return site_names, pit_names, [f"{prefix}WP-{k + 1:02d}" for k in range(units)]
+
+def _rain(rng, sites, pits, doy):
+    """Daily rain (mm) per pit, shape (sites * pits, days)."""
+    days = len(doy)
+    # +1 sekitar pertengahan Januari (puncak musim hujan), -1 pertengahan Juli
+    season = np.cos(2 * np.pi * (doy - 15) / 365.25)
+    z = np.empty((sites, days))
+    eps = rng.normal(size=(sites, days)) * np.sqrt(1 - RAIN_AR ** 2)
+    z[:, 0] = rng.normal(size=sites)
+    for t in range(1, days):
+        z[:, t] = RAIN_AR * z[:, t - 1] + eps[:, t]
+    wet = z > 0.3 - 0.6 * season
+    amount = rng.gamma(0.9, 14, size=(sites, days)) * (1 + 0.4 * season) * (1 + np.maximum(z, 0))
+    site_rain = np.where(wet, amount, 0.0)
+    # Variasi lokal antar pit dalam satu site
+    rain = np.repeat(site_rain, pits, axis=0) * rng.lognormal(0, 0.2, (sites * pits, days))
+    return np.minimum(rain, 250).round(1), season
+
+def simulate(sites=3, pits=2, units=2, days=30, seed=None, end=None):
+    """
+    Run the daily simulation. Returns a dict of arrays: per pit (n_pit, days) and per pump
+    (n_pit, units, days), plus the dates and per-pit constants.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(end=pd.Timestamp(end if end is not None else pd.Timestamp.today()).normalize(),
+                          periods=days, freq="D")
+    n_pit = sites * pits
+    rain, season = _rain(rng, sites, pits, dates.dayofyear.values)
+
+    # Konstanta per pit
+    catchment = rng.uniform(15, 40, n_pit).round(1)          # Ha
+    area = rng.uniform(4000, 7000, n_pit)                    # m3 per meter elevasi
+    floor = rng.uniform(2, 8, n_pit).round(2)                # elevasi dasar sump
+    critical = (floor + rng.uniform(4, 6, n_pit)).round(1)
+    target_vol = area * (critical - floor) * rng.uniform(0.4, 0.6, n_pit)
+    gw = (rng.uniform(100, 800, n_pit)[:, None] * (1 + 0.3 * season) * rng.lognormal(0, 0.1, (n_pit, days))).round()
+    debit_plan = rng.choice([400.0, 500.0, 600.0], size=(n_pit, units))
+    inflow = rain * catchment[:, None] * 10 + gw
+
+    state = np.zeros((n_pit, units), dtype=np.int8)
+    enter = np.cumsum([0.0] + [p for _, _, p in STATUS[3:]])     # ambang kumulatif masuk status 3..6
+    status = np.empty((n_pit, units, days), dtype=np.int8)
+    ewh = np.empty((n_pit, units, days), dtype=np.float32)
+    debit = np.empty((n_pit, units, days), dtype=np.float32)
+    survey = np.empty((n_pit, days))
+    vol = target_vol * rng.uniform(0.7, 1.1, n_pit)
+
+    for t in range(days):
+        # Breakdown/standby berlanjut atau kembali Running; unit Running bisa masuk status baru
+        r = rng.random((n_pit, units))
+        stay = (state >= _BD_UNIT) & (r < BD_STAY)
+        r = rng.random((n_pit, units))
+        new = np.searchsorted(enter, r, side="right") + 2    # 3..6, atau >6 (tetap Running)
+        state = np.where(stay, state, np.where(new <= _BD_PIPA, new, 0)).astype(np.int8)
+        heavy = rain[:, t] > HEAVY_RAIN_MM
+        state[(state == 0) & heavy[:, None] & (rng.random((n_pit, units)) < 0.5)] = _HUJAN
+
+        # Jam pompa: cukup untuk menurunkan volume ke target (maks ~20 jam), tidak lebih
+        up = state == 0
+        ewh_max = np.clip(rng.uniform(16, 20, (n_pit, units)) - 0.05 * rain[:, t, None], 8, 20)
+        d_act = np.where(up, np.round(debit_plan * rng.uniform(0.8, 1.0, (n_pit, units))), 0.0)
+        cap = (d_act * ewh_max).sum(axis=1)
+        need = np.maximum(vol + inflow[:, t] - target_vol, 0)
+        frac = np.divide(need, cap, out=np.zeros(n_pit), where=cap > 0).clip(0, 1)
+        # Tidak perlu dipompa: Kandas bila sump hampir kosong, selain itu standby biasa
+        idle = up & (frac[:, None] < 0.1)
+        dry = (vol + inflow[:, t] < 0.25 * target_vol)[:, None]
+        state[idle & dry] = _KANDAS
+        state[idle & ~dry] = _GENERAL
+        h = np.where(up & ~idle, (ewh_max * frac[:, None]).round(1), 0.0)
+        d_act = np.where(h > 0, d_act, 0.0)
+
+        vol = np.maximum(vol + inflow[:, t] - (d_act * h).sum(axis=1), 0)
+        status[:, :, t] = state
+        ewh[:, :, t] = h
+        debit[:, :, t] = d_act
+        # Survey dengan galat ukur ~1% -> Error % water balance realistis
+        survey[:, t] = vol * rng.normal(1, 0.01, n_pit)
+
+    survey = survey.round()
+    elev = (floor[:, None] + survey / area[:, None]).round(2)
+    return {
+        "dates": dates, "sites": sites, "pits": pits, "units": units,
+        "rain": rain, "plan_rain": np.round(12 + 8 * season, 1), "groundwater": gw,
+        "catchment": catchment, "critical": critical, "survey": survey, "elevation": elev,
+        "status": status, "ewh": ewh, "debit": debit, "debit_plan": debit_plan,
+    }
+
+def iter_chunks(sim, table, prefix=DEFAULT_PREFIX, chunk_rows=CHUNK_ROWS):
+    """Yield DB-named frames of `table` ('sump'/'pompa') for consecutive blocks of pits."""
+    site_names, pit_names, unit_names = names(sim["sites"], sim["pits"], sim["units"], prefix)
+    site_of = np.repeat(site_names, sim["pits"])
+    pit_of = np.array([p for ps in pit_names for p in ps])
+    dates = sim["dates"].values
+    n_pit, days, units = len(pit_of), len(dates), sim["units"]
+    block = max(1, chunk_rows // (days * units))
+    op_names = np.array([s for s, _, _ in STATUS])
+    remarks = np.array([r for _, r, _ in STATUS])
+
+    for a in range(0, n_pit, block):
+        b = min(a + block, n_pit)
+        n = b - a
+        if table == "sump":
+            elev = sim["elevation"][a:b]
+            crit = np.repeat(sim["critical"][a:b], days)
+            yield pd.DataFrame({
+                "tanggal": np.tile(dates, n), "site": np.repeat(site_of[a:b], days),
+                "pit": np.repeat(pit_of[a:b], days), "elevasi_air": elev.ravel(),
+                "critical_elevation": crit, "volume_air_survey": sim["survey"][a:b].ravel(),
+                "plan_curah_hujan": np.tile(sim["plan_rain"], n), "curah_hujan": sim["rain"][a:b].ravel(),
+                "actual_catchment": np.repeat(sim["catchment"][a:b], days),
+                "groundwater": sim["groundwater"][a:b].ravel(),
+                "status": np.where(elev.ravel() > crit, "BAHAYA", "AMAN"),
+            })
+        else:
+            # Urutan (pit, unit, hari) mengikuti layout array simulasi
+            st_ = sim["status"][a:b].ravel()
+            yield pd.DataFrame({
+                "tanggal": np.tile(dates, n * units), "site": np.repeat(site_of[a:b], units * days),
+                "pit": np.repeat(pit_of[a:b], units * days),
+                "unit_code": np.tile(np.repeat(unit_names, days), n),
+                "debit_plan": np.repeat(sim["debit_plan"][a:b].ravel(), days),
+                "debit_actual": sim["debit"][a:b].ravel().astype(float), "ewh_plan": 20.0,
+                "ewh_actual": sim["ewh"][a:b].ravel().astype(float).round(1),
+                "status_operasi": op_names[st_], "remarks": remarks[st_],
+            })
+
+def make_frames(sites=3, pits=2, units=2, days=30, seed=None, end=None, prefix=DEFAULT_PREFIX):
+    """Whole dataset as display-named (sump, pompa) frames (benchmark / tests of scale)."""
+    import database as db
+
+    sim = simulate(sites, pits, units, days, seed, end)
+    out = []
+    for table in ("sump", "pompa"):
+        col_map, _ = db._TABLES[table]
+        df = pd.concat(iter_chunks(sim, table, prefix), ignore_index=True).rename(columns=col_map)
+        out.append(df)
+    return tuple(out)
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+import forecast
+import synthetic
+
+def _frames():
+    df_s, df_p = synthetic.make_frames(sites=1, pits=3, units=2, days=60, seed=1, end='2026-06-30')
+    df_s = df_s.astype({'Site': str, 'Pit': str})
+    pits = sorted(df_s['Pit'].unique())
+    last = df_s['Tanggal'] == df_s['Tanggal'].max()
+    # Pit 1: Critical kosong di survey terakhir saja; pit 2: tidak pernah diisi
+    df_s.loc[last & (df_s['Pit'] == pits[1]), 'Critical Elevation (m)'] = np.nan
+    df_s.loc[df_s['Pit'] == pits[2], 'Critical Elevation (m)'] = np.nan
+    return df_s, df_p, pits
+
+def test_missing_critical_falls_back_or_skips_risk():
+    df_s, df_p, pits = _frames()
+    summary, bands = forecast.forecast(df_s, df_p, horizon=7, n_scenarios=200)
+    summary = summary.set_index('Pit')
+    prev = df_s[(df_s['Pit'] == pits[1]) & df_s['Critical Elevation (m)'].notna()].sort_values('Tanggal')
+    assert summary.loc[pits[1], 'Critical Elevation (m)'] == prev['Critical Elevation (m)'].iloc[-1]
+    assert summary.loc[pits[1], 'Peluang Kritis (%)'] >= 0
+    assert summary.loc[pits[2], ['Critical Elevation (m)', 'Peluang Kritis (%)', 'Hari ke Kritis P50']].isna().all()
+    b = bands[bands['Pit'] == pits[2]]
+    assert b['Peluang Kritis (%)'].isna().all() and b['P50'].notna().all()
+
+def test_fan_chart_without_critical_has_no_line():
+    import ui
+
+    df_s, df_p, pits = _frames()
+    _, bands = forecast.forecast(df_s, df_p, horizon=7, n_scenarios=200)
+    fig = ui._fan_chart(df_s[df_s['Pit'] == pits[2]], bands[bands['Pit'] == pits[2]], float('nan'), pits[2])
+    assert not fig.layout.shapes and not fig.layout.annotations
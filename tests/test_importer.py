@@ -0,0 +1,44 @@
+import io
+from datetime import date
+
+import pandas as pd
+
+import batch
+import database as db
+import exporter
+import importer
+
+# Hari <= 12: tanggal yang ambigu antara dd/mm dan mm/dd
+DAYS = [date(2026, 10, d) for d in (1, 5, 12)] + [date(2026, 1, 13)]
+
+def _sump():
+    return pd.DataFrame({
+        'Tanggal': DAYS, 'Site': 'S1', 'Pit': 'P1', 'Elevasi Air (m)': 1.0, 'Critical Elevation (m)': 2.0,
+        'Volume Air Survey (m3)': 100.0, 'Plan Curah Hujan (mm)': 1.0, 'Curah Hujan (mm)': 2.0,
+        'Actual Catchment (Ha)': 3.0, 'Groundwater (m3)': 4.0, 'Status': 'AMAN',
+    })[db.SUMP_COLUMNS]
+
+def _export_csv(df):
+    fh = io.BytesIO()
+    exporter.write_csv([df], list(df.columns), fh)
+    fh.seek(0)
+    return fh
+
+def test_exported_csv_round_trips_dates():
+    chunks = list(importer.read_chunks(_export_csv(_sump()), "sump.csv"))
+    df, rejected, _ = importer.normalize_chunk("sump", pd.concat(chunks))
+    assert rejected == 0
+    assert list(df['tanggal']) == DAYS
+
+def test_snapshot_loader_round_trips_dates(tmp_path):
+    sump = tmp_path / "sump.csv"
+    sump.write_bytes(_export_csv(_sump()).getvalue())
+    pompa = tmp_path / "pompa.csv"
+    pompa.write_text(",".join(db.POMPA_COLUMNS) + "\n")
+    df_s, _ = batch.load_snapshot(str(sump), str(pompa))
+    assert list(df_s['Tanggal'].dt.date) == DAYS
+
+def test_day_first_dates_still_parsed():
+    src = pd.Series(["05/10/2026", "13/01/2026", "2026-10-05", None])
+    assert list(importer._parse_dates(src)) == [
+        pd.Timestamp(2026, 10, 5), pd.Timestamp(2026, 1, 13), pd.Timestamp(2026, 10, 5), pd.NaT]
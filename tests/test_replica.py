@@ -0,0 +1,74 @@
+import time
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+import database as db
+import migrations
+import replica
+
+def _sump(d, elev):
+    return {"Tanggal": d, "Site": "S", "Pit": "P", "Elevasi Air (m)": elev, "Volume Air Survey (m3)": 1000.0}
+
+def _write(engine, sql=None, rows=()):
+    with Session(engine) as s:
+        if sql:
+            s.execute(text(sql))
+        if rows:
+            db.upsert_frame(s, "sump", pd.DataFrame(list(rows)))
+        s.commit()
+    time.sleep(0.02)  # jam DB (epoch detik) harus maju di antara langkah
+
+def _elevasi(engine):
+    with Session(engine) as s:
+        return dict(s.execute(text("SELECT Tanggal, Elevasi_Air FROM sump ORDER BY Tanggal")).fetchall())
+
+def _sync(local, remote):
+    with Session(local) as l, Session(remote) as r:
+        stats = replica.sync(l, r)
+    time.sleep(0.02)
+    return stats
+
+@pytest.fixture
+def fleet(tmp_path, monkeypatch):
+    # Tanpa overlap: "offline lebih lama dari OVERLAP_SECONDS" cukup beberapa milidetik
+    monkeypatch.setattr(replica, "OVERLAP_SECONDS", 0)
+    remote, a, b = (create_engine(f"sqlite:///{tmp_path / n}.db") for n in ("remote", "a", "b"))
+    with Session(remote) as s:
+        migrations.migrate(s)
+        db.upsert_frame(s, "sump", pd.DataFrame([_sump("2026-01-01", 1.0), _sump("2026-01-02", 1.0)]))
+        s.commit()
+    _sync(a, remote)
+    _sync(b, remote)
+    return remote, a, b
+
+def test_offline_edit_reaches_other_replicas(fleet):
+    remote, a, b = fleet
+    _write(a, rows=[_sump("2026-01-01", 5.0)])  # A offline
+    _sync(b, remote)                            # B sync lebih dulu, watermark-nya melewati edit A
+    _sync(a, remote)                            # A online lagi: push
+    _sync(b, remote)
+    assert _elevasi(remote)["2026-01-01"] == _elevasi(a)["2026-01-01"] == _elevasi(b)["2026-01-01"] == 5.0
+
+def test_offline_delete_reaches_other_replicas(fleet):
+    remote, a, b = fleet
+    _write(a, sql="DELETE FROM sump WHERE Tanggal = '2026-01-02'")
+    _sync(b, remote)
+    _sync(a, remote)
+    _sync(b, remote)
+    assert "2026-01-02" not in _elevasi(remote) and "2026-01-02" not in _elevasi(b)
+
+def test_replicas_converge_and_settle(fleet):
+    remote, a, b = fleet
+    _write(a, rows=[_sump("2026-01-01", 2.0)])
+    _write(b, rows=[_sump("2026-01-01", 3.0), _sump("2026-01-03", 3.0)])  # edit B lebih baru -> menang
+    for _ in range(2):
+        _sync(a, remote)
+        _sync(b, remote)
+    _sync(a, remote)
+    assert _elevasi(a) == _elevasi(b) == _elevasi(remote) == {"2026-01-01": 3.0, "2026-01-02": 1.0, "2026-01-03": 3.0}
+    # Baris yang sudah sama di semua sisi tidak terus bolak-balik
+    assert _sync(a, remote) == {"pushed": 0, "pulled": 0}
+    assert _sync(b, remote) == {"pushed": 0, "pulled": 0}
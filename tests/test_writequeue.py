@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy.exc import OperationalError
+
+import writequeue
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    q = writequeue.WriteQueue(str(tmp_path / "queue.db"))
+    written = []
+
+    def write(items):
+        # Baris "poison": error non-DB dari upsert (payload tanpa kolom wajib)
+        for _, _, data in items:
+            if "Site" not in data:
+                raise KeyError("Site")
+            if data.get("Pit") == "offline":
+                raise OperationalError("INSERT", {}, Exception("server closed the connection"))
+        written.extend(items)
+    monkeypatch.setattr(q, "_write", write)
+    return q, written
+
+def test_non_db_error_marks_only_the_bad_row_failed(queue):
+    q, written = queue
+    q.enqueue("sump", {"Tanggal": "2026-10-01", "Site": "S", "Pit": "P"})
+    q.enqueue("sump", {"Tanggal": "2026-10-02", "Pit": "P"})
+    q.enqueue("pompa", {"Tanggal": "2026-10-02", "Site": "S", "Pit": "P", "Unit Code": "U1"})
+    assert q.flush_once() == 2
+    assert [d["Tanggal"] for _, _, d in written] == ["2026-10-01", "2026-10-02"]
+    assert q.depth() == 0 and q.status["failed_rows"] == 1
+    # Tetap gagal (tidak di-retry) setelah restart
+    assert writequeue.WriteQueue(q.path).depth() == 0
+
+def test_transient_error_keeps_the_batch(queue):
+    q, written = queue
+    q.enqueue("sump", {"Tanggal": "2026-10-01", "Site": "S", "Pit": "offline"})
+    with pytest.raises(OperationalError):
+        q.flush_once()
+    assert q.depth() == 1 and q.status["failed_rows"] == 0 and not written
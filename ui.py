@@ -1,6 +1,32 @@
 import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
+import hashlib
+import html
+import threading
+from collections import OrderedDict
+
+import alerts
+import forecast
+import perf
+import processing as proc
+
+CHART_AGG_OPTIONS = ["Otomatis"] + list(proc.AGG_LEVELS)
+LABEL_MAX_POINTS = 62   # label angka di atas bar hanya untuk seri pendek (~2 bulan harian)
+
+# Kolom water balance: volume dijumlah antar pit & waktu, curah hujan (mm) hanya dijumlah sepanjang waktu
+WB_SUM_COLS = ['Volume In (Rain)', 'Volume In (GW)', 'Volume Out']
+WB_TIME_SUM_COLS = ['Curah Hujan (mm)', 'Plan Curah Hujan (mm)']
+WB_MAX_COLS = ['Critical Elevation (m)']
+
+FIGURE_CACHE_MAX = 32        # jumlah set figure yang disimpan (LRU, lintas session)
+WEBGL_POINT_THRESHOLD = 400  # trace garis di atas jumlah titik ini pakai Scattergl (WebGL)
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+_forecast_cache = OrderedDict()
+FORECAST_HISTORY_DAYS = 30  # histori elevasi yang ikut tampil di fan chart
 
 def load_css():
     st.markdown("""
@@ -85,10 +111,48 @@ def load_css():
             padding-bottom: 5px;
         }
 
+        /* 9. ALERT STRIP (semua site/pit, di atas setiap halaman) */
+        .alert-strip {
+            padding: 8px 14px;
+            border-radius: 5px;
+            font-weight: bold;
+            margin-bottom: 6px;
+        }
+        .alert-strip.bahaya { background-color: #fdedec; color: #c0392b; border: 1px solid #e74c3c; }
+        .alert-strip.warning { background-color: #fef9e7; color: #9a7d0a; border: 1px solid #f1c40f; }
+        .alert-strip.ok { background-color: #e8f6f3; color: #117864; border: 1px solid #1abc9c; }
+
     </style>
     """, unsafe_allow_html=True)
 
-def render_charts(df_wb_dash, df_p_display, title_suffix):
+def _frame_hash(h, df):
+    h.update(repr((list(df.columns), [str(t) for t in df.dtypes])).encode())
+    if not df.empty:
+        h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+
+def _scatter(df):
+    """go.Scatter, or go.Scattergl (WebGL) for long series."""
+    return go.Scattergl if len(df) > WEBGL_POINT_THRESHOLD else go.Scatter
+
+def _build_figures(df_wb_dash, df_p_display, agg):
+    """Build all chart figures + the status log table for render_charts (pure, no st.* calls)."""
+    n_days = df_wb_dash['Tanggal'].nunique()
+    level = proc.choose_agg_level(n_days, 3) if agg == "Otomatis" else agg
+    df_p_raw = df_p_display
+    with perf.span("ui.aggregate", level=level, rows=len(df_wb_dash) + len(df_p_display)):
+        df_wb_agg = proc.aggregate_period(df_wb_dash, level, WB_SUM_COLS, WB_TIME_SUM_COLS, WB_MAX_COLS)
+        if not df_p_display.empty:
+            df_p_display = proc.aggregate_period(df_p_display, level)
+    out = {"caption": None, "figs": {}, "table": None}
+    if level != "Harian" or len(df_wb_agg) != len(df_wb_dash):
+        out["caption"] = f"📈 Agregasi grafik: {level} ({n_days:,} hari → {len(df_wb_agg):,} titik per seri)"
+
+    def fit(df, n_traces, y_col):
+        return proc.downsample(df, y_col, proc.CHART_POINT_BUDGET // n_traces)
+
+    def labels(df, col):
+        return df[col] if len(df) <= LABEL_MAX_POINTS else None
+
     # FORCE PLOTLY TO USE BLACK TEXT & TRANSPARENT BACKGROUND
     layout_settings = dict(
         paper_bgcolor='rgba(0,0,0,0)', 
@@ -97,82 +161,151 @@ def render_charts(df_wb_dash, df_p_display, title_suffix):
     )
 
     # --- 1. WATER BALANCE & RAINFALL ---
-    st.subheader("⚖️ Water Balance & Rainfall Analysis")
-    col_wb1, col_wb2 = st.columns(2)
-    
-    with col_wb1:
+    with perf.span("ui.figure.rain"):
+        df_wb = fit(df_wb_agg, 2, 'Curah Hujan (mm)')
         fig_rain = go.Figure()
         fig_rain.add_trace(go.Bar(
-            x=df_wb_dash['Tanggal'], y=df_wb_dash['Curah Hujan (mm)'], 
+            x=df_wb['Tanggal'], y=df_wb['Curah Hujan (mm)'], 
             name='Act Rain (mm)', marker_color='#3498db',
-            text=df_wb_dash['Curah Hujan (mm)'], textposition='auto'
+            text=labels(df_wb, 'Curah Hujan (mm)'), texttemplate='%{text:.1f}', textposition='auto'
         ))
-        fig_rain.add_trace(go.Scatter(
-            x=df_wb_dash['Tanggal'], y=df_wb_dash['Plan Curah Hujan (mm)'], 
+        fig_rain.add_trace(_scatter(df_wb)(
+            x=df_wb['Tanggal'], y=df_wb['Plan Curah Hujan (mm)'], 
             name='Plan Rain (mm)', mode='lines+markers', line=dict(color='#e74c3c', dash='dot')
         ))
         fig_rain.update_layout(title="Rainfall: Plan vs Actual (mm)", height=350, margin=dict(t=30), legend=dict(orientation='h', y=1.1), **layout_settings)
-        st.plotly_chart(fig_rain, use_container_width=True)
+        out["figs"]["rain"] = fig_rain
 
-    with col_wb2:
+    with perf.span("ui.figure.wb"):
+        df_wb = fit(df_wb_agg, 3, 'Volume Out')
         fig_wb = go.Figure()
-        fig_wb.add_trace(go.Bar(x=df_wb_dash['Tanggal'], y=df_wb_dash['Volume In (Rain)'], name='In (Rain)', marker_color='#3498db'))
-        fig_wb.add_trace(go.Bar(x=df_wb_dash['Tanggal'], y=df_wb_dash['Volume In (GW)'], name='In (Groundwater)', marker_color='#9b59b6'))
+        fig_wb.add_trace(go.Bar(x=df_wb['Tanggal'], y=df_wb['Volume In (Rain)'], name='In (Rain)', marker_color='#3498db'))
+        fig_wb.add_trace(go.Bar(x=df_wb['Tanggal'], y=df_wb['Volume In (GW)'], name='In (Groundwater)', marker_color='#9b59b6'))
         fig_wb.add_trace(go.Bar(
-            x=df_wb_dash['Tanggal'], y=df_wb_dash['Volume Out'], 
+            x=df_wb['Tanggal'], y=df_wb['Volume Out'], 
             name='Out (Total All Pumps)', marker_color='#e74c3c',
-            text=df_wb_dash['Volume Out'], texttemplate='%{text:.0f}', textposition='auto'
+            text=labels(df_wb, 'Volume Out'), texttemplate='%{text:.0f}', textposition='auto'
         ))
         fig_wb.update_layout(title="Volume Flow (m³): In vs Out", barmode='group', height=350, margin=dict(t=30), legend=dict(orientation='h', y=1.1), **layout_settings)
-        st.plotly_chart(fig_wb, use_container_width=True)
+        out["figs"]["wb"] = fig_wb
 
     # --- 2. ELEVATION ---
-    st.markdown("---")
-    st.subheader("🌊 Tren Elevasi Sump")
-    fig_s = go.Figure()
-    fig_s.add_trace(go.Bar(x=df_wb_dash['Tanggal'], y=df_wb_dash['Volume Air Survey (m3)'], name='Vol', marker_color='#95a5a6', opacity=0.3, yaxis='y2'))
-    fig_s.add_trace(go.Scatter(
-        x=df_wb_dash['Tanggal'], y=df_wb_dash['Elevasi Air (m)'], name='Elevasi', 
-        mode='lines+markers+text', line=dict(color='#e67e22', width=3),
-        text=df_wb_dash['Elevasi Air (m)'], texttemplate='%{text:.2f}', textposition='top center'
-    ))
-    fig_s.add_trace(go.Scatter(x=df_wb_dash['Tanggal'], y=df_wb_dash['Critical Elevation (m)'], name='Limit', line=dict(color='red', dash='dash')))
-    fig_s.update_layout(
-        yaxis2=dict(overlaying='y', side='right', showgrid=False, title="Volume (m3)"),
-        yaxis=dict(title="Elevasi (m)"), legend=dict(orientation='h', y=1.1), height=400, margin=dict(t=30),
-        **layout_settings
-    )
-    st.plotly_chart(fig_s, use_container_width=True)
+    with perf.span("ui.figure.elevasi"):
+        df_wb = fit(df_wb_agg, 3, 'Elevasi Air (m)')
+        scatter = _scatter(df_wb)
+        fig_s = go.Figure()
+        fig_s.add_trace(go.Bar(x=df_wb['Tanggal'], y=df_wb['Volume Air Survey (m3)'], name='Vol', marker_color='#95a5a6', opacity=0.3, yaxis='y2'))
+        fig_s.add_trace(scatter(
+            x=df_wb['Tanggal'], y=df_wb['Elevasi Air (m)'], name='Elevasi', 
+            mode='lines+markers+text', line=dict(color='#e67e22', width=3),
+            text=labels(df_wb, 'Elevasi Air (m)'), texttemplate='%{text:.2f}', textposition='top center'
+        ))
+        fig_s.add_trace(scatter(x=df_wb['Tanggal'], y=df_wb['Critical Elevation (m)'], name='Limit', line=dict(color='red', dash='dash')))
+        fig_s.update_layout(
+            yaxis2=dict(overlaying='y', side='right', showgrid=False, title="Volume (m3)"),
+            yaxis=dict(title="Elevasi (m)"), legend=dict(orientation='h', y=1.1), height=400, margin=dict(t=30),
+            **layout_settings
+        )
+        out["figs"]["elevasi"] = fig_s
 
     # --- 3. PUMP PERFORMANCE ---
-    st.markdown("---")
-    st.subheader(f"⚙️ Performa Pompa ({title_suffix})")
-    
     if not df_p_display.empty:
-        col_p1, col_p2 = st.columns(2)
-        with col_p1:
+        with perf.span("ui.figure.debit"):
+            df_d = fit(df_p_display, 2, 'Debit Actual (m3/h)')
             fig_d = go.Figure()
-            fig_d.add_trace(go.Bar(x=df_p_display['Tanggal'], y=df_p_display['Debit Actual (m3/h)'], name='Act', marker_color='#2ecc71', text=df_p_display['Debit Actual (m3/h)'], texttemplate='%{text:.0f}', textposition='auto'))
-            fig_d.add_trace(go.Scatter(x=df_p_display['Tanggal'], y=df_p_display['Debit Plan (m3/h)'], name='Plan', line=dict(color='#2c3e50', dash='dash')))
+            fig_d.add_trace(go.Bar(x=df_d['Tanggal'], y=df_d['Debit Actual (m3/h)'], name='Act', marker_color='#2ecc71', text=labels(df_d, 'Debit Actual (m3/h)'), texttemplate='%{text:.0f}', textposition='auto'))
+            fig_d.add_trace(_scatter(df_d)(x=df_d['Tanggal'], y=df_d['Debit Plan (m3/h)'], name='Plan', line=dict(color='#2c3e50', dash='dash')))
             fig_d.update_layout(title="Debit (m3/h)", legend=dict(orientation='h', y=1.1), height=300, margin=dict(t=30), **layout_settings)
-            st.plotly_chart(fig_d, use_container_width=True)
-        with col_p2:
+            out["figs"]["debit"] = fig_d
+
+        with perf.span("ui.figure.ewh"):
+            df_e = fit(df_p_display, 2, 'EWH Actual')
             fig_e = go.Figure()
-            fig_e.add_trace(go.Bar(x=df_p_display['Tanggal'], y=df_p_display['EWH Actual'], name='Act', marker_color='#d35400', text=df_p_display['EWH Actual'], texttemplate='%{text:.1f}', textposition='auto'))
-            fig_e.add_trace(go.Scatter(x=df_p_display['Tanggal'], y=df_p_display['EWH Plan'], name='Plan', line=dict(color='#2c3e50', dash='dash')))
+            fig_e.add_trace(go.Bar(x=df_e['Tanggal'], y=df_e['EWH Actual'], name='Act', marker_color='#d35400', text=labels(df_e, 'EWH Actual'), texttemplate='%{text:.1f}', textposition='auto'))
+            fig_e.add_trace(_scatter(df_e)(x=df_e['Tanggal'], y=df_e['EWH Plan'], name='Plan', line=dict(color='#2c3e50', dash='dash')))
             fig_e.update_layout(title="EWH (Jam)", legend=dict(orientation='h', y=1.1), height=300, margin=dict(t=30), **layout_settings)
-            st.plotly_chart(fig_e, use_container_width=True)
+            out["figs"]["ewh"] = fig_e
 
         # --- TABLE DETAIL STATUS (Hanya muncul jika kolom Status Operasi ada) ---
-        if 'Status Operasi' in df_p_display.columns:
-            st.markdown("##### 📝 Log Status & Remarks Harian")
+        if 'Status Operasi' in df_p_raw.columns:
             # Pastikan format tanggal string agar enak dibaca
-            df_table = df_p_display.copy()
+            df_table = df_p_raw.copy()
             df_table['Tanggal'] = df_table['Tanggal'].dt.strftime('%d-%m-%Y')
             
             # Pilih kolom yang relevan
             cols_to_show = ['Tanggal', 'Unit Code', 'Status Operasi', 'Remarks', 'EWH Actual']
-            cols_avail = [c for c in cols_to_show if c in df_table.columns]
+            out["table"] = df_table[[c for c in cols_to_show if c in df_table.columns]]
+    return out
+
+def get_figures(df_wb_dash, df_p_display, title_suffix, agg="Otomatis"):
+    """
+    Memoized _build_figures, keyed by a content hash of both frames + title + aggregation.
+    Bounded LRU shared by all sessions; cached figures must be treated as read-only.
+    """
+    with perf.span("ui.figure_cache_key"):
+        h = hashlib.sha1()
+        _frame_hash(h, df_wb_dash)
+        _frame_hash(h, df_p_display)
+        h.update(repr((title_suffix, agg)).encode())
+        key = h.hexdigest()
+    with _figure_cache_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            return _figure_cache[key]
+    with perf.span("ui.build_figures"):
+        built = _build_figures(df_wb_dash, df_p_display, agg)
+    with _figure_cache_lock:
+        _figure_cache[key] = built
+        while len(_figure_cache) > FIGURE_CACHE_MAX:
+            _figure_cache.popitem(last=False)
+    return built
+
+def _plot(figs, name):
+    """st.plotly_chart with a span (figure -> JSON serialization + send)."""
+    with perf.span(f"ui.plotly_chart.{name}"):
+        st.plotly_chart(figs[name], use_container_width=True)
+
+def render_charts(df_wb_dash, df_p_display, title_suffix, agg="Otomatis"):
+    """
+    Dashboard charts for any date range. Series are aggregated per day/week/month
+    (`agg`, or chosen automatically) and LTTB-downsampled so each figure stays within
+    proc.CHART_POINT_BUDGET points; the status log table keeps the raw daily rows.
+    Figures come from get_figures, so unchanged data is not rebuilt on rerun.
+    """
+    built = get_figures(df_wb_dash, df_p_display, title_suffix, agg)
+    figs = built["figs"]
+    if built["caption"]:
+        st.caption(built["caption"])
+
+    # --- 1. WATER BALANCE & RAINFALL ---
+    st.subheader("⚖️ Water Balance & Rainfall Analysis")
+    col_wb1, col_wb2 = st.columns(2)
+    
+    with col_wb1:
+        _plot(figs, "rain")
+
+    with col_wb2:
+        _plot(figs, "wb")
+
+    # --- 2. ELEVATION ---
+    st.markdown("---")
+    st.subheader("🌊 Tren Elevasi Sump")
+    _plot(figs, "elevasi")
+
+    # --- 3. PUMP PERFORMANCE ---
+    st.markdown("---")
+    st.subheader(f"⚙️ Performa Pompa ({title_suffix})")
+    
+    if "debit" in figs:
+        col_p1, col_p2 = st.columns(2)
+        with col_p1:
+            _plot(figs, "debit")
+        with col_p2:
+            _plot(figs, "ewh")
+
+        # --- TABLE DETAIL STATUS (Hanya muncul jika kolom Status Operasi ada) ---
+        if built["table"] is not None:
+            st.markdown("##### 📝 Log Status & Remarks Harian")
             
             # Styling tabel (Highlight Breakdown)
             def highlight_bd(val):
@@ -180,11 +313,182 @@ def render_charts(df_wb_dash, df_p_display, title_suffix):
                     return 'background-color: #ffcccc; color: red; font-weight: bold;'
                 return ''
 
-            st.dataframe(
-                df_table[cols_avail].style.applymap(highlight_bd, subset=['Status Operasi']),
-                use_container_width=True,
-                hide_index=True
-            )
+            with perf.span("ui.status_table", rows=len(built["table"])):
+                st.dataframe(
+                    built["table"].style.map(highlight_bd, subset=['Status Operasi']),
+                    use_container_width=True,
+                    hide_index=True
+                )
             
     else:
         st.info("Data Pompa tidak ditemukan untuk filter ini.")
+
+# --- FORECAST ELEVASI ---
+def get_forecast(df_s, df_p, horizon):
+    """forecast.forecast memoized by a content hash of the input frames (same LRU rules as get_figures)."""
+    h = hashlib.sha1()
+    _frame_hash(h, df_s)
+    _frame_hash(h, df_p)
+    h.update(repr(horizon).encode())
+    key = h.hexdigest()
+    with _figure_cache_lock:
+        if key in _forecast_cache:
+            _forecast_cache.move_to_end(key)
+            return _forecast_cache[key]
+    with perf.span("forecast.run", pits=df_s[['Site', 'Pit']].drop_duplicates().shape[0], horizon=horizon):
+        result = forecast.forecast(df_s, df_p, horizon)
+    with _figure_cache_lock:
+        _forecast_cache[key] = result
+        while len(_forecast_cache) > FIGURE_CACHE_MAX:
+            _forecast_cache.popitem(last=False)
+    return result
+
+def _fan_chart(df_hist, df_band, critical, pit):
+    """History line, P10-P90 band, P50 and the critical elevation of one pit (if set)."""
+    layout_settings = dict(paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color="black"))
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(x=df_hist['Tanggal'], y=df_hist['Elevasi Air (m)'], name='Histori',
+                             mode='lines+markers', line=dict(color='#e67e22', width=3)))
+    fig.add_trace(go.Scatter(x=df_band['Tanggal'], y=df_band['P90'], name='P90', line=dict(width=0), showlegend=False))
+    fig.add_trace(go.Scatter(x=df_band['Tanggal'], y=df_band['P10'], name='P10 - P90', line=dict(width=0),
+                             fill='tonexty', fillcolor='rgba(52,152,219,0.25)'))
+    fig.add_trace(go.Scatter(x=df_band['Tanggal'], y=df_band['P50'], name='P50', line=dict(color='#2980b9', dash='dash')))
+    if not np.isnan(critical):
+        fig.add_hline(y=critical, line=dict(color='red', dash='dash'), annotation_text=f"Critical {critical:.2f} m")
+    fig.update_layout(title=f"Forecast Elevasi: {pit}", yaxis=dict(title="Elevasi (m)"), height=400,
+                      margin=dict(t=30), legend=dict(orientation='h', y=1.1), hovermode='x unified', **layout_settings)
+    return fig
+
+def render_forecast(df_s, df_p, horizon, pit=None):
+    """
+    Forecast section: per-pit risk table and the fan chart of `pit` (or a pit picked from the
+    table, riskiest first). df_s/df_p are the site's recent rows (forecast.HISTORY_DAYS).
+    """
+    if df_s.empty:
+        st.info(f"Belum ada data {forecast.HISTORY_DAYS} hari terakhir untuk forecast.")
+        return
+    summary, bands = get_forecast(df_s, df_p, horizon)
+    st.dataframe(
+        summary.drop(columns=['Site']).style.format({
+            'Data Terakhir': lambda t: f"{t:%d-%m-%Y}", 'Elevasi (m)': '{:.2f}', 'Critical Elevation (m)': '{:.2f}',
+            'Peluang Kritis (%)': '{:.1f}%', 'Hari ke Kritis P10': '{:.0f}', 'Hari ke Kritis P50': '{:.0f}',
+            'Elevasi P90 Akhir (m)': '{:.2f}',
+        }, na_rep='-'),
+        hide_index=True, use_container_width=True
+    )
+    st.caption(f"{forecast.DEFAULT_SCENARIOS:,} skenario per pit. Peluang Kritis = skenario yang mencapai "
+               f"Critical Elevation dalam {horizon} hari; Hari ke Kritis kosong = tidak tercapai dalam horizon. "
+               f"Pit tanpa Critical Elevation hanya ditampilkan forecast elevasinya.")
+    pits = summary['Pit'].tolist()
+    if pit not in pits:
+        pit = st.selectbox("Pit untuk fan chart", pits, key="fc_pit")
+    row = summary[summary['Pit'] == pit].iloc[0]
+    df_hist = df_s[df_s['Pit'] == pit].sort_values('Tanggal')
+    df_hist = df_hist[df_hist['Tanggal'] > df_hist['Tanggal'].max() - pd.Timedelta(days=FORECAST_HISTORY_DAYS)]
+    with perf.span("ui.figure.forecast"):
+        fig = _fan_chart(df_hist, bands[bands['Pit'] == pit], float(row['Critical Elevation (m)']), pit)
+    with perf.span("ui.plotly_chart.forecast"):
+        st.plotly_chart(fig, use_container_width=True)
+
+# --- ALERT STRIP ---
+ALERT_STRIP_PITS = 3   # pit BAHAYA yang disebut langsung di strip
+
+def render_alert_strip(df_alerts):
+    """Fleet-wide alert strip shown on every page: counts per severity, details in an expander."""
+    if df_alerts.empty:
+        st.markdown("<div class='alert-strip ok'>✅ Tidak ada alert aktif di semua site/pit.</div>", unsafe_allow_html=True)
+        return
+    bahaya = df_alerts[df_alerts['Severity'] == 'BAHAYA']
+    n_warn = len(df_alerts) - len(bahaya)
+    parts = []
+    if len(bahaya):
+        pits = [f"{html.escape(str(s))} / {html.escape(str(p))}" for s, p in bahaya[['Site', 'Pit']].drop_duplicates().values]
+        more = f" +{len(pits) - ALERT_STRIP_PITS} lagi" if len(pits) > ALERT_STRIP_PITS else ""
+        parts.append(f"🚨 {len(bahaya)} BAHAYA: {', '.join(pits[:ALERT_STRIP_PITS])}{more}")
+    if n_warn:
+        parts.append(f"⚠️ {n_warn} WARNING")
+    level = "bahaya" if len(bahaya) else "warning"
+    st.markdown(f"<div class='alert-strip {level}'>{' &nbsp;|&nbsp; '.join(parts)}</div>", unsafe_allow_html=True)
+
+    n_pits = df_alerts[['Site', 'Pit']].drop_duplicates().shape[0]
+    with st.expander(f"🔔 Detail {len(df_alerts)} alert aktif ({n_pits} pit)"):
+        df_show = df_alerts.assign(Rule=df_alerts['Rule'].map(lambda r: alerts.RULES[r][1] if r in alerts.RULES else r))
+        st.dataframe(
+            df_show[['Severity', 'Site', 'Pit', 'Rule', 'Pesan', 'Tanggal', 'Sejak']].style.format({
+                'Tanggal': lambda t: f"{t:%d-%m-%Y}", 'Sejak': lambda t: f"{t:%d-%m-%Y}",
+            }, na_rep='-'),
+            hide_index=True, use_container_width=True
+        )
+
+# --- OVERVIEW (matrix site x pit) ---
+# metrik warna -> (colorscale plotly, format angka); RdYlGn: rendah = merah
+OVERVIEW_METRICS = {
+    "Sisa ke Critical (m)": ("RdYlGn", ".2f"),
+    "Availability Pompa (%)": ("RdYlGn", ".0f"),
+    "Error WB (%)": ("Reds", ".1f"),
+    "Hujan MTD (mm)": ("Blues", ",.0f"),
+    "Volume Pompa MTD (m3)": ("Greens", ",.0f"),
+}
+
+def _overview_heatmap(df_ov, metric):
+    """Heatmap: one row per site, one cell per pit (pits of a site left to right)."""
+    colorscale, fmt = OVERVIEW_METRICS[metric]
+    sites = list(dict.fromkeys(df_ov['Site']))
+    row = df_ov['Site'].map({s: i for i, s in enumerate(sites)}).values
+    col = df_ov.groupby('Site', sort=False).cumcount().values
+    shape = (len(sites), int(col.max()) + 1)
+    z = np.full(shape, np.nan)
+    z[row, col] = df_ov[metric].astype(float).values
+    text = np.full(shape, "", dtype=object)
+    hover = np.full(shape, "", dtype=object)
+    for r, c, rec in zip(row, col, df_ov.to_dict('records')):
+        val = "-" if pd.isna(rec[metric]) else format(rec[metric], fmt)
+        icon = "🚨 " if rec['Status'] == 'BAHAYA' else ""
+        text[r, c] = f"{icon}{html.escape(str(rec['Pit']))}<br>{val}"
+        hover[r, c] = "<br>".join([f"<b>{html.escape(str(rec['Site']))} / {html.escape(str(rec['Pit']))}</b>",
+                                   f"Data terakhir: {rec['Data Terakhir']:%d-%m-%Y}",
+                                   f"Elevasi: {rec['Elevasi Air (m)']:.2f} m (Critical {rec['Critical Elevation (m)']:.2f} m)",
+                                   f"Hujan MTD: {rec['Hujan MTD (mm)']:,.1f} mm",
+                                   f"Volume Pompa MTD: {rec['Volume Pompa MTD (m3)']:,.0f} m³",
+                                   f"Error WB: {rec['Error WB (%)']:.1f}%",
+                                   f"Availability Pompa: {rec['Availability Pompa (%)']:.0f}%"])
+    fig = go.Figure(go.Heatmap(
+        z=z, y=sites, x=[f"Pit {i + 1}" for i in range(shape[1])], text=text, texttemplate="%{text}",
+        hovertext=hover, hovertemplate="%{hovertext}<extra></extra>", colorscale=colorscale,
+        colorbar=dict(title=metric), xgap=3, ygap=3,
+    ))
+    fig.update_layout(
+        height=120 + 60 * len(sites), margin=dict(t=30, l=10), yaxis=dict(autorange='reversed'),
+        paper_bgcolor='rgba(0,0,0,0)', plot_bgcolor='rgba(0,0,0,0)', font=dict(color="black"),
+    )
+    return fig
+
+def render_overview(df_ov, metric, period_label):
+    """Overview tab: fleet KPIs, site x pit heatmap colored by `metric`, and the per-pit table."""
+    if df_ov.empty:
+        st.info("Belum ada data sump.")
+        return
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Jumlah Pit", f"{len(df_ov):,}", f"{df_ov['Site'].nunique()} site", delta_color="off")
+    k2.metric("Pit BAHAYA", f"{(df_ov['Status'] == 'BAHAYA').sum():,}")
+    k3.metric("Volume Pompa MTD", f"{df_ov['Volume Pompa MTD (m3)'].sum():,.0f} m³")
+    k4.metric("Availability Pompa", f"{df_ov['Availability Pompa (%)'].mean():.0f}%")
+    st.caption(f"Periode MTD: {period_label}. Elevasi & Error WB dari survey terakhir tiap pit.")
+
+    with perf.span("ui.figure.overview", pits=len(df_ov)):
+        fig = _overview_heatmap(df_ov, metric)
+    with perf.span("ui.plotly_chart.overview"):
+        st.plotly_chart(fig, use_container_width=True)
+
+    def highlight_status(val):
+        return 'background-color: #ffcccc; color: red; font-weight: bold;' if val == 'BAHAYA' else ''
+
+    with perf.span("ui.overview_table", rows=len(df_ov)):
+        st.dataframe(
+            df_ov.style.format({
+                'Data Terakhir': lambda t: f"{t:%d-%m-%Y}", 'Elevasi Air (m)': '{:.2f}',
+                'Critical Elevation (m)': '{:.2f}', 'Sisa ke Critical (m)': '{:.2f}', 'Hujan MTD (mm)': '{:,.1f}',
+                'Volume Pompa MTD (m3)': '{:,.0f}', 'Error WB (%)': '{:.1f}%', 'Availability Pompa (%)': '{:.0f}%',
+            }, na_rep='-').map(highlight_status, subset=['Status']),
+            hide_index=True, use_container_width=True
+        )
@@ -0,0 +1,228 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import streamlit as st
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+import database as db
+
+# --- WRITE-BEHIND QUEUE (mode simpan di background) ---
+# Form input menulis ke antrian SQLite lokal (tahan restart), baris langsung tampil di frame
+# session (optimistic), lalu worker thread mengirim ke Neon per batch dengan retry + backoff.
+
+QUEUE_PATH = os.environ.get("DMS_WRITE_QUEUE", ".dms_write_queue.db")
+BATCH_MAX = 200          # baris per transaksi flush
+POLL_SECONDS = 2.0       # worker cek antrian walau tidak dibangunkan
+BACKOFF_BASE = 1.0       # detik, dikali 2 setiap gagal berturut-turut
+BACKOFF_MAX = 60.0
+
+# Error koneksi/jaringan -> coba lagi nanti; error lain (data) -> baris ditandai gagal
+_TRANSIENT = (OperationalError, InterfaceError)
+
+def _is_transient(e):
+    """Connection/network error (retry later) vs. anything else (bad row, mark failed)."""
+    return isinstance(e, _TRANSIENT) or getattr(e, "connection_invalidated", False)
+
+
+class WriteQueue:
+    """Durable local queue of form rows plus the background worker that flushes it to the DB."""
+
+    def __init__(self, path=QUEUE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        with self._db() as c:
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute('''
+                CREATE TABLE IF NOT EXISTS queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT, tbl TEXT NOT NULL, payload TEXT NOT NULL,
+                    created_at REAL NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0, last_error TEXT
+                )''')
+            rows = c.execute("SELECT id, tbl, payload FROM queue WHERE failed = 0 ORDER BY id").fetchall()
+            n_failed = c.execute("SELECT COUNT(*) FROM queue WHERE failed = 1").fetchone()[0]
+        # Salinan di memori agar overlay/status tidak membaca file setiap rerun
+        self._pending = [(i, t, json.loads(p)) for i, t, p in rows]
+        self.status = {
+            "last_flush_at": None, "last_flush_rows": 0, "last_error": None,
+            "failures": 0, "next_retry_at": None, "failed_rows": n_failed,
+        }
+
+    @contextmanager
+    def _db(self):
+        """Short-lived connection to the queue file; commits on success."""
+        c = sqlite3.connect(self.path, timeout=10)
+        try:
+            with c:
+                yield c
+        finally:
+            c.close()
+
+    # --- sisi UI ---
+    def enqueue(self, table, data):
+        """Persist one display-named row for `table` ('sump'/'pompa') and wake the worker."""
+        data = dict(data)
+        if table == "pompa":
+            data.setdefault('Status Operasi', '-')
+            data.setdefault('Remarks', '-')
+        data['Tanggal'] = pd.Timestamp(data['Tanggal']).strftime('%Y-%m-%d')
+        payload = json.dumps(data, default=str)
+        with self._lock:
+            with self._db() as c:
+                cur = c.execute("INSERT INTO queue (tbl, payload, created_at) VALUES (?, ?, ?)",
+                                (table, payload, time.time()))
+            self._pending.append((cur.lastrowid, table, json.loads(payload)))
+        self._wake.set()
+
+    def depth(self):
+        return len(self._pending)
+
+    def pending_frame(self, table):
+        """Queued, not yet flushed rows of `table` as a normalized display-named frame."""
+        with self._lock:
+            rows = [d for _, t, d in self._pending if t == table]
+        if not rows:
+            return None
+        df = pd.DataFrame(rows)
+        df['Tanggal'] = pd.to_datetime(df['Tanggal'])
+        cols = db.SUMP_COLUMNS if table == "sump" else db.POMPA_COLUMNS
+        for c in cols:
+            if c not in df.columns:
+                df[c] = None
+        if table == "pompa":
+            df['Unit Code'] = df['Unit Code'].fillna('-')
+        key = db.SUMP_KEY_COLUMNS if table == "sump" else db.POMPA_KEY_COLUMNS
+        return db.compact_frame(df[cols].drop_duplicates(subset=key, keep='last'))
+
+    def _in_scope(self, table, site=None, pit=None, start=None, end=None):
+        """pending_frame(table) restricted to the filter scope (None when nothing is queued there)."""
+        pend = self.pending_frame(table)
+        if pend is None:
+            return None
+        mask = pd.Series(True, index=pend.index)
+        if site:
+            mask &= pend['Site'] == site
+        if pit:
+            mask &= pend['Pit'] == pit
+        if start is not None:
+            mask &= pend['Tanggal'] >= pd.Timestamp(start)
+        if end is not None:
+            mask &= pend['Tanggal'] < pd.Timestamp(end) + pd.Timedelta(days=1)
+        pend = pend[mask]
+        return None if pend.empty else pend
+
+    def has_pending(self, site=None, pit=None, start=None, end=None):
+        """True if a queued sump or pompa row falls in the filter scope (its water balance is not in the DB yet)."""
+        return any(self._in_scope(t, site, pit, start, end) is not None for t in ("sump", "pompa"))
+
+    def overlay(self, df_s, df_p, site=None, pit=None, start=None, end=None):
+        """Optimistically merge queued rows (in the given filter scope) over loaded frames."""
+        out = []
+        for table, df in (("sump", df_s), ("pompa", df_p)):
+            pend = self._in_scope(table, site, pit, start, end)
+            if pend is None:
+                out.append(df)
+                continue
+            key = db.SUMP_KEY_COLUMNS if table == "sump" else db.POMPA_KEY_COLUMNS
+            merged = pd.concat([db.expand_frame(df), db.expand_frame(pend)], ignore_index=True)
+            out.append(db.compact_frame(merged.drop_duplicates(subset=key, keep='last').reset_index(drop=True)))
+        return tuple(out)
+
+    # --- worker ---
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="dms-write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(POLL_SECONDS)
+            self._wake.clear()
+            retry_at = self.status["next_retry_at"]
+            if retry_at and time.time() < retry_at:
+                continue
+            try:
+                while self.flush_once():
+                    pass
+                self.status.update(failures=0, next_retry_at=None)
+            except Exception as e:
+                n = self.status["failures"] + 1
+                delay = min(BACKOFF_BASE * 2 ** (n - 1), BACKOFF_MAX)
+                self.status.update(failures=n, last_error=str(e).splitlines()[0],
+                                   next_retry_at=time.time() + delay)
+
+    def flush_once(self):
+        """
+        Send up to BATCH_MAX queued rows in one transaction. Returns the number flushed.
+        Transient (connection) errors propagate so the worker backs off; a batch rejected
+        for any other reason is retried row by row and the bad rows are marked failed.
+        """
+        with self._lock:
+            batch = self._pending[:BATCH_MAX]
+        if not batch:
+            return 0
+        try:
+            self._write(batch)
+            done = batch
+        except Exception as e:
+            if _is_transient(e):
+                raise
+            done = []
+            for item in batch:
+                try:
+                    self._write([item])
+                    done.append(item)
+                except Exception as e1:
+                    if _is_transient(e1):
+                        raise
+                    self._mark_failed(item, e1)
+        self._remove(done)
+        self.status.update(last_flush_at=time.time(), last_flush_rows=len(done), last_error=None)
+        return len(done)
+
+    def _write(self, items):
+        frames = {}
+        for _, table, data in items:
+            frames.setdefault(table, []).append(data)
+        conn = db.get_connection()
+        with conn.session as session:
+            keys = []
+            for table, rows in frames.items():
+                df = pd.DataFrame(rows)
+                db.upsert_frame(session, table, df)
+                keys.append(df[['Tanggal', 'Site', 'Pit']])
+            db.refresh_water_balance_for(session, pd.concat(keys, ignore_index=True))
+            db.bump_data_version(session)
+            session.commit()
+
+    def _remove(self, items):
+        ids = [i for i, _, _ in items]
+        if not ids:
+            return
+        with self._lock:
+            with self._db() as c:
+                c.executemany("DELETE FROM queue WHERE id = ?", [(i,) for i in ids])
+            done = set(ids)
+            self._pending = [p for p in self._pending if p[0] not in done]
+
+    def _mark_failed(self, item, err):
+        with self._lock:
+            with self._db() as c:
+                c.execute("UPDATE queue SET failed = 1, attempts = attempts + 1, last_error = ? WHERE id = ?",
+                          ((str(err).splitlines() or [type(err).__name__])[0], item[0]))
+            self._pending = [p for p in self._pending if p[0] != item[0]]
+            self.status["failed_rows"] += 1
+
+
+@st.cache_resource
+def get_write_queue():
+    """Process-wide queue; the worker also flushes rows left over from a previous run."""
+    q = WriteQueue()
+    q.start()
+    return q